@@ -42,20 +42,27 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "places.metrics.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    # Статика из STATIC_ROOT с готовыми .br/.gz - до сжатия ответов на лету
+    'places.static_assets.PrecompressedStaticMiddleware',
+    # Сжатие HTML и JSON на лету, в том числе потоковых ответов (выгрузка, карты)
+    "django.middleware.gzip.GZipMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    'places.db_router.ReplicaPinMiddleware',
 ]
 
 ROOT_URLCONF = "config.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # Обычный DjangoTemplates, дополнительно замеряющий время рендеринга
+        "BACKEND": "places.metrics.InstrumentedDjangoTemplates",
         "DIRS": [BASE_DIR / 'templates'],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -75,16 +82,50 @@ WSGI_APPLICATION = "config.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'sport_places_2025',
-        'USER': 'dron',
-        'PASSWORD': '1765362',
-        'HOST': 'localhost',
-        'PORT': '5432',
-    }
+# Параметры берутся из окружения (DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT),
+# по умолчанию - локальный Postgres
+_DATABASE = {
+    'ENGINE': 'django.db.backends.postgresql',
+    'NAME': os.environ.get('DB_NAME', 'sport_places_2025'),
+    'USER': os.environ.get('DB_USER', 'dron'),
+    'PASSWORD': os.environ.get('DB_PASSWORD', '1765362'),
+    'HOST': os.environ.get('DB_HOST', 'localhost'),
+    'PORT': os.environ.get('DB_PORT', '5432'),
 }
+if int(os.environ.get('DB_POOL_MAX_SIZE', 0)):
+    # Пул соединений psycopg 3 в каждом процессе (psycopg[pool] в зависимостях проекта).
+    # Соединение возвращается в пул после запроса, поэтому CONN_MAX_AGE = 0
+    _DATABASE['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 1)),
+            'max_size': int(os.environ['DB_POOL_MAX_SIZE']),
+            # Сколько секунд запрос ждет свободное соединение
+            'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        },
+    }
+else:
+    # Постоянные соединения: одно на поток, переиспользуется до CONN_MAX_AGE секунд
+    _DATABASE['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+    _DATABASE['CONN_HEALTH_CHECKS'] = True
+
+DATABASES = {'default': _DATABASE}
+
+# Реплики только для чтения (places.db_router): DB_REPLICA_HOSTS=host1,host2:5433
+DATABASE_REPLICAS = []
+for _index, _host in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    _host, _, _port = _host.strip().partition(':')
+    DATABASES[f'replica_{_index}'] = {
+        **_DATABASE,
+        'HOST': _host,
+        'PORT': _port or _DATABASE['PORT'],
+        # В тестах реплика - та же база, что и основная
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica_{_index}')
+
+DATABASE_ROUTERS = ['places.db_router.ReplicaRouter']
+# Сколько секунд после POST чтения клиента идут в основную базу (не меньше отставания реплик)
+REPLICA_PIN_SECONDS = 10
 
 
 # Password validation
@@ -122,9 +163,17 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = "static/"
-STATICFILES_DIRS = [
-    BASE_DIR / 'places/static',
-]
+# places/static находит AppDirectoriesFinder; отдельный STATICFILES_DIRS давал при
+# collectstatic дубликаты каждого файла
+# Сборка статики: python manage.py collectstatic - имена с хешем содержимого
+# и сжатые копии .gz/.br (places.static_assets; .br сжимает пакет brotli)
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'places.static_assets.PrecompressedManifestStaticFilesStorage'},
+}
+# Cache-Control для статики без хеша в имени (имена с хешем кешируются на год)
+STATIC_MAX_AGE = 60 * 60
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -137,3 +186,74 @@ LOGOUT_REDIRECT_URL = '/'
 # Настройки для медиа-файлов (загружаемые пользователями)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Счетчик просмотров категорий (places.counters):
+# 'sync' - UPDATE на каждый просмотр, 'memory' - буфер процесса (сбрасывает фоновый поток),
+# 'cache' - общий кэш (без новых просмотров сбрасывает cron: manage.py flush_view_counts)
+VIEW_COUNTER_MODE = 'memory'
+# Максимальная задержка (в секундах), с которой просмотры попадают в базу
+VIEW_COUNTER_FLUSH_INTERVAL = 30
+
+# Кластеризация маркеров на карте категории (places.clustering):
+# до этого зума отдаются кластеры, глубже - отдельные площадки
+MAP_CLUSTER_MAX_ZOOM = 16
+# Если в видимой области площадок не больше этого числа, кластеры не нужны
+MAP_CLUSTER_RAW_THRESHOLD = 300
+
+# Уменьшенные копии изображений (places.images)
+# False - строить сразу после сохранения, а не в фоне
+IMAGE_VARIANTS_ASYNC = True
+# Количество процессов Pillow (None - по числу ядер)
+IMAGE_VARIANT_WORKERS = 2
+
+# Метрики запросов (places.metrics): заголовок Server-Timing и /metrics для Prometheus
+METRICS_ENABLED = True
+# Доступ к /metrics: staff или заголовок Authorization: Bearer <METRICS_TOKEN>.
+# Список адресов - только без reverse proxy на той же машине: за nginx у всех запросов 127.0.0.1
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = []
+
+# Кеш. По умолчанию - в памяти процесса; в продакшене общий кеш (Redis, Memcached),
+# иначе сброс справочника категорий не дойдет до других процессов
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+# Как часто (в секундах) копия справочника категорий в памяти процесса сверяет версию с общим кешем
+CATEGORY_CATALOG_LOCAL_TTL = 5
+
+# Кеширование страниц для анонимных посетителей и фрагментов шаблонов (places.page_cache)
+PAGE_CACHE_ENABLED = True
+# TTL в секундах: по имени view и для фрагментов шаблонов
+PAGE_CACHE_TIMEOUTS = {
+    'home': 300,
+    'category_detail': 120,
+    'fragment': 600,
+}
+# Версия выкладки (например, хеш коммита): входит в ETag страниц (places.conditional),
+# чтобы после обновления шаблонов браузеры не получали 304 на старые копии
+RELEASE = os.environ.get('RELEASE', '')
+
+# Таблица лидеров (places.leaderboard): сколько голосов со средней оценкой сайта
+# добавляется каждой площадке, и размер топа на странице категории
+LEADERBOARD_PRIOR_VOTES = 10
+LEADERBOARD_CATEGORY_SIZE = 5
+
+# Количество карточек площадок на странице категории (постраничный вывод по курсору)
+CATEGORY_PAGE_SIZE = 24
+# Количество комментариев на странице площадки и в одной подгрузке
+COMMENTS_PAGE_SIZE = 20
+
+# Конфигурация полнотекстового поиска PostgreSQL (places.search)
+SEARCH_CONFIG = 'russian'
+
+# Асинхронные главная, категория и площадка (places.async_views) - для запуска под ASGI,
+# например: uvicorn config.asgi:application. Под WSGI оставить False
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', '') == '1'
+# Размер пула потоков для запросов и рендеринга асинхронных view (places.workers);
+# заодно ограничивает число соединений с базой, которые они открывают
+ASYNC_WORKERS = 8
+
+# Токены партнеров для выгрузки /export/places/ (заголовок Authorization: Bearer <токен>)
+EXPORT_TOKENS = [token for token in os.environ.get('EXPORT_TOKENS', '').split(',') if token]
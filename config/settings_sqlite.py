@@ -0,0 +1,31 @@
+"""
+Профиль настроек для локального запуска, тестов и бенчмарков без Postgres:
+
+    DJANGO_SETTINGS_MODULE=config.settings_sqlite python manage.py test
+    DJANGO_SETTINGS_MODULE=config.settings_sqlite python manage.py bench_views
+    DJANGO_SETTINGS_MODULE=config.settings_sqlite python manage.py bench_async
+"""
+
+from .settings import *  # noqa: F401,F403
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.environ.get("SQLITE_PATH", BASE_DIR / "db.sqlite3"),
+    }
+}
+
+# Вторая база SQLite в роли реплики (places.db_router), например копия db.sqlite3:
+#     SQLITE_REPLICA_PATH=db_replica.sqlite3 python manage.py runserver
+# Без переменной реплика указывает на тот же файл и роутер ее не использует
+DATABASES["replica"] = {
+    "ENGINE": "django.db.backends.sqlite3",
+    "NAME": os.environ.get("SQLITE_REPLICA_PATH", DATABASES["default"]["NAME"]),
+}
+DATABASE_REPLICAS = ["replica"] if os.environ.get("SQLITE_REPLICA_PATH") else []
+
+# Без collectstatic: манифеста с хешами нет, {% static %} отдает исходные имена
+STORAGES = {
+    **STORAGES,
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
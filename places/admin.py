@@ -2,6 +2,8 @@ from django.contrib import admin
 from django.urls import path
 from django.http import HttpResponseRedirect
 from .models import Place, PendingPlace, Photo, Category
+from .images import schedule_variants
+from .moderation import approve_submissions
 
 
 class PhotoInline(admin.TabularInline):
@@ -30,6 +32,14 @@ class CategoryAdmin(admin.ModelAdmin):
     list_display = ['name']
     prepopulated_fields = {'slug': ('name',)}
 
+    def save_model(self, request, obj, form, change):
+        # Новая обложка - старые уменьшенные копии больше не подходят
+        if 'cover_photo' in form.changed_data:
+            obj.cover_variants = {}
+        super().save_model(request, obj, form, change)
+        if 'cover_photo' in form.changed_data and obj.cover_photo:
+            schedule_variants([obj])
+
 
 @admin.register(PendingPlace)
 class PendingPlaceAdmin(admin.ModelAdmin):
@@ -59,29 +69,7 @@ class PendingPlaceAdmin(admin.ModelAdmin):
 
     def approve_single_submission(self, request, object_id):
         submission = self.get_object(request, object_id)
-        if submission.action == 'add':
-            new_place = Place.objects.create(
-                name=submission.name,
-                description=submission.description,
-                user=submission.user,
-                latitude=submission.latitude,
-                longitude=submission.longitude,
-                category=submission.category,
-            )
-            photos_to_copy = Photo.objects.filter(pending_place=submission)
-            photos_to_copy.update(pending_place=None, place=new_place)
-
-        elif submission.action == 'edit':
-            original = submission.original_place
-            original.description = submission.description
-            original.save()
-            
-            photos_to_copy = Photo.objects.filter(pending_place=submission)
-            photos_to_copy.update(pending_place=None, place=original)
-        
-        # Обновляем статус заявки на "одобрена"
-        submission.status = 'approved'
-        submission.save()
+        approve_submissions(PendingPlace.objects.filter(pk=submission.pk))
 
         self.message_user(request, f"Заявка '{submission.name}' была одобрена.")
         
@@ -89,34 +77,19 @@ class PendingPlaceAdmin(admin.ModelAdmin):
 
     @admin.action(description='Одобрить выбранные заявки')
     def approve_submission(self, request, queryset):
-        for submission in queryset:
-            if submission.action == 'add':
-                new_place = Place.objects.create(
-                    name=submission.name,
-                    description=submission.description,
-                    user=submission.user,
-                    latitude=submission.latitude,
-                    longitude=submission.longitude,
-                    category=submission.category,
-                )
-                photos_to_copy = Photo.objects.filter(pending_place=submission)
-                photos_to_copy.update(pending_place=None, place=new_place)
-
-            elif submission.action == 'edit':
-                original = submission.original_place
-                original.description = submission.description
-                original.save()
-                
-                photos_to_copy = Photo.objects.filter(pending_place=submission)
-                photos_to_copy.update(pending_place=None, place=original)
-            
-            submission.status = 'approved'
-            submission.save()
-
-        self.message_user(request, f"{queryset.count()} submissions have been approved.")
+        approved = approve_submissions(queryset)
+        self.message_user(request, f"{approved} submissions have been approved.")
 
 
 @admin.register(Photo)
 class PhotoAdmin(admin.ModelAdmin):
     list_display = ('image', 'pending_place', 'place')
-    list_filter = ('pending_place', 'place')
\ No newline at end of file
+    list_filter = ('pending_place', 'place')
+
+    def save_model(self, request, obj, form, change):
+        # Новый файл - варианты прежнего больше не подходят (их освобождает сигнал)
+        if 'image' in form.changed_data:
+            obj.variants = {}
+        super().save_model(request, obj, form, change)
+        if 'image' in form.changed_data and obj.image:
+            schedule_variants([obj])
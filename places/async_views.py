@@ -0,0 +1,131 @@
+"""
+Асинхронные версии home_page, category_detail и place_detail для запуска
+под ASGI (config.asgi). places.urls подключает их вместо синхронных при
+ASYNC_VIEWS = True.
+
+Одиночные объекты загружаются асинхронным ORM, независимые списки -
+одновременно через asyncio.gather, каждый в потоке ограниченного пула
+places.workers. Рендеринг шаблона, основная CPU-работа страницы, тоже
+выполняется в пуле. Пока запрос ждет базу, цикл событий обслуживает другие.
+Querysets, сортировки, условные GET (places.conditional) и кеширование
+страниц и фрагментов - те же, что у синхронных view.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponseBadRequest
+from django.shortcuts import aget_object_or_404, render
+
+from . import views
+from .catalog import category_by_slug, category_catalog
+from .conditional import aconditional_page, category_validators, home_validators, place_validators
+from .counters import record_category_view
+from .db_router import replica_reads
+from .forms import CommentForm, RatingForm
+from .models import Category, Photo, Place
+from .page_cache import CATEGORIES_TAG, HOME_TAG, acached_page, afragments_cached, category_tag, fragment_context
+from .pagination import InvalidCursor
+from .workers import fetch, fetch_all, run_in_pool
+
+
+async def _render(request, template_name, context):
+    # Пользователь уже загружен асинхронно - шаблону не нужен повторный запрос
+    request.user = await request.auser()
+    return await run_in_pool(render, request, template_name, context)
+
+
+@replica_reads
+async def home_page(request):
+    return await aconditional_page(
+        request, lambda: home_validators(request),
+        lambda: acached_page(request, 'home', [HOME_TAG, CATEGORIES_TAG], lambda: _render_home(request)),
+    )
+
+
+async def _render_home(request):
+    fragment_cache = await sync_to_async(fragment_context)([HOME_TAG, CATEGORIES_TAG])
+    lists = views._home_lists()
+    # Оба фрагмента в кеше - querysets остаются ленивыми и не выполняются
+    if not await afragments_cached(fragment_cache, ['home_categories', 'home_places']):
+        lists = await fetch_all(lists)
+    return await _render(request, 'places/home.html', {**lists, 'fragment_cache': fragment_cache})
+
+
+@replica_reads
+async def category_detail(request, category_slug):
+    category = (
+        await sync_to_async(category_by_slug)(category_slug)
+        or await aget_object_or_404(Category, slug=category_slug)
+    )
+    await sync_to_async(record_category_view)(category.pk)
+
+    tags = [CATEGORIES_TAG, category_tag(category.pk)]
+    return await aconditional_page(
+        request, lambda: category_validators(request, category.pk),
+        lambda: acached_page(request, 'category_detail', tags, lambda: _render_category(request, category.pk, tags)),
+    )
+
+
+async def _render_category(request, category_id, tags):
+    try:
+        sort, places = views._category_page(request, category_id)
+    except InvalidCursor:
+        return HttpResponseBadRequest('Неверный курсор')
+
+    fragment_cache = await sync_to_async(fragment_context)(tags)
+    loads = [
+        # Количество площадок хранится в самой категории (place_count)
+        aget_object_or_404(Category, pk=category_id),
+        sync_to_async(category_catalog)(),
+    ]
+    if not await afragments_cached(fragment_cache, ['category_places'], category_id, sort, places.cursor):
+        # Страница площадок загружается одновременно с категорией
+        loads.append(run_in_pool(lambda: places.items))
+    top_places = views._category_top(category_id)
+    # Топ категории показывается только на первой странице
+    if not places.cursor and not await afragments_cached(fragment_cache, ['category_top'], category_id):
+        loads.append(fetch(top_places))
+    category, all_categories, *_ = await asyncio.gather(*loads)
+
+    context = {
+        'current_category': category,
+        'places': places,
+        'top_places': top_places,
+        'sort': sort,
+        'sorts': [(key, label) for key, (label, _) in views.PLACE_SORTS.items()],
+        'all_categories': all_categories,
+        'fragment_cache': fragment_cache,
+    }
+    return await _render(request, 'places/category_detail.html', context)
+
+
+@login_required
+@replica_reads
+async def place_detail(request, place_id):
+    if request.method == 'POST':
+        # Комментарий или оценка - редкая запись, ее обрабатывает синхронный view
+        return await sync_to_async(views.place_detail)(request, place_id)
+    return await aconditional_page(
+        request, lambda: place_validators(request, place_id), lambda: _render_place(request, place_id),
+    )
+
+
+async def _render_place(request, place_id):
+    comments = views._comments_page(place_id)
+    # Площадка, фото и первая страница комментариев не зависят друг от друга
+    place, photos, _ = await asyncio.gather(
+        aget_object_or_404(Place.objects.select_related('category'), pk=place_id),
+        fetch(Photo.objects.filter(place_id=place_id)),
+        run_in_pool(lambda: comments.items),
+    )
+
+    context = {
+        'place': place,
+        'comments': comments,
+        'average_rating': place.average_rating,
+        'comment_form': CommentForm(),
+        'rating_form': RatingForm(),
+        'photos': photos,
+    }
+    return await _render(request, 'places/place_detail.html', context)
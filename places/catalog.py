@@ -0,0 +1,100 @@
+"""
+Кешированный справочник категорий (меню, выпадающие списки, формы).
+
+Список категорий, отсортированный по названию, хранится в двух уровнях:
+в памяти процесса и в общем кеше Django под ключом с номером версии.
+Сохранение или удаление Category меняет версию (см. signals), после чего
+все процессы перечитывают список из базы при следующем обращении.
+
+Копия в памяти процесса перепроверяет версию в общем кеше не чаще, чем раз
+в CATEGORY_CATALOG_LOCAL_TTL секунд, поэтому большинству запросов не нужен
+ни запрос к базе, ни обращение к кешу.
+"""
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+VERSION_KEY = 'places:category_catalog:version'
+CATALOG_KEY = 'places:category_catalog:{version}'
+# Списки старых версий не нужны - пусть истекают сами
+CATALOG_TIMEOUT = 24 * 60 * 60
+
+_lock = threading.Lock()
+_local = {'version': None, 'categories': None, 'checked_at': 0.0}
+
+
+def _local_ttl():
+    return getattr(settings, 'CATEGORY_CATALOG_LOCAL_TTL', 5)
+
+
+def _current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Кеш очищен или еще пуст: заводим версию (add не перетрет чужую)
+        cache.add(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _load():
+    from .models import Category
+    # Из основной базы: справочник кешируется на сутки, отставание реплики в нем бы застряло
+    return tuple(Category.objects.using(DEFAULT_DB_ALIAS).order_by('name'))
+
+
+def category_catalog():
+    """
+    Все категории, отсортированные по названию (кортеж экземпляров Category).
+    Поля, которые меняются без save() (view_count), могут быть неактуальны.
+    """
+    now = time.monotonic()
+    with _lock:
+        if _local['categories'] is not None and now - _local['checked_at'] < _local_ttl():
+            return _local['categories']
+
+    version = _current_version()
+    with _lock:
+        if _local['categories'] is not None and _local['version'] == version:
+            _local['checked_at'] = now
+            return _local['categories']
+
+    key = CATALOG_KEY.format(version=version)
+    categories = cache.get(key)
+    if categories is None:
+        categories = _load()
+        cache.set(key, categories, timeout=CATALOG_TIMEOUT)
+
+    with _lock:
+        _local.update(version=version, categories=categories, checked_at=now)
+    return categories
+
+
+def catalog_version():
+    """Текущая версия справочника: меняется при каждом изменении категорий."""
+    return _current_version()
+
+
+def category_by_slug(slug):
+    """Категория из справочника по slug или None."""
+    for category in category_catalog():
+        if category.slug == slug:
+            return category
+    return None
+
+
+def _bump_version():
+    cache.set(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+    with _lock:
+        _local.update(version=None, categories=None, checked_at=0.0)
+
+
+def invalidate_category_catalog():
+    """Сбрасывает справочник во всех процессах (после коммита текущей транзакции)."""
+    _bump_version()
+    # Повторный сброс после коммита: иначе параллельный запрос мог успеть
+    # закешировать список, прочитанный до коммита
+    transaction.on_commit(_bump_version)
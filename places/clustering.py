@@ -0,0 +1,245 @@
+"""
+Серверная кластеризация маркеров на карте категории.
+
+Для каждого уровня зума 0..MAP_CLUSTER_MAX_ZOOM координаты площадки
+переводятся в ячейку сетки Web Mercator (тайл зума z, разбитый на
+CLUSTER_SUBDIVISION x CLUSTER_SUBDIVISION ячеек). В PlaceCluster хранится
+количество площадок в ячейке и суммы координат, поэтому при одобрении
+новой площадки кластеры обновляются инкрементально, без пересчета.
+"""
+import math
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max, Min, Sum
+
+from .models import Place, PlaceCluster
+
+# Ячейка = 1/4 тайла 256px, т.е. кластер примерно 64x64 пикселя на экране
+CLUSTER_SUBDIVISION = 4
+# Широта, за которой проекция Web Mercator не определена
+MAX_LATITUDE = 85.05112878
+
+
+def max_cluster_zoom():
+    return getattr(settings, 'MAP_CLUSTER_MAX_ZOOM', 16)
+
+
+def raw_points_threshold():
+    return getattr(settings, 'MAP_CLUSTER_RAW_THRESHOLD', 300)
+
+
+def _grid_size(zoom):
+    return (1 << zoom) * CLUSTER_SUBDIVISION
+
+
+def cell_for(latitude, longitude, zoom):
+    """Номер ячейки (x, y) сетки на уровне зума для точки."""
+    n = _grid_size(zoom)
+    lat = math.radians(max(-MAX_LATITUDE, min(MAX_LATITUDE, latitude)))
+    x = int((longitude + 180.0) / 360.0 * n)
+    y = int((1.0 - math.log(math.tan(lat) + 1.0 / math.cos(lat)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def _cells_for_arrays(latitudes, longitudes, zoom):
+    """Векторный вариант cell_for для массивов координат."""
+    n = _grid_size(zoom)
+    lat = np.radians(np.clip(latitudes, -MAX_LATITUDE, MAX_LATITUDE))
+    x = ((longitudes + 180.0) / 360.0 * n).astype(np.int64)
+    y = ((1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / np.pi) / 2.0 * n).astype(np.int64)
+    return np.clip(x, 0, n - 1), np.clip(y, 0, n - 1)
+
+
+def _shift_cluster(category_id, zoom, cell, count, latitude, longitude):
+    """Сдвигает счетчики ячейки; создает ее, если она еще не существует."""
+    cell_x, cell_y = cell
+    lookup = {'category_id': category_id, 'zoom': zoom, 'cell_x': cell_x, 'cell_y': cell_y}
+    updated = PlaceCluster.objects.filter(**lookup).update(
+        count=F('count') + count,
+        latitude_sum=F('latitude_sum') + latitude * count,
+        longitude_sum=F('longitude_sum') + longitude * count,
+    )
+    if updated or count < 0:
+        return
+    try:
+        with transaction.atomic():
+            PlaceCluster.objects.create(
+                count=count, latitude_sum=latitude * count, longitude_sum=longitude * count, **lookup
+            )
+    except IntegrityError:
+        # Ячейку успел создать параллельный запрос - просто прибавляем к ней
+        _shift_cluster(category_id, zoom, cell, count, latitude, longitude)
+
+
+def _apply_place(place, count):
+    if place.category_id is None or place.latitude is None or place.longitude is None:
+        return
+    latitude, longitude = float(place.latitude), float(place.longitude)
+    with transaction.atomic():
+        for zoom in range(max_cluster_zoom() + 1):
+            cell = cell_for(latitude, longitude, zoom)
+            _shift_cluster(place.category_id, zoom, cell, count, latitude, longitude)
+        if count < 0:
+            PlaceCluster.objects.filter(category_id=place.category_id, count__lte=0).delete()
+
+
+def add_place_to_clusters(place):
+    """Учитывает новую площадку во всех уровнях кластеров ее категории."""
+    _apply_place(place, 1)
+
+
+def add_places_to_clusters(places):
+    """
+    Пакетный вариант add_place_to_clusters: приращения по всем площадкам
+    суммируются в памяти, затем существующие ячейки обновляются одним
+    bulk_update, а новые создаются одним bulk_create на каждый уровень зума.
+    """
+    places = [
+        place for place in places
+        if place.category_id is not None and place.latitude is not None and place.longitude is not None
+    ]
+    if not places:
+        return
+
+    categories = np.array([place.category_id for place in places], dtype=np.int64)
+    latitudes = np.array([float(place.latitude) for place in places])
+    longitudes = np.array([float(place.longitude) for place in places])
+    category_ids = sorted(set(categories.tolist()))
+
+    with transaction.atomic():
+        for zoom in range(max_cluster_zoom() + 1):
+            xs, ys = _cells_for_arrays(latitudes, longitudes, zoom)
+            deltas = defaultdict(lambda: [0, 0.0, 0.0])
+            for key, latitude, longitude in zip(
+                zip(categories.tolist(), xs.tolist(), ys.tolist()), latitudes.tolist(), longitudes.tolist()
+            ):
+                delta = deltas[key]
+                delta[0] += 1
+                delta[1] += latitude
+                delta[2] += longitude
+
+            # Существующие ячейки ищем в охватывающем прямоугольнике затронутых ячеек
+            existing = PlaceCluster.objects.select_for_update().filter(
+                category_id__in=category_ids, zoom=zoom,
+                cell_x__gte=int(xs.min()), cell_x__lte=int(xs.max()),
+                cell_y__gte=int(ys.min()), cell_y__lte=int(ys.max()),
+            )
+            to_update = []
+            for cluster in existing:
+                delta = deltas.pop((cluster.category_id, cluster.cell_x, cluster.cell_y), None)
+                if delta is None:
+                    continue
+                cluster.count += delta[0]
+                cluster.latitude_sum += delta[1]
+                cluster.longitude_sum += delta[2]
+                to_update.append(cluster)
+
+            PlaceCluster.objects.bulk_update(
+                to_update, ['count', 'latitude_sum', 'longitude_sum'], batch_size=1000
+            )
+            PlaceCluster.objects.bulk_create(
+                [
+                    PlaceCluster(
+                        category_id=category_id, zoom=zoom, cell_x=cell_x, cell_y=cell_y,
+                        count=count, latitude_sum=lat_sum, longitude_sum=lon_sum,
+                    )
+                    for (category_id, cell_x, cell_y), (count, lat_sum, lon_sum) in deltas.items()
+                ],
+                batch_size=1000,
+            )
+
+
+def remove_place_from_clusters(place):
+    """Убирает площадку из кластеров (при удалении или переносе)."""
+    _apply_place(place, -1)
+
+
+def rebuild_clusters(category_ids=None):
+    """
+    Пересчитывает кластеры с нуля. Координаты загружаются одним запросом
+    в массивы NumPy, а ячейки группируются векторно на каждом уровне зума.
+    Возвращает количество созданных кластеров.
+    """
+    places = Place.objects.filter(
+        category__isnull=False, latitude__isnull=False, longitude__isnull=False
+    )
+    clusters = PlaceCluster.objects.all()
+    if category_ids is not None:
+        places = places.filter(category_id__in=category_ids)
+        clusters = clusters.filter(category_id__in=category_ids)
+
+    rows = np.array(list(places.values_list('category_id', 'latitude', 'longitude')), dtype=np.float64)
+    to_create = []
+    if len(rows):
+        categories = rows[:, 0].astype(np.int64)
+        latitudes, longitudes = rows[:, 1], rows[:, 2]
+        for zoom in range(max_cluster_zoom() + 1):
+            xs, ys = _cells_for_arrays(latitudes, longitudes, zoom)
+            keys = np.stack([categories, xs, ys], axis=1)
+            unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+            inverse = inverse.ravel()
+            counts = np.bincount(inverse)
+            lat_sums = np.bincount(inverse, weights=latitudes)
+            lon_sums = np.bincount(inverse, weights=longitudes)
+            for (category_id, cell_x, cell_y), count, lat_sum, lon_sum in zip(
+                unique.tolist(), counts.tolist(), lat_sums.tolist(), lon_sums.tolist()
+            ):
+                to_create.append(PlaceCluster(
+                    category_id=category_id, zoom=zoom, cell_x=cell_x, cell_y=cell_y,
+                    count=count, latitude_sum=lat_sum, longitude_sum=lon_sum,
+                ))
+
+    with transaction.atomic():
+        clusters.delete()
+        PlaceCluster.objects.bulk_create(to_create, batch_size=1000)
+    return len(to_create)
+
+
+def category_bbox(category):
+    """Границы всех площадок категории: (west, south, east, north) или None."""
+    extent = category.places.aggregate(
+        west=Min('longitude'), south=Min('latitude'), east=Max('longitude'), north=Max('latitude')
+    )
+    if extent['west'] is None:
+        return None
+    return [float(extent[key]) for key in ('west', 'south', 'east', 'north')]
+
+
+def viewport_clusters(category, zoom, bbox):
+    """
+    Кластеры категории, попадающие в видимую область (west, south, east, north)
+    на данном зуме. Выборка идет по индексу (category, zoom, cell_x, cell_y).
+    """
+    zoom = max(0, min(zoom, max_cluster_zoom()))
+    west, south, east, north = bbox
+    min_x, min_y = cell_for(north, west, zoom)
+    max_x, max_y = cell_for(south, east, zoom)
+
+    clusters = PlaceCluster.objects.filter(
+        category=category, zoom=zoom, cell_y__gte=min_y, cell_y__lte=max_y,
+    )
+    # Если область пересекает антимеридиан, по x не фильтруем
+    if min_x <= max_x:
+        clusters = clusters.filter(cell_x__gte=min_x, cell_x__lte=max_x)
+    return clusters
+
+
+def viewport_total(clusters):
+    return clusters.aggregate(total=Sum('count'))['total'] or 0
+
+
+def cluster_features(clusters):
+    """GeoJSON-объекты для кластеров: точка в центроиде и число площадок."""
+    for cluster in clusters.values_list('count', 'latitude_sum', 'longitude_sum'):
+        count, latitude_sum, longitude_sum = cluster
+        yield {
+            'type': 'Feature',
+            'geometry': {
+                'type': 'Point',
+                'coordinates': [round(longitude_sum / count, 6), round(latitude_sum / count, 6)],
+            },
+            'properties': {'cluster': True, 'count': count},
+        }
@@ -0,0 +1,147 @@
+"""
+Условные GET-запросы (If-None-Match / If-Modified-Since) для home_page,
+category_detail и place_detail.
+
+Валидатор страницы - ETag и Last-Modified - строится по хранимым отметкам
+updated_at одним запросом по индексу: у площадки - ее собственная отметка и
+последнее изменение ее фото, у категории - отметка категории, у главной -
+самая свежая отметка среди категорий. Запись, меняющая площадку, сдвигает
+и отметку ее категории (places.signals), поэтому страницы категорий и главная
+тоже узнают об изменениях площадок.
+
+Если валидатор совпал с присланным браузером, отдается 304 без шаблонов,
+карты и кеша страниц. Иначе страница рендерится как обычно, а ответ 200
+получает ETag, Last-Modified и Cache-Control: no-cache, чтобы браузер
+каждый раз перепроверял копию.
+
+В ETag кроме отметок входят версия справочника категорий (меню на каждой
+странице), пользователь, адрес с параметрами и settings.RELEASE - после
+выкладки с новыми шаблонами все копии считаются устаревшими.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .catalog import catalog_version
+from .models import Category, Photo, Place
+from .page_cache import timeout_for
+from .workers import run_in_pool
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+def touch_places(place_ids):
+    """Сдвигает updated_at площадок, измененных в обход save()."""
+    place_ids = [pk for pk in place_ids if pk is not None]
+    if place_ids:
+        Place.objects.filter(pk__in=place_ids).update(updated_at=timezone.now())
+
+
+def touch_categories(category_ids):
+    """Сдвигает updated_at категорий, у которых изменились площадки."""
+    category_ids = [pk for pk in category_ids if pk is not None]
+    if category_ids:
+        Category.objects.filter(pk__in=category_ids).update(updated_at=timezone.now())
+
+
+def _validators(request, name, stamps, last_modified):
+    parts = [
+        name, getattr(settings, 'RELEASE', ''), catalog_version(),
+        request.user.pk, request.get_full_path(), *stamps,
+    ]
+    digest = hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest()
+    # Слабый ETag: страницы с одним валидатором равнозначны, но не побайтно
+    # (CSRF-токен в формах маскируется заново при каждом рендеринге)
+    return f'W/"{digest}"', last_modified
+
+
+def place_validators(request, place_id):
+    """(ETag, Last-Modified) страницы площадки или None, если ее нет."""
+    last_photo = Photo.objects.filter(place=OuterRef('pk')).order_by('-updated_at').values('updated_at')[:1]
+    row = Place.objects.filter(pk=place_id).values_list('updated_at', Subquery(last_photo)).first()
+    if row is None:
+        return None
+    return _validators(request, 'place_detail', row, max(int(stamp.timestamp()) for stamp in row if stamp))
+
+
+def category_validators(request, category_id):
+    """(ETag, Last-Modified) страницы категории или None, если ее нет."""
+    updated_at = Category.objects.filter(pk=category_id).values_list('updated_at', flat=True).first()
+    if updated_at is None:
+        return None
+    return _validators(request, 'category_detail', [updated_at], int(updated_at.timestamp()))
+
+
+def home_validators(request):
+    """(ETag, Last-Modified) главной страницы; None - категорий еще нет."""
+    updated_at = Category.objects.order_by('-updated_at').values_list('updated_at', flat=True).first()
+    if updated_at is None:
+        return None
+    # Популярность категорий (view_count) меняется без отметок: как и кеш
+    # страницы, валидатор главной устаревает раз в timeout_for('home') секунд
+    period = timeout_for('home') or 1
+    bucket = int(time.time() // period) * period
+    return _validators(request, 'home', [updated_at, bucket], max(int(updated_at.timestamp()), bucket))
+
+
+def _patch_headers(request, response, validators):
+    etag, last_modified = validators
+    response.headers['ETag'] = etag
+    response.headers['Last-Modified'] = http_date(last_modified)
+    # Браузер хранит копию, но перед показом перепроверяет ее
+    patch_cache_control(response, no_cache=True, private=request.user.is_authenticated)
+    patch_vary_headers(response, ['Cookie'])
+    return response
+
+
+def _not_modified(request, validators):
+    etag, last_modified = validators
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return _patch_headers(request, response, validators)
+    return None
+
+
+def conditional_page(request, validators, render_page):
+    """
+    Отвечает 304, если копия браузера актуальна (только GET/HEAD);
+    иначе вызывает render_page(). validators() возвращает (ETag, Last-Modified)
+    или None - тогда проверка пропускается.
+    """
+    if request.method not in SAFE_METHODS:
+        return render_page()
+    current = validators()
+    if current is None:
+        return render_page()
+
+    response = _not_modified(request, current)
+    if response is not None:
+        return response
+    response = render_page()
+    if response.status_code == 200:
+        _patch_headers(request, response, current)
+    return response
+
+
+async def aconditional_page(request, validators, render_page):
+    """conditional_page для асинхронных view: render_page возвращает корутину."""
+    if request.method not in SAFE_METHODS:
+        return await render_page()
+    # Пользователь входит в ETag: загружаем его асинхронно до запроса в пуле
+    request.user = await request.auser()
+    current = await run_in_pool(validators)
+    if current is None:
+        return await render_page()
+
+    response = _not_modified(request, current)
+    if response is not None:
+        return response
+    response = await render_page()
+    if response.status_code == 200:
+        _patch_headers(request, response, current)
+    return response
@@ -1,8 +1,9 @@
-from .models import Category
+from .catalog import category_catalog
 
 def categories_processor(request):
     """
     Добавляет все категории в контекст для использования в шаблонах.
+    Передается сама функция: шаблон вызовет ее только там, где список нужен,
+    а данные берутся из кешированного справочника (places.catalog).
     """
-    all_categories = Category.objects.all().order_by('name')
-    return {'categories': all_categories}
\ No newline at end of file
+    return {'categories': category_catalog}
@@ -0,0 +1,226 @@
+"""
+Отложенный (write-behind) счетчик просмотров категорий.
+
+Вместо UPDATE всей строки на каждый просмотр приращения копятся в памяти
+процесса или в общем кэше и раз в VIEW_COUNTER_FLUSH_INTERVAL секунд
+записываются в базу одним атомарным UPDATE с F().
+
+Режимы (settings.VIEW_COUNTER_MODE):
+    'sync'   - сразу UPDATE ... SET view_count = view_count + 1;
+    'memory' - буфер в памяти процесса; фоновый поток сбрасывает его не позже
+               чем через интервал, даже если новых просмотров нет;
+    'cache'  - счетчики в кэше Django, общие для всех процессов; без новых
+               просмотров их сбрасывает команда flush_view_counts (cron).
+"""
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Category, Comment, Place
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = 'category_views'
+
+
+def _mode():
+    return getattr(settings, 'VIEW_COUNTER_MODE', 'memory')
+
+
+def _flush_interval():
+    return getattr(settings, 'VIEW_COUNTER_FLUSH_INTERVAL', 30)
+
+
+def _cache_key(category_id):
+    return f'{CACHE_KEY_PREFIX}:{category_id}'
+
+
+def apply_increments(increments, field='view_count'):
+    """
+    Записывает накопленные приращения {category_id: n} поля field одним
+    UPDATE с CASE по первичному ключу. Возвращает число обновленных категорий.
+    """
+    increments = {pk: n for pk, n in increments.items() if n}
+    if not increments:
+        return 0
+
+    delta = Case(
+        *[When(pk=pk, then=Value(n)) for pk, n in increments.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    return Category.objects.filter(pk__in=increments).update(**{field: F(field) + delta})
+
+
+def adjust_place_counts(deltas):
+    """Сдвигает хранимое Category.place_count: {category_id: +n/-n}."""
+    deltas = {pk: n for pk, n in deltas.items() if pk is not None}
+    return apply_increments(deltas, field='place_count')
+
+
+def rebuild_place_counts(category_ids=None):
+    """Пересчитывает Category.place_count по таблице площадок."""
+    categories = Category.objects.all()
+    if category_ids is not None:
+        categories = categories.filter(pk__in=category_ids)
+    counts = (
+        Place.objects.filter(category=OuterRef('pk')).order_by()
+        .values('category').annotate(n=Count('pk')).values('n')
+    )
+    return categories.update(place_count=Coalesce(Subquery(counts), 0), updated_at=timezone.now())
+
+
+def adjust_comment_count(place_id, delta):
+    """Сдвигает хранимое Place.comment_count одним UPDATE с F() (и отметку updated_at)."""
+    return Place.objects.filter(pk=place_id).update(
+        comment_count=F('comment_count') + delta, updated_at=timezone.now(),
+    )
+
+
+def rebuild_comment_counts(queryset=None):
+    """Пересчитывает Place.comment_count по таблице комментариев."""
+    if queryset is None:
+        queryset = Place.objects.all()
+    counts = (
+        Comment.objects.filter(place=OuterRef('pk')).order_by()
+        .values('place').annotate(n=Count('pk')).values('n')
+    )
+    return queryset.update(comment_count=Coalesce(Subquery(counts), 0), updated_at=timezone.now())
+
+
+class _MemoryBuffer:
+    """Буфер приращений в памяти текущего процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._last_flush = time.monotonic()
+        self._timer = None
+
+    def add(self, category_id, n=1):
+        with self._lock:
+            self._pending[category_id] = self._pending.get(category_id, 0) + n
+            due = time.monotonic() - self._last_flush >= _flush_interval()
+            # После fork поток родителя не работает: is_alive() в дочернем процессе - False
+            if self._timer is None or not self._timer.is_alive():
+                self._timer = threading.Thread(target=self._flush_periodically, name='view-counter-flush', daemon=True)
+                self._timer.start()
+        if due:
+            self.flush()
+
+    def _flush_periodically(self):
+        """Фоновый поток: задержка ограничена интервалом, а не приходом следующего просмотра."""
+        while True:
+            with self._lock:
+                if not self._pending:
+                    # Буфер пуст - поток завершается, следующий add() запустит новый
+                    self._timer = None
+                    return
+                wait = self._last_flush + _flush_interval() - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+                continue
+            # У потока свое соединение с базой: закрываем его по правилам CONN_MAX_AGE
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Не удалось сбросить просмотры категорий')
+                # Просмотры вернулись в буфер; повторим через интервал
+                with self._lock:
+                    self._last_flush = time.monotonic()
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        try:
+            return apply_increments(pending)
+        except Exception:
+            # Не теряем просмотры, если база недоступна: вернем их в буфер
+            with self._lock:
+                for pk, n in pending.items():
+                    self._pending[pk] = self._pending.get(pk, 0) + n
+            raise
+
+
+class _CacheBuffer:
+    """Счетчики в общем кэше: переживают перезапуск воркеров и видны всем процессам."""
+
+    last_flush_key = f'{CACHE_KEY_PREFIX}:last_flush'
+
+    def add(self, category_id, n=1):
+        key = _cache_key(category_id)
+        # add() ничего не делает, если ключ уже есть; incr атомарен в Redis/Memcached
+        cache.add(key, 0, timeout=None)
+        try:
+            cache.incr(key, n)
+        except ValueError:
+            cache.set(key, n, timeout=None)
+
+        # Только один процесс за интервал получает право на сброс
+        if cache.add(self.last_flush_key, time.time(), timeout=_flush_interval()):
+            self.flush()
+
+    def flush(self):
+        ids = list(Category.objects.values_list('pk', flat=True))
+        values = cache.get_many([_cache_key(pk) for pk in ids])
+        increments = {}
+        for pk in ids:
+            n = values.get(_cache_key(pk))
+            if n:
+                increments[pk] = n
+                # Вычитаем ровно прочитанное: просмотры, пришедшие во время сброса, сохранятся
+                try:
+                    cache.decr(_cache_key(pk), n)
+                except ValueError:
+                    pass
+        return apply_increments(increments)
+
+
+_memory_buffer = _MemoryBuffer()
+_cache_buffer = _CacheBuffer()
+
+
+def record_category_view(category_id):
+    """Учитывает один просмотр категории согласно VIEW_COUNTER_MODE."""
+    mode = _mode()
+    if mode == 'sync':
+        Category.objects.filter(pk=category_id).update(view_count=F('view_count') + 1)
+    elif mode == 'cache':
+        _cache_buffer.add(category_id)
+    else:
+        _memory_buffer.add(category_id)
+
+
+def flush_view_counts():
+    """
+    Принудительно сбрасывает все накопленные просмотры в базу. В режиме memory
+    сбрасывается только буфер текущего процесса.
+    """
+    mode = _mode()
+    if mode == 'cache':
+        return _cache_buffer.flush()
+    if mode == 'memory':
+        return _memory_buffer.flush()
+    return 0
+
+
+def _flush_on_exit():
+    try:
+        _memory_buffer.flush()
+    except Exception:
+        pass
+
+
+atexit.register(_flush_on_exit)
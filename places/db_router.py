@@ -0,0 +1,121 @@
+"""
+Чтение с реплик базы для страниц, которые только читают.
+
+Views, обернутые в replica_reads (главная, категория, GET площадки), читают
+с одной случайно выбранной на запрос реплики из settings.DATABASE_REPLICAS. Все остальное идет в
+основную базу (default): любые записи, запросы внутри транзакции, сессии и
+пользователи, а также все views без декоратора.
+
+Реплика отстает от основной базы. Поэтому после POST/PUT/PATCH/DELETE
+ReplicaPinMiddleware ставит клиенту cookie, и следующие REPLICA_PIN_SECONDS
+секунд его чтения тоже идут в основную базу: свой комментарий или оценку
+он видит сразу (read-your-writes).
+
+Реплик нет (DATABASE_REPLICAS пуст) - роутер ничего не меняет.
+"""
+import contextvars
+import functools
+import random
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.deprecation import MiddlewareMixin
+
+PIN_COOKIE = 'db_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Сессии и пользователи читаются только из основной базы: вход и выход видны сразу
+PRIMARY_APPS = {'sessions', 'auth'}
+
+# Реплика, с которой читает текущий запрос (None - основная база)
+_read_alias = contextvars.ContextVar('read_alias', default=None)
+
+
+def _replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def _pin_seconds():
+    return getattr(settings, 'REPLICA_PIN_SECONDS', 10)
+
+
+def read_alias():
+    return _read_alias.get()
+
+
+def replica_may_lag(changed_at):
+    """
+    True, если текущий запрос читает с реплики, а изменение в момент changed_at
+    (time.time()) было меньше REPLICA_PIN_SECONDS секунд назад: реплика могла
+    его еще не получить.
+    """
+    return _read_alias.get() is not None and changed_at is not None and time.time() - changed_at < _pin_seconds()
+
+
+@contextmanager
+def reading_from(alias):
+    """Направляет чтения текущего контекста в реплику alias (None - в основную базу)."""
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def _replica_for(request):
+    replicas = _replicas()
+    # Cookie живет REPLICA_PIN_SECONDS секунд (max_age)
+    if not replicas or request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES:
+        return None
+    # Одна реплика на весь запрос: у разных реплик разное отставание
+    return random.choice(replicas)
+
+
+def replica_reads(view):
+    """Декоратор view (синхронного или асинхронного): чтения идут на реплику."""
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            with reading_from(_replica_for(request)):
+                return await view(request, *args, **kwargs)
+    else:
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            with reading_from(_replica_for(request)):
+                return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or model._meta.app_label in PRIMARY_APPS:
+            return None
+        # Внутри транзакции читаем то, что она уже записала
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики - копии основной базы, связи между их объектами допустимы
+        databases = {DEFAULT_DB_ALIAS, *_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaPinMiddleware(MiddlewareMixin):
+    """После изменяющего запроса на время привязывает чтения клиента к основной базе."""
+
+    def process_response(self, request, response):
+        if _replicas() and request.method not in SAFE_METHODS:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=_pin_seconds(),
+                httponly=True, samesite='Lax', secure=request.is_secure(),
+            )
+        return response
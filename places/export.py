@@ -0,0 +1,107 @@
+"""
+Выгрузка всех площадок для партнеров (CSV или GeoJSON).
+
+Строки читаются из базы порциями через values().iterator(chunk_size=...),
+без экземпляров моделей, и сериализуются по мере чтения. Поэтому и view
+export_places (StreamingHttpResponse), и команда export_places начинают
+отдавать данные сразу и не держат выгрузку в памяти целиком.
+"""
+import csv
+import json
+
+from .models import Photo, Place
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'geojson': 'application/geo+json',
+}
+CSV_COLUMNS = ('id', 'name', 'latitude', 'longitude', 'category', 'average_rating', 'rating_count', 'photo_url')
+DEFAULT_CHUNK_SIZE = 2000
+# Сколько строк склеивать в один отправляемый кусок: меньше мелких записей в сокет
+ROWS_PER_WRITE = 200
+
+
+def export_rows(chunk_size=DEFAULT_CHUNK_SIZE):
+    """Площадки в порядке id в виде словарей values()."""
+    return (
+        Place.objects.with_cover_photo()
+        .order_by('pk')
+        .values(
+            'id', 'name', 'latitude', 'longitude', 'category__name',
+            'average_rating', 'rating_count', 'first_photo_image',
+        )
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def _photo_url_builder(base_url):
+    storage = Photo._meta.get_field('image').storage
+    base_url = (base_url or '').rstrip('/')
+
+    def photo_url(name):
+        if not name:
+            return None
+        url = storage.url(name)
+        return base_url + url if url.startswith('/') else url
+
+    return photo_url
+
+
+def _grouped(lines):
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= ROWS_PER_WRITE:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+class _Line:
+    """Файлоподобный объект для csv.writer: возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_lines(rows, photo_url):
+    writer = csv.writer(_Line())
+    yield writer.writerow(CSV_COLUMNS)
+    for row in rows:
+        rating = row['average_rating']
+        yield writer.writerow([
+            row['id'], row['name'], row['latitude'], row['longitude'], row['category__name'] or '',
+            round(rating, 2) if rating is not None else '', row['rating_count'],
+            photo_url(row['first_photo_image']) or '',
+        ])
+
+
+def _geojson_lines(rows, photo_url):
+    yield '{"type":"FeatureCollection","features":['
+    separator = ''
+    for row in rows:
+        geometry = None
+        if row['latitude'] is not None and row['longitude'] is not None:
+            geometry = {'type': 'Point', 'coordinates': [float(row['longitude']), float(row['latitude'])]}
+        feature = {
+            'type': 'Feature',
+            'id': row['id'],
+            'geometry': geometry,
+            'properties': {
+                'name': row['name'],
+                'category': row['category__name'],
+                'average_rating': row['average_rating'],
+                'rating_count': row['rating_count'],
+                'photo_url': photo_url(row['first_photo_image']),
+            },
+        }
+        yield separator + json.dumps(feature, ensure_ascii=False, separators=(',', ':'))
+        separator = ','
+    yield ']}\n'
+
+
+def export_chunks(fmt, base_url='', chunk_size=DEFAULT_CHUNK_SIZE):
+    """Куски текста выгрузки в формате fmt ('csv' или 'geojson')."""
+    lines = _csv_lines if fmt == 'csv' else _geojson_lines
+    return _grouped(lines(export_rows(chunk_size), _photo_url_builder(base_url)))
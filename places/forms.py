@@ -1,9 +1,31 @@
 from django import forms
 from .models import Place, PendingPlace, Comment, Rating, Category
+from .catalog import category_catalog
+
+
+class CatalogChoiceIterator(forms.models.ModelChoiceIterator):
+    """Варианты выбора из кешированного справочника категорий вместо запроса к базе."""
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for category in category_catalog():
+            yield self.choice(category)
+
+    def __len__(self):
+        return len(category_catalog()) + (1 if self.field.empty_label is not None else 0)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(category_catalog())
+
+
+class CategoryChoiceField(forms.ModelChoiceField):
+    iterator = CatalogChoiceIterator
+
 
 class PlaceForm(forms.ModelForm):
     # Поле для выбора существующей категории
-    existing_category = forms.ModelChoiceField(
+    existing_category = CategoryChoiceField(
         queryset=Category.objects.all().order_by('name'),
         required=False,
         empty_label="Выберите категорию"
@@ -0,0 +1,56 @@
+"""
+Пространственный ключ площадок без PostGIS.
+
+Поверхность делится на равномерную сетку SPATIAL_CELL_DEGREES x SPATIAL_CELL_DEGREES
+градусов, ячейки нумеруются построчно: cell = row * SPATIAL_COLUMNS + column.
+В одной строке сетки соседние по долготе ячейки идут подряд, поэтому
+прямоугольник превращается в несколько диапазонов cell BETWEEN a AND b,
+каждый из которых - обычный range scan по B-tree индексу (и в Postgres, и в SQLite).
+"""
+import math
+
+SPATIAL_CELL_DEGREES = 0.01  # ~1.1 км по широте
+SPATIAL_ROWS = int(round(180 / SPATIAL_CELL_DEGREES))
+SPATIAL_COLUMNS = int(round(360 / SPATIAL_CELL_DEGREES))
+# Больше диапазонов в одном запросе не строим - берем один общий диапазон
+MAX_CELL_RANGES = 64
+
+
+def _row(latitude):
+    return min(max(int(math.floor((float(latitude) + 90) / SPATIAL_CELL_DEGREES)), 0), SPATIAL_ROWS - 1)
+
+
+def _column(longitude):
+    return min(max(int(math.floor((float(longitude) + 180) / SPATIAL_CELL_DEGREES)), 0), SPATIAL_COLUMNS - 1)
+
+
+def spatial_cell(latitude, longitude):
+    """Номер ячейки сетки для точки или None, если координат нет."""
+    if latitude is None or longitude is None:
+        return None
+    return _row(latitude) * SPATIAL_COLUMNS + _column(longitude)
+
+
+def bbox_cell_ranges(west, south, east, north):
+    """
+    Список диапазонов (first_cell, last_cell), покрывающих прямоугольник.
+    Если прямоугольник пересекает антимеридиан (west > east), долгота
+    разбивается на два интервала.
+    """
+    first_row, last_row = _row(south), _row(north)
+    if west <= east:
+        column_spans = [(_column(west), _column(east))]
+    else:
+        column_spans = [(_column(west), SPATIAL_COLUMNS - 1), (0, _column(east))]
+
+    rows = last_row - first_row + 1
+    if rows * len(column_spans) > MAX_CELL_RANGES:
+        # Слишком высокая область: один диапазон от первой до последней строки,
+        # лишние точки отсекает точный фильтр по координатам
+        return [(first_row * SPATIAL_COLUMNS, last_row * SPATIAL_COLUMNS + SPATIAL_COLUMNS - 1)]
+
+    return [
+        (row * SPATIAL_COLUMNS + first_column, row * SPATIAL_COLUMNS + last_column)
+        for row in range(first_row, last_row + 1)
+        for first_column, last_column in column_spans
+    ]
@@ -0,0 +1,234 @@
+"""
+Уменьшенные копии (варианты) фотографий площадок и обложек категорий.
+
+Для каждого изображения строятся варианты VARIANT_WIDTHS в форматах WebP
+и JPEG. Кодирование Pillow выполняется в пуле процессов, файлы сохраняются
+через storage поля, а пути записываются в JSON-поле самой записи
+(Photo.variants, Category.cover_variants). Пока вариантов нет, шаблоны
+показывают оригинал.
+
+В фоне (schedule_variants) результаты кодирования записывает отдельный
+поток с собственным соединением с базой, а не служебный поток пула
+процессов. Записи, которые фон не успел обработать (например, процесс
+перезапустился), достраивает команда build_image_variants.
+"""
+import io
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .storage import release_file
+
+logger = logging.getLogger(__name__)
+
+# Ширина каждого варианта в пикселях
+VARIANT_WIDTHS = {
+    'popup': 200,
+    'card': 400,
+    'gallery': 1200,
+}
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+_pool = None
+_writer = None
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=getattr(settings, 'IMAGE_VARIANT_WORKERS', None))
+    return _pool
+
+
+def _get_writer():
+    # Один поток записывает результаты в storage и базу по очереди
+    global _writer
+    if _writer is None:
+        _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='image-variants')
+    return _writer
+
+
+def render_variants(data):
+    """
+    Кодирует все варианты изображения. Выполняется в дочернем процессе,
+    поэтому работает только с байтами и не трогает ORM.
+    Возвращает {variant: {'width': w, 'webp': bytes, 'jpeg': bytes}}.
+    """
+    with Image.open(io.BytesIO(data)) as source:
+        source = ImageOps.exif_transpose(source)
+        if source.mode not in ('RGB', 'RGBA'):
+            source = source.convert('RGBA' if 'A' in source.getbands() else 'RGB')
+
+        result = {}
+        for variant, width in VARIANT_WIDTHS.items():
+            image = source.copy()
+            # thumbnail() не увеличивает маленькие изображения
+            image.thumbnail((width, width * 4), Image.Resampling.LANCZOS)
+            encoded = {'width': image.width}
+            for fmt, (pil_format, options) in FORMATS.items():
+                frame = image
+                if pil_format == 'JPEG' and image.mode == 'RGBA':
+                    # JPEG не поддерживает прозрачность - кладем на белый фон
+                    frame = Image.new('RGB', image.size, (255, 255, 255))
+                    frame.paste(image, mask=image.getchannel('A'))
+                buffer = io.BytesIO()
+                frame.save(buffer, pil_format, **options)
+                encoded[fmt] = buffer.getvalue()
+            result[variant] = encoded
+        return result
+
+
+def _variant_name(original_name, variant, fmt):
+    directory, filename = os.path.split(original_name)
+    stem = os.path.splitext(filename)[0]
+    extension = 'jpg' if fmt == 'jpeg' else fmt
+    return f'{directory}/variants/{stem}_{variant}.{extension}'
+
+
+def _save_variants(field_file, rendered):
+    """Сохраняет байты вариантов в storage поля и возвращает словарь путей."""
+    variants = {}
+    for variant, encoded in rendered.items():
+        stored = {'width': encoded['width']}
+        for fmt in FORMATS:
+            name = _variant_name(field_file.name, variant, fmt)
+            stored[fmt] = field_file.storage.save(name, ContentFile(encoded[fmt]))
+        variants[variant] = stored
+    return variants
+
+
+def release_variants(field_file, variants):
+    """Снимает ссылки на файлы вариантов (см. places.storage)."""
+    for stored in (variants or {}).values():
+        for fmt in FORMATS:
+            release_file(field_file.storage, stored.get(fmt))
+
+
+def _image_field(instance):
+    """Имена поля изображения и поля вариантов для Photo и Category."""
+    if hasattr(instance, 'cover_variants'):
+        return 'cover_photo', 'cover_variants'
+    return 'image', 'variants'
+
+
+def _read(field_file):
+    with field_file.storage.open(field_file.name, 'rb') as source:
+        return source.read()
+
+
+def generate_variants(instances):
+    """
+    Строит варианты для списка Photo или Category в пуле процессов и
+    сохраняет пути в записи. Ждет завершения; возвращает число обработанных.
+    """
+    jobs = []
+    pool = _get_pool()
+    for instance in instances:
+        image_field, _ = _image_field(instance)
+        field_file = getattr(instance, image_field)
+        if not field_file:
+            continue
+        try:
+            data = _read(field_file)
+        except OSError:
+            logger.warning('Не удалось прочитать %s', field_file.name)
+            continue
+        jobs.append((instance, pool.submit(render_variants, data)))
+
+    done = 0
+    for instance, future in jobs:
+        image_field, variants_field = _image_field(instance)
+        try:
+            rendered = future.result()
+        except Exception:
+            logger.exception('Не удалось обработать %s', getattr(instance, image_field).name)
+            continue
+        variants = _store_variants(type(instance), instance.pk, getattr(instance, image_field).name, rendered)
+        if variants is not None:
+            setattr(instance, variants_field, variants)
+            done += 1
+    return done
+
+
+def _store_variants(model, pk, name, rendered):
+    """
+    Сохраняет варианты изображения name и записывает пути в запись pk.
+    Прежние варианты освобождаются после коммита. Запись удалена или
+    изображение за время кодирования заменено - ничего не сохраняет и
+    возвращает None.
+    """
+    with transaction.atomic():
+        instance = model.objects.select_for_update().filter(pk=pk).first()
+        if instance is None:
+            return None
+        image_field, variants_field = _image_field(instance)
+        field_file = getattr(instance, image_field)
+        if field_file.name != name:
+            return None
+        previous = getattr(instance, variants_field)
+        variants = _save_variants(field_file, rendered)
+        # Новые варианты меняют разметку страниц: сдвигаем отметку для ETag (places.conditional)
+        model.objects.filter(pk=pk).update(**{variants_field: variants, 'updated_at': timezone.now()})
+        release_variants(field_file, previous)
+    return variants
+
+
+def _store_async_result(model, pk, name, future):
+    # Выполняется в потоке записи (_get_writer): у него свое соединение с БД,
+    # которое закрываем по правилам CONN_MAX_AGE, как после запроса
+    close_old_connections()
+    try:
+        _store_variants(model, pk, name, future.result())
+    except Exception:
+        logger.exception('Не удалось сохранить варианты %s #%s', model.__name__, pk)
+    finally:
+        close_old_connections()
+
+
+def schedule_variants(instances):
+    """
+    Ставит построение вариантов в пул после коммита текущей транзакции и
+    не ждет результата. При IMAGE_VARIANTS_ASYNC = False обрабатывает сразу.
+    """
+    instances = list(instances)
+    if not instances:
+        return
+
+    def submit():
+        if not getattr(settings, 'IMAGE_VARIANTS_ASYNC', True):
+            generate_variants(instances)
+            return
+        pool = _get_pool()
+        for instance in instances:
+            image_field, _ = _image_field(instance)
+            field_file = getattr(instance, image_field)
+            if not field_file:
+                continue
+            try:
+                future = pool.submit(render_variants, _read(field_file))
+            except OSError:
+                logger.warning('Не удалось прочитать %s', field_file.name)
+                continue
+            # Колбэк выполняется в служебном потоке пула процессов (или сразу, если
+            # результат уже готов): там только передаем запись потоку записи
+            future.add_done_callback(
+                lambda f, model=type(instance), pk=instance.pk, name=field_file.name:
+                    _get_writer().submit(_store_async_result, model, pk, name, f)
+            )
+
+    transaction.on_commit(submit)
+
+
+def variant_url(storage, variants, variant, fmt='webp'):
+    """URL конкретного варианта или None, если он еще не построен."""
+    name = (variants or {}).get(variant, {}).get(fmt)
+    return storage.url(name) if name else None
@@ -0,0 +1,135 @@
+"""
+Таблица лидеров площадок (LeaderboardEntry) с байесовской оценкой.
+
+Среднее по нескольким голосам ненадежно: одна оценка 5 не должна обгонять
+500 оценок со средним 4.9. Поэтому площадки ранжируются по
+
+    score = (rating_sum + m * C) / (rating_count + m),
+
+где C - средняя оценка по всем площадкам (априорное среднее), а
+m = LEADERBOARD_PRIOR_VOTES - сколько «виртуальных» голосов со средним C
+добавляется каждой площадке. Мало голосов - оценка близка к C, много -
+к собственному среднему площадки.
+
+Строка есть у каждой оцененной площадки. Топ всего сайта и топ категории
+читаются одним запросом по индексу (-score) или (category, -score).
+
+Обновление:
+    refresh_places(ids) - после записи оценки или смены категории, с текущим C;
+    rebuild_leaderboard() - команда rebuild_leaderboard по расписанию:
+        пересчитывает C и оценки всех площадок.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum
+
+from .conditional import touch_categories
+from .models import Category, LeaderboardEntry, Place
+from .page_cache import invalidate_all_pages
+
+PRIOR_KEY = 'places:leaderboard:prior'
+# Априорное среднее, пока оценок нет совсем
+DEFAULT_PRIOR = 3.0
+BATCH_SIZE = 1000
+
+
+def _prior_votes():
+    return getattr(settings, 'LEADERBOARD_PRIOR_VOTES', 10)
+
+
+def bayesian_score(rating_sum, rating_count, prior_mean, prior_votes):
+    return (rating_sum + prior_votes * prior_mean) / (rating_count + prior_votes)
+
+
+def _compute_prior():
+    totals = Place.objects.aggregate(rating_sum=Sum('rating_sum'), rating_count=Sum('rating_count'))
+    if not totals['rating_count']:
+        return DEFAULT_PRIOR
+    return totals['rating_sum'] / totals['rating_count']
+
+
+def prior_mean():
+    """Априорное среднее C: из кеша, а при его отсутствии - по всем площадкам."""
+    prior = cache.get(PRIOR_KEY)
+    if prior is None:
+        prior = _compute_prior()
+        cache.set(PRIOR_KEY, prior, timeout=None)
+    return prior
+
+
+def _entries(rows, prior):
+    votes = _prior_votes()
+    return [
+        LeaderboardEntry(
+            place_id=pk, category_id=category_id,
+            score=bayesian_score(rating_sum, rating_count, prior, votes),
+        )
+        for pk, category_id, rating_sum, rating_count in rows
+    ]
+
+
+def _save(entries):
+    LeaderboardEntry.objects.bulk_create(
+        entries, batch_size=BATCH_SIZE,
+        update_conflicts=True, unique_fields=['place'], update_fields=['category', 'score', 'updated_at'],
+    )
+
+
+def refresh_places(place_ids):
+    """
+    Пересчитывает строки площадок по их хранимым агрегатам оценок.
+    Площадки без оценок из таблицы убираются.
+    """
+    place_ids = [pk for pk in place_ids if pk is not None]
+    if not place_ids:
+        return
+    rows = list(
+        Place.objects.filter(pk__in=place_ids, rating_count__gt=0)
+        .values_list('pk', 'category_id', 'rating_sum', 'rating_count')
+    )
+    _save(_entries(rows, prior_mean()))
+    rated = {row[0] for row in rows}
+    LeaderboardEntry.objects.filter(place_id__in=set(place_ids) - rated).delete()
+
+
+def rebuild_leaderboard():
+    """
+    Пересчитывает C и оценки всех площадок. Возвращает число строк таблицы.
+    Читатели до коммита видят прежнюю таблицу целиком.
+    """
+    prior = _compute_prior()
+    with transaction.atomic():
+        rows = (
+            Place.objects.filter(rating_count__gt=0).order_by('pk')
+            .values_list('pk', 'category_id', 'rating_sum', 'rating_count')
+        )
+        total = 0
+        batch = []
+        for row in rows.iterator(chunk_size=BATCH_SIZE):
+            batch.append(row)
+            if len(batch) == BATCH_SIZE:
+                _save(_entries(batch, prior))
+                total += len(batch)
+                batch = []
+        _save(_entries(batch, prior))
+        total += len(batch)
+        LeaderboardEntry.objects.exclude(place__rating_count__gt=0).delete()
+        # Оценки сдвинулись во всех категориях: топы на страницах и их ETag устарели
+        touch_categories(Category.objects.values_list('pk', flat=True))
+        invalidate_all_pages()
+    cache.set(PRIOR_KEY, prior, timeout=None)
+    return total
+
+
+def top_places(category_id=None, limit=8, with_cover=True):
+    """
+    Ленивый queryset лучших площадок по байесовской оценке: всего сайта
+    или одной категории. with_cover - с обложкой для карточек (with_cover_photo).
+    """
+    places = Place.objects.with_cover_photo() if with_cover else Place.objects.all()
+    if category_id is None:
+        places = places.filter(leaderboard__isnull=False)
+    else:
+        places = places.filter(leaderboard__category_id=category_id)
+    return places.order_by('-leaderboard__score', 'leaderboard__place')[:limit]
@@ -0,0 +1,224 @@
+import asyncio
+import importlib
+import io
+import json
+import platform
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import django
+from asgiref.sync import ThreadSensitiveContext
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import clear_url_caches, reverse
+
+from places.models import Category, Place
+
+VIEWS = ('home', 'category_detail', 'place_detail')
+
+
+def _percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+
+def _summary(timings, errors, elapsed):
+    return {
+        'requests': len(timings),
+        'errors': errors,
+        'rps': round(len(timings) / elapsed, 1),
+        'p50_ms': round(_percentile(timings, 0.5) * 1000, 2),
+        'p95_ms': round(_percentile(timings, 0.95) * 1000, 2),
+    }
+
+
+@contextmanager
+def _async_views(enabled):
+    """Подменяет маршруты places.urls синхронными или асинхронными view (ASYNC_VIEWS)."""
+    def reload_urls():
+        importlib.reload(importlib.import_module('places.urls'))
+        importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+        clear_url_caches()
+
+    try:
+        with override_settings(ASYNC_VIEWS=enabled):
+            reload_urls()
+            yield
+    finally:
+        reload_urls()
+
+
+@contextmanager
+def _db_latency(seconds):
+    """
+    Добавляет задержку к каждому SQL-запросу - как сетевой round-trip до
+    отдельного сервера базы. Без нее SQLite в памяти отвечает мгновенно и
+    ожидание базы, которое и перекрывает ASGI, не видно.
+    """
+    def wrapper(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def install(connection, **kwargs):
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
+
+    if not seconds:
+        yield
+        return
+    for conn in connections.all(initialized_only=True):
+        install(conn)
+    connection_created.connect(install)
+    try:
+        yield
+    finally:
+        connection_created.disconnect(install)
+        for conn in connections.all(initialized_only=True):
+            if wrapper in conn.execute_wrappers:
+                conn.execute_wrappers.remove(wrapper)
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест главной, категории и площадки: один синхронный WSGI-воркер '
+            '(запросы по одному) против одного ASGI-воркера с асинхронными view (places.async_views). '
+            'Клиенты внутри процесса держат --concurrency одновременных запросов. '
+            'Работает на отдельной тестовой базе; удобнее запускать с DJANGO_SETTINGS_MODULE=config.settings_sqlite.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--places', type=int, default=1000, help='Количество площадок в тестовой базе')
+        parser.add_argument('--requests', type=int, default=200, help='Запросов на каждый view и режим')
+        parser.add_argument('--concurrency', type=int, default=20, help='Одновременных клиентов')
+        parser.add_argument('--db-latency', type=float, default=2.0,
+                            help='Задержка каждого SQL-запроса, мс (сеть до сервера базы); 0 - без задержки')
+        parser.add_argument('--wsgi-threads', type=int, default=1,
+                            help='Потоков у WSGI-воркера (1 - классический sync-воркер)')
+        parser.add_argument('--views', default=','.join(VIEWS), help='Через запятую, из: ' + ', '.join(VIEWS))
+        parser.add_argument('--page-cache', action='store_true',
+                            help='Не выключать кеш страниц и фрагментов (по умолчанию каждый запрос рендерится)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='Файл для результатов в JSON')
+
+    def handle(self, *args, **options):
+        views = [name for name in options['views'].split(',') if name]
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            call_command(
+                'generate_dataset', places=options['places'], categories=10, users=50,
+                seed=options['seed'], stdout=io.StringIO(),
+            )
+            login = Client()
+            login.force_login(User.objects.create_user('bench_async'))
+            self.session_key = login.cookies[settings.SESSION_COOKIE_NAME].value
+            self.urls = self._urls()
+            # Под нагрузкой только чтение: сброс счетчиков просмотров в базу не попадает в замер
+            overrides = {'VIEW_COUNTER_FLUSH_INTERVAL': 3600}
+            if not options['page_cache']:
+                overrides['PAGE_CACHE_ENABLED'] = False
+            with override_settings(**overrides), _db_latency(options['db_latency'] / 1000):
+                results = self._run(views, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['output']:
+            report = {
+                'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'options': {key: options[key] for key in (
+                    'places', 'requests', 'concurrency', 'db_latency', 'wsgi_threads', 'page_cache',
+                )},
+                'results': results,
+            }
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Результаты сохранены в {options['output']}")
+
+    def _urls(self):
+        category = Category.objects.order_by('-place_count', 'pk').first()
+        place = Place.objects.filter(category=category).order_by('pk').first()
+        return {
+            'home': reverse('home'),
+            'category_detail': reverse('category_detail', args=[category.slug]),
+            'place_detail': reverse('place_detail', args=[place.pk]),
+        }
+
+    def _run(self, views, options):
+        results = {}
+        for name in views:
+            url = self.urls[name]
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{name}: {url}'))
+            with _async_views(False):
+                wsgi = self._wsgi(url, options)
+            with _async_views(True):
+                asgi = asyncio.run(self._asgi(url, options))
+            results[name] = {'wsgi': wsgi, 'asgi': asgi}
+            for mode, row in (('WSGI', wsgi), ('ASGI', asgi)):
+                self.stdout.write(
+                    f"  {mode}  {row['rps']:8.1f} запр/с  p50={row['p50_ms']:8.2f} мс  "
+                    f"p95={row['p95_ms']:8.2f} мс  ошибок={row['errors']}"
+                )
+            if wsgi['rps']:
+                self.stdout.write(f"  ASGI/WSGI: x{asgi['rps'] / wsgi['rps']:.1f}")
+        return results
+
+    def _wsgi(self, url, options):
+        timings, errors = [], []
+        lock = threading.Lock()
+
+        def client_loop(client, count):
+            for _ in range(count):
+                started = time.perf_counter()
+                response = worker.submit(client.get, url).result()
+                with lock:
+                    timings.append(time.perf_counter() - started)
+                    if response.status_code != 200:
+                        errors.append(response.status_code)
+
+        counts = self._split(options['requests'], options['concurrency'])
+        clients = [self._login(Client()) for _ in counts]
+        started = time.perf_counter()
+        # Воркер обрабатывает не больше wsgi_threads запросов одновременно, остальные ждут в очереди
+        with ThreadPoolExecutor(max_workers=options['wsgi_threads']) as worker, \
+                ThreadPoolExecutor(max_workers=len(counts)) as pool:
+            list(pool.map(client_loop, clients, counts))
+        return _summary(timings, len(errors), time.perf_counter() - started)
+
+    async def _asgi(self, url, options):
+        timings, errors = [], []
+
+        async def client_loop(client, count):
+            for _ in range(count):
+                started = time.perf_counter()
+                # Как ASGIHandler: у каждого запроса свой поток для sync_to_async
+                async with ThreadSensitiveContext():
+                    response = await client.get(url)
+                timings.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    errors.append(response.status_code)
+
+        counts = self._split(options['requests'], options['concurrency'])
+        clients = [self._login(AsyncClient()) for _ in counts]
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client, count) for client, count in zip(clients, counts)))
+        return _summary(timings, len(errors), time.perf_counter() - started)
+
+    def _login(self, client):
+        # Сессии создаются заранее и по очереди: под нагрузкой в базу никто не пишет
+        client.cookies[settings.SESSION_COOKIE_NAME] = self.session_key
+        return client
+
+    @staticmethod
+    def _split(total, parts):
+        parts = max(1, min(parts, total))
+        return [total // parts + (1 if index < total % parts else 0) for index in range(parts)]
@@ -0,0 +1,66 @@
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from places.models import Category, PendingPlace, Photo, Place
+from places.moderation import approve_submissions
+
+
+class Command(BaseCommand):
+    help = ('Замеряет пакетное одобрение заявок модерации на синтетической очереди. '
+            'Данные создаются внутри транзакции и откатываются в конце.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--submissions', type=int, default=10_000)
+        parser.add_argument('--edit-share', type=float, default=0.2, help='Доля заявок на редактирование')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        total = options['submissions']
+        edits = int(total * options['edit_share'])
+
+        with transaction.atomic():
+            user = User.objects.create(username='bench-moderation')
+            categories = Category.objects.bulk_create(
+                [Category(name=f'bench-moderation-{i}', slug=f'bench-moderation-{i}') for i in range(10)]
+            )
+            originals = Place.objects.bulk_create(
+                [Place(name=f'Существующая {i}', description='', category=rng.choice(categories)) for i in range(max(edits, 1))]
+            )
+
+            def point():
+                return round(53.9 + rng.uniform(-0.2, 0.2), 6), round(27.56 + rng.uniform(-0.3, 0.3), 6)
+
+            submissions = []
+            for i in range(total):
+                latitude, longitude = point()
+                is_edit = i < edits
+                submissions.append(PendingPlace(
+                    name=f'Заявка {i}', description='описание', latitude=latitude, longitude=longitude,
+                    user=user, category=rng.choice(categories),
+                    action='edit' if is_edit else 'add',
+                    original_place=originals[i % len(originals)] if is_edit else None,
+                ))
+            submissions = PendingPlace.objects.bulk_create(submissions, batch_size=2000)
+            # По одному фото на каждую вторую заявку
+            Photo.objects.bulk_create(
+                [Photo(pending_place=s, image='place_photos/bench.png') for s in submissions[::2]],
+                batch_size=2000,
+            )
+
+            queue = PendingPlace.objects.filter(user=user)
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                approved = approve_submissions(queue)
+                elapsed = time.perf_counter() - started
+
+            linked = Photo.objects.filter(pending_place__isnull=True, place__isnull=False, image='place_photos/bench.png').count()
+            transaction.set_rollback(True)
+
+        self.stdout.write(f'Одобрено заявок: {approved} (правок: {edits}), перенесено фото: {linked}')
+        self.stdout.write(f'Время: {elapsed:.2f} с ({approved / elapsed:.0f} заявок/с), SQL-запросов: {len(queries)}')
@@ -0,0 +1,92 @@
+import math
+import random
+import statistics
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from places.geo import spatial_cell
+from places.models import Category, Place
+from places.nearby import EARTH_RADIUS_KM, nearest_places, rank_by_distance
+
+
+def _haversine_scalar(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda q: samples[min(int(q * len(samples)), len(samples) - 1)] * 1000
+    return f'p50={pick(0.5):.2f} мс  p95={pick(0.95):.2f} мс  p99={pick(0.99):.2f} мс  mean={statistics.mean(samples) * 1000:.2f} мс'
+
+
+class Command(BaseCommand):
+    help = ('Замеряет задержку поиска ближайших площадок на синтетических данных. '
+            'Данные создаются внутри транзакции и откатываются в конце.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--places', type=int, default=100_000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--radius', type=float, default=3.0)
+        parser.add_argument('-k', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        # Площадки разбросаны по квадрату ~55x45 км вокруг Минска
+        center_lat, center_lon, spread = 53.9, 27.5667, 0.25
+
+        def random_point():
+            return (center_lat + rng.uniform(-spread, spread), center_lon + rng.uniform(-spread * 1.7, spread * 1.7))
+
+        queries = [random_point() for _ in range(options['queries'])]
+
+        # Чистый расчет на массивах: сколько стоит сама ранжировка без базы
+        points = np.array([random_point() for _ in range(options['places'])])
+        numpy_times = []
+        for lat, lon in queries:
+            started = time.perf_counter()
+            rank_by_distance(lat, lon, points[:, 0], points[:, 1], options['radius'], options['k'])
+            numpy_times.append(time.perf_counter() - started)
+
+        # Для сравнения - поштучный расчет в цикле Python по тем же точкам
+        python_times = []
+        sample = points.tolist()
+        for lat, lon in queries[:10]:
+            started = time.perf_counter()
+            sorted(sample, key=lambda p: _haversine_scalar(lat, lon, p[0], p[1]))[:options['k']]
+            python_times.append(time.perf_counter() - started)
+
+        with transaction.atomic():
+            category = Category.objects.create(name='bench-nearby', slug='bench-nearby')
+            Place.objects.bulk_create(
+                [
+                    Place(
+                        name=f'Площадка {i}', description='', category=category,
+                        latitude=round(lat, 6), longitude=round(lon, 6),
+                        spatial_cell=spatial_cell(lat, lon),
+                    )
+                    for i, (lat, lon) in enumerate(points.tolist())
+                ],
+                batch_size=5000,
+            )
+
+            db_times, found = [], []
+            for lat, lon in queries:
+                started = time.perf_counter()
+                result = nearest_places(lat, lon, options['radius'], options['k'], category)
+                db_times.append(time.perf_counter() - started)
+                found.append(len(result))
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"Площадок: {options['places']}, запросов: {options['queries']}, "
+                          f"радиус {options['radius']} км, k={options['k']}")
+        self.stdout.write(f'NumPy ранжирование по всем точкам:  {_percentiles(numpy_times)}')
+        self.stdout.write(f'Python-цикл по всем точкам:         {_percentiles(python_times)}')
+        self.stdout.write(f'nearest_places (индекс + NumPy):    {_percentiles(db_times)}')
+        self.stdout.write(f'В среднем найдено: {statistics.mean(found):.1f}')
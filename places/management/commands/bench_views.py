@@ -0,0 +1,182 @@
+import io
+import json
+import platform
+import statistics
+import time
+
+import django
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import URLPattern, reverse
+
+from places import urls
+from places.models import Category, Place
+
+# Параметры запроса для view, которым без них нечего возвращать
+QUERY_PARAMS = {
+    'category_map_clusters': {'bbox': '27.3,53.75,27.8,54.05', 'zoom': 12},
+    'api_places': {'bbox': '27.5,53.85,27.6,53.95'},
+    'api_places_nearby': {'lat': 53.9, 'lon': 27.56, 'radius': 3},
+    'api_places_search': {'q': 'площ'},
+    'search': {'q': 'футбол покрыт'},
+}
+
+
+def _percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+
+def _body(response):
+    return b''.join(response.streaming_content) if response.streaming else response.content
+
+
+def _patterns():
+    """Уникальные по view маршруты places/urls.py (about/contacts/... ведут на home)."""
+    seen = set()
+    for pattern in urls.urlpatterns:
+        if not isinstance(pattern, URLPattern) or pattern.callback in seen:
+            continue
+        seen.add(pattern.callback)
+        yield pattern
+
+
+def _sample_kwargs(pattern):
+    """Аргументы маршрута: берем самую «тяжелую» категорию и площадку из нее."""
+    category = Category.objects.order_by('-place_count', 'pk').first()
+    place = Place.objects.filter(category=category).order_by('pk').first() if category else None
+    values = {
+        'category_slug': category.slug if category else None,
+        'place_id': place.pk if place else None,
+    }
+    kwargs = {name: values.get(name) for name in pattern.pattern.converters}
+    if any(value is None for value in kwargs.values()):
+        return None
+    return kwargs
+
+
+class Command(BaseCommand):
+    help = ('Замеряет задержку (p50/p95/p99) и количество SQL-запросов каждого view из places/urls.py '
+            'на нескольких объемах данных. Работает на отдельной тестовой базе и сохраняет результат в JSON. '
+            'Удобнее запускать с DJANGO_SETTINGS_MODULE=config.settings_sqlite.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10,100,1000', help='Количество площадок, через запятую')
+        parser.add_argument('--requests', type=int, default=20, help='Запросов на каждый view')
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='Файл для результатов в JSON')
+        parser.add_argument('--baseline', help='JSON предыдущего запуска для сравнения')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Допустимый рост p50, доля (0.25 = +25%%)')
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as f:
+                baseline = json.load(f)
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = self._run(sizes, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'requests': options['requests'],
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Результаты сохранены в {options['output']}")
+
+        if baseline is not None:
+            regressions = self._compare(baseline, report, options['tolerance'])
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f'Регрессий: {len(regressions)}')
+
+    def _run(self, sizes, options):
+        client = Client()
+        user = User.objects.create_user('bench_admin', is_staff=True)
+        client.force_login(user)
+
+        results = {}
+        current = 0
+        for size in sizes:
+            # Данные наращиваются: на каждом шаге добавляется только разница
+            call_command(
+                'generate_dataset', places=size - current, categories=10 if current == 0 else 0,
+                users=50 if current == 0 else 0, seed=options['seed'] + size, stdout=io.StringIO(),
+            )
+            current = size
+            self.stdout.write(self.style.MIGRATE_HEADING(f'Площадок: {size}'))
+
+            results[str(size)] = {}
+            for pattern in _patterns():
+                kwargs = _sample_kwargs(pattern)
+                if kwargs is None:
+                    continue
+                url = reverse(pattern.name, kwargs=kwargs)
+                params = QUERY_PARAMS.get(pattern.name, {})
+
+                for _ in range(options['warmup']):
+                    _body(client.get(url, params))
+
+                timings, queries = [], []
+                for _ in range(options['requests']):
+                    with CaptureQueriesContext(connection) as captured:
+                        started = time.perf_counter()
+                        response = client.get(url, params)
+                        # Потоковый ответ (выгрузка) тоже нужно прочитать до конца
+                        body = _body(response)
+                        timings.append(time.perf_counter() - started)
+                    queries.append(len(captured.captured_queries))
+
+                row = {
+                    'url': url,
+                    'status': response.status_code,
+                    'p50_ms': round(_percentile(timings, 0.5) * 1000, 3),
+                    'p95_ms': round(_percentile(timings, 0.95) * 1000, 3),
+                    'p99_ms': round(_percentile(timings, 0.99) * 1000, 3),
+                    'mean_ms': round(statistics.mean(timings) * 1000, 3),
+                    'queries': max(queries),
+                    'bytes': len(body),
+                }
+                results[str(size)][pattern.name] = row
+                self.stdout.write(
+                    f"  {pattern.name:<24} {row['status']}  p50={row['p50_ms']:8.2f} мс  "
+                    f"p95={row['p95_ms']:8.2f} мс  p99={row['p99_ms']:8.2f} мс  запросов={row['queries']}"
+                )
+        return results
+
+    def _compare(self, baseline, report, tolerance):
+        """Печатает сравнение с baseline и возвращает список регрессий."""
+        self.stdout.write(self.style.MIGRATE_HEADING('Сравнение с baseline'))
+        regressions = []
+        for size, views in report['results'].items():
+            for name, row in views.items():
+                before = baseline.get('results', {}).get(size, {}).get(name)
+                if before is None:
+                    continue
+                change = (row['p50_ms'] - before['p50_ms']) / before['p50_ms'] if before['p50_ms'] else 0.0
+                line = (f"  {size:>6} {name:<24} p50 {before['p50_ms']:.2f} -> {row['p50_ms']:.2f} мс "
+                        f"({change:+.0%}), запросов {before['queries']} -> {row['queries']}")
+                if change > tolerance or row['queries'] > before['queries']:
+                    regressions.append((size, name))
+                    self.stdout.write(self.style.ERROR(line))
+                else:
+                    self.stdout.write(line)
+        return regressions
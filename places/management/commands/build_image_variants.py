@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from places.images import generate_variants
+from places.models import Category, Photo
+
+
+class Command(BaseCommand):
+    help = 'Строит уменьшенные копии (WebP/JPEG) для фото площадок и обложек категорий'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Пересоздать варианты, даже если они уже есть')
+        parser.add_argument('--batch-size', type=int, default=50)
+
+    def handle(self, *args, **options):
+        photos = Photo.objects.exclude(image='')
+        categories = Category.objects.exclude(cover_photo='').exclude(cover_photo__isnull=True)
+        if not options['force']:
+            photos = photos.filter(variants={})
+            categories = categories.filter(cover_variants={})
+
+        batch_size = options['batch_size']
+        total = 0
+        for queryset in (photos, categories):
+            batch = []
+            for instance in queryset.iterator(chunk_size=batch_size):
+                batch.append(instance)
+                if len(batch) >= batch_size:
+                    total += generate_variants(batch)
+                    batch = []
+            if batch:
+                total += generate_variants(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Обработано изображений: {total}'))
@@ -0,0 +1,31 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from places.export import DEFAULT_CHUNK_SIZE, FORMATS, export_chunks
+
+
+class Command(BaseCommand):
+    help = 'Выгружает все площадки в CSV или GeoJSON потоково, не загружая их в память целиком'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--output', help='Файл для выгрузки (по умолчанию - stdout)')
+        parser.add_argument('--base-url', default='', help='Префикс для URL фото, например https://example.com')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        chunks = export_chunks(options['format'], options['base_url'], options['chunk_size'])
+        written = 0
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                for chunk in chunks:
+                    written += output.write(chunk)
+            self.stderr.write(self.style.SUCCESS(
+                f"Записано {written} символов в {options['output']} за {time.perf_counter() - started:.1f} с"
+            ))
+        else:
+            for chunk in chunks:
+                sys.stdout.write(chunk)
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from places.counters import flush_view_counts
+
+
+class Command(BaseCommand):
+    help = 'Сбрасывает накопленные просмотры категорий в базу (для запуска по cron в режиме cache)'
+
+    def handle(self, *args, **options):
+        mode = getattr(settings, 'VIEW_COUNTER_MODE', 'memory')
+        if mode == 'memory':
+            # Буферы живут в памяти процессов сервера, отдельный процесс команды их не видит
+            raise CommandError(
+                'VIEW_COUNTER_MODE = memory: просмотры сбрасывают сами процессы сервера. '
+                'Команда нужна в режиме cache'
+            )
+        updated = flush_view_counts()
+        self.stdout.write(self.style.SUCCESS(f'Обновлены счетчики для {updated} категорий'))
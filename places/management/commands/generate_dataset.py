@@ -0,0 +1,131 @@
+import os
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from places.catalog import invalidate_category_catalog
+from places.clustering import rebuild_clusters
+from places.counters import rebuild_comment_counts, rebuild_place_counts
+from places.page_cache import invalidate_all_pages
+from places.geo import spatial_cell
+from places.leaderboard import rebuild_leaderboard
+from places.models import Category, Comment, Photo, Place, Rating
+from places.ratings import rebuild_rating_aggregates
+from places.search import index_places
+
+SPORTS = ['Футбол', 'Баскетбол', 'Волейбол', 'Теннис', 'Бадминтон', 'Каток', 'Воркаут', 'Лыжи', 'Скалодром', 'Пляжный волейбол']
+WORDS = ['площадка', 'поле', 'корт', 'стадион', 'парк', 'школа', 'двор', 'набережная', 'центр', 'арена']
+PHRASES = ['Отличное покрытие', 'Есть освещение', 'Бесплатно', 'Много людей по вечерам', 'Рядом парковка', 'Есть раздевалки']
+
+
+def _media_files(folder):
+    """Существующие картинки из MEDIA_ROOT, чтобы не генерировать файлы."""
+    path = os.path.join(settings.MEDIA_ROOT, folder)
+    if not os.path.isdir(path):
+        return []
+    return sorted(f'{folder}/{name}' for name in os.listdir(path) if name.lower().endswith(('.png', '.jpg', '.jpeg')))
+
+
+class Command(BaseCommand):
+    help = ('Генерирует воспроизводимый синтетический набор данных: категории, площадки, '
+            'оценки, комментарии и фото. Данные добавляются к уже существующим.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--places', type=int, default=1000)
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--ratings-per-place', type=int, default=5, help='Максимум оценок на площадку')
+        parser.add_argument('--comments-per-place', type=int, default=3, help='Максимум комментариев на площадку')
+        parser.add_argument('--photos-per-place', type=int, default=2, help='Максимум фото на площадку')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+        started = time.perf_counter()
+
+        with transaction.atomic():
+            # Смещения позволяют запускать команду повторно без конфликтов уникальных полей
+            user_offset = User.objects.count()
+            new_users = User.objects.bulk_create(
+                [
+                    User(username=f'bench_user_{user_offset + i}', password=make_password(None))
+                    for i in range(options['users'])
+                ],
+                batch_size=batch_size,
+            )
+            # --users 0: авторы - существующие пользователи, их хватает на ratings_per_place
+            # разных оценок каждой площадке (уникальность place + user)
+            users = new_users or list(User.objects.order_by('pk')[:max(options['ratings_per_place'], 1)])
+            if not users:
+                raise CommandError('Пользователей нет: укажите --users больше 0')
+
+            covers = _media_files('category_covers')
+            category_offset = Category.objects.count()
+            new_categories = Category.objects.bulk_create(
+                [
+                    Category(
+                        name=f'{SPORTS[i % len(SPORTS)]} {category_offset + i}',
+                        slug=f'category-{category_offset + i}',
+                        cover_photo=rng.choice(covers) if covers else None,
+                        view_count=rng.randint(0, 10_000),
+                    )
+                    for i in range(options['categories'])
+                ],
+                batch_size=batch_size,
+            )
+            categories = new_categories or list(Category.objects.all())
+
+            places = []
+            for i in range(options['places']):
+                latitude = round(53.9 + rng.uniform(-0.15, 0.15), 6)
+                longitude = round(27.56 + rng.uniform(-0.25, 0.25), 6)
+                places.append(Place(
+                    name=f'{rng.choice(WORDS).capitalize()} {i}',
+                    description=' '.join(rng.sample(PHRASES, 3)),
+                    user=rng.choice(users),
+                    latitude=latitude,
+                    longitude=longitude,
+                    category=rng.choice(categories) if categories else None,
+                    spatial_cell=spatial_cell(latitude, longitude),
+                ))
+            places = Place.objects.bulk_create(places, batch_size=batch_size)
+
+            ratings, comments, photos = [], [], []
+            place_photos = _media_files('place_photos')
+            for place in places:
+                for user in rng.sample(users, min(rng.randint(0, options['ratings_per_place']), len(users))):
+                    ratings.append(Rating(place=place, user=user, value=rng.randint(1, 5)))
+                for _ in range(rng.randint(0, options['comments_per_place'])):
+                    comments.append(Comment(place=place, user=rng.choice(users), text=rng.choice(PHRASES)))
+                if place_photos:
+                    for _ in range(rng.randint(0, options['photos_per_place'])):
+                        photos.append(Photo(place=place, image=rng.choice(place_photos)))
+            Rating.objects.bulk_create(ratings, batch_size=batch_size)
+            Comment.objects.bulk_create(comments, batch_size=batch_size)
+            Photo.objects.bulk_create(photos, batch_size=batch_size)
+
+            # Денормализованные данные пересчитываем так же, как в продакшене
+            if places:
+                new_places = Place.objects.filter(pk__gte=min(place.pk for place in places))
+                rebuild_rating_aggregates(new_places)
+                rebuild_comment_counts(new_places)
+                index_places(place.pk for place in places)
+            rebuild_clusters([category.pk for category in categories])
+            rebuild_place_counts([category.pk for category in categories])
+            rebuild_leaderboard()
+            # bulk_create не отправляет сигналы - сбрасываем справочник категорий сами
+            invalidate_category_catalog()
+            invalidate_all_pages()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано за {time.perf_counter() - started:.1f} с: пользователей {len(new_users)}, '
+            f'категорий {len(new_categories)}, площадок {len(places)}, оценок {len(ratings)}, '
+            f'комментариев {len(comments)}, фото {len(photos)}'
+        ))
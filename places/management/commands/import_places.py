@@ -0,0 +1,309 @@
+import csv
+import hashlib
+import json
+import os
+import re
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.text import slugify
+
+from places.clustering import rebuild_clusters
+from places.counters import rebuild_place_counts
+from places.geo import spatial_cell
+from places.leaderboard import refresh_places
+from places.models import Category, PendingPlace, Place
+from places.page_cache import invalidate_all_pages
+from places.search import index_places
+
+# Альтернативные названия столбцов CSV и свойств GeoJSON
+COLUMNS = {
+    'id': ('id', 'external_id'),
+    'name': ('name', 'title', 'название'),
+    'description': ('description', 'описание'),
+    'category': ('category', 'категория'),
+    'latitude': ('latitude', 'lat'),
+    'longitude': ('longitude', 'lon', 'lng'),
+}
+CHUNK_SIZE = 64 * 1024
+PLACE_UPDATE_FIELDS = ['name', 'description', 'latitude', 'longitude', 'category', 'spatial_cell', 'updated_at']
+
+
+class InvalidRow(ValueError):
+    pass
+
+
+def _pick(record, column):
+    for key in COLUMNS[column]:
+        value = record.get(key)
+        if value not in (None, ''):
+            return value
+    return None
+
+
+def _coordinate(value, limit):
+    try:
+        number = Decimal(str(value).strip().replace(',', '.'))
+    except InvalidOperation:
+        raise InvalidRow(f'неверная координата {value!r}')
+    if not number.is_finite() or abs(number) > limit:
+        raise InvalidRow(f'координата вне диапазона: {value}')
+    return number.quantize(Decimal('0.000001'))
+
+
+def _read_csv(stream):
+    for record in csv.DictReader(stream):
+        yield {key.strip().lower(): value for key, value in record.items() if key}
+
+
+def _read_geojson_features(stream):
+    """
+    Объекты массива features из FeatureCollection по одному, не загружая
+    файл целиком: массив разбирается по кускам через JSONDecoder.raw_decode.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    start = re.compile(r'"features"\s*:\s*\[')
+    while True:
+        match = start.search(buffer)
+        if match:
+            buffer = buffer[match.end():]
+            break
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            raise CommandError('В GeoJSON не найден массив features')
+        # Хвост оставляем: ключ мог разрезаться на границе куска
+        buffer = buffer[-32:] + chunk
+
+    position = 0
+    while True:
+        # Пропускаем пробелы и запятые между объектами
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position < len(buffer):
+                break
+            chunk = stream.read(CHUNK_SIZE)
+            if not chunk:
+                raise CommandError('Неожиданный конец GeoJSON')
+            buffer, position = chunk, 0
+        if buffer[position] == ']':
+            return
+        try:
+            feature, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            chunk = stream.read(CHUNK_SIZE)
+            if not chunk:
+                raise CommandError('Неожиданный конец GeoJSON')
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        yield feature
+        buffer, position = buffer[end:], 0
+
+
+def _read_geojson_lines(stream):
+    """GeoJSON Text Sequences / построчный GeoJSON: по объекту Feature на строке."""
+    for line in stream:
+        line = line.strip().lstrip('\x1e')
+        if line:
+            yield json.loads(line)
+
+
+def _geojson_records(features):
+    """Свойства Feature в виде плоской записи; координаты точки - в latitude/longitude."""
+    for feature in features:
+        properties = dict(feature.get('properties') or {})
+        geometry = feature.get('geometry') or {}
+        if geometry.get('type') == 'Point':
+            longitude, latitude = geometry['coordinates'][:2]
+            properties.setdefault('longitude', longitude)
+            properties.setdefault('latitude', latitude)
+        if feature.get('id') is not None:
+            properties.setdefault('id', feature['id'])
+        yield {str(key).lower(): value for key, value in properties.items()}
+
+
+READERS = {
+    'csv': _read_csv,
+    'geojson': lambda stream: _geojson_records(_read_geojson_features(stream)),
+    'geojsonl': lambda stream: _geojson_records(_read_geojson_lines(stream)),
+}
+EXTENSIONS = {'.csv': 'csv', '.geojsonl': 'geojsonl', '.geojsons': 'geojsonl', '.ndjson': 'geojsonl'}
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class Command(BaseCommand):
+    help = ('Импортирует площадки из CSV или GeoJSON потоково, пачками bulk_create. '
+            'Повторный импорт того же источника обновляет площадки по ключу, а не дублирует их.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл .csv, .geojson/.json (FeatureCollection) или .geojsonl (Feature на строке)')
+        parser.add_argument('--format', choices=sorted(READERS), help='По умолчанию - по расширению файла')
+        parser.add_argument('--source', help='Префикс ключа external_id (по умолчанию - имя файла)')
+        parser.add_argument('--category', help='Категория для строк без своей категории')
+        parser.add_argument('--no-create-categories', action='store_true',
+                            help='Пропускать строки с неизвестной категорией вместо создания новой')
+        parser.add_argument('--pending', action='store_true', help='Создавать заявки на модерацию вместо площадок')
+        parser.add_argument('--user', help='Автор заявок (обязателен с --pending)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Выполнить импорт и откатить транзакцию')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or EXTENSIONS.get(os.path.splitext(path)[1].lower(), 'geojson')
+        self.source = options['source'] or os.path.splitext(os.path.basename(path))[0]
+        self.pending = options['pending']
+        self.create_categories = not options['no_create_categories']
+        self.user = None
+        if self.pending:
+            if not options['user']:
+                raise CommandError('С --pending нужно указать --user')
+            self.user = User.objects.filter(username=options['user']).first()
+            if self.user is None:
+                raise CommandError(f"Пользователь {options['user']} не найден")
+
+        # Справочник категорий в памяти: название в нижнем регистре -> id
+        self.categories = {name.lower(): pk for pk, name in Category.objects.values_list('pk', 'name')}
+        self.default_category = None
+        if options['category']:
+            self.default_category = self._category_id(options['category'])
+
+        self.stats = {'read': 0, 'created': 0, 'updated': 0, 'skipped': 0, 'invalid': 0}
+        self.touched_categories = set()
+        started = time.perf_counter()
+
+        with open(path, encoding='utf-8-sig', newline='') as stream:
+            records = READERS[fmt](stream)
+            with transaction.atomic():
+                for batch in _batches(records, options['batch_size']):
+                    self._import_batch(batch)
+                    if options['verbosity'] >= 2:
+                        elapsed = time.perf_counter() - started
+                        self.stdout.write(f"  {self.stats['read']} строк, {self.stats['read'] / elapsed:.0f} строк/с")
+                if not self.pending and not options['dry_run'] and self.touched_categories:
+                    categories = sorted(self.touched_categories)
+                    rebuild_clusters(categories)
+                    rebuild_place_counts(categories)
+                    invalidate_all_pages()
+                if options['dry_run']:
+                    transaction.set_rollback(True)
+
+        elapsed = time.perf_counter() - started
+        stats = self.stats
+        prefix = '[dry-run] ' if options['dry_run'] else ''
+        target = 'заявок' if self.pending else 'площадок'
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}Прочитано {stats['read']} строк за {elapsed:.1f} с ({stats['read'] / max(elapsed, 1e-9):.0f} строк/с): "
+            f"создано {target} {stats['created']}, обновлено {stats['updated']}, "
+            f"пропущено {stats['skipped']}, с ошибками {stats['invalid']}"
+        ))
+
+    def _category_id(self, name):
+        name = str(name).strip()
+        pk = self.categories.get(name.lower())
+        if pk is None and self.create_categories:
+            slug = slugify(name)
+            # Разные названия дают один slug ('Mini-football' и 'Mini football') - тогда адрес с суффиксом
+            taken = bool(slug) and Category.objects.filter(slug=slug).exists()
+            category = Category.objects.create(name=name, slug=None if taken else slug or None)
+            if not category.slug:
+                # slugify отбрасывает кириллицу - нужен хоть какой-то уникальный адрес
+                category.slug = f'{slug or "category"}-{category.pk}'
+                category.save(update_fields=['slug'])
+            pk = self.categories[name.lower()] = category.pk
+        return pk
+
+    def _external_id(self, record, latitude, longitude, name):
+        key = _pick(record, 'id')
+        if key is None:
+            # Без ключа в источнике - стабильный хеш названия и координат
+            key = hashlib.sha1(f'{name}|{latitude}|{longitude}'.encode()).hexdigest()[:16]
+        return f'{self.source}:{key}'[:200]
+
+    def _parse(self, record):
+        name = _pick(record, 'name')
+        if not name:
+            raise InvalidRow('нет названия')
+        latitude, longitude = _pick(record, 'latitude'), _pick(record, 'longitude')
+        if latitude is None or longitude is None:
+            raise InvalidRow('нет координат')
+        latitude, longitude = _coordinate(latitude, 90), _coordinate(longitude, 180)
+
+        category_name = _pick(record, 'category')
+        category_id = self._category_id(category_name) if category_name else self.default_category
+        if category_name and category_id is None:
+            raise InvalidRow(f'неизвестная категория {category_name!r}')
+
+        return {
+            'external_id': self._external_id(record, latitude, longitude, name),
+            'name': str(name).strip()[:200],
+            'description': str(_pick(record, 'description') or ''),
+            'latitude': latitude,
+            'longitude': longitude,
+            'category_id': category_id,
+        }
+
+    def _import_batch(self, records):
+        rows = {}
+        for record in records:
+            self.stats['read'] += 1
+            try:
+                row = self._parse(record)
+            except (InvalidRow, TypeError, KeyError) as error:
+                self.stats['invalid'] += 1
+                if self.stats['invalid'] <= 10:
+                    self.stderr.write(f"Строка {self.stats['read']}: {error}")
+                continue
+            # Повтор ключа внутри пачки: побеждает последняя строка
+            if row['external_id'] in rows:
+                self.stats['skipped'] += 1
+            rows[row['external_id']] = row
+        if not rows:
+            return
+
+        if self.pending:
+            self._import_pending(rows)
+        else:
+            self._import_places(rows)
+
+    def _import_places(self, rows):
+        # Категории, из которых площадки уйдут при обновлении, тоже нужно пересчитать
+        existing = dict(Place.objects.filter(external_id__in=list(rows)).values_list('external_id', 'category_id'))
+        self.touched_categories.update(existing.values())
+        places = [
+            Place(spatial_cell=spatial_cell(row['latitude'], row['longitude']), **row)
+            for row in rows.values()
+        ]
+        # Вставка новых и обновление существующих по external_id одним запросом на пачку
+        Place.objects.bulk_create(
+            places, update_conflicts=True, unique_fields=['external_id'], update_fields=PLACE_UPDATE_FIELDS,
+        )
+        self.stats['created'] += len(rows) - len(existing)
+        self.stats['updated'] += len(existing)
+        self.touched_categories.update(row['category_id'] for row in rows.values())
+        self.touched_categories.discard(None)
+        index_places(Place.objects.filter(external_id__in=list(rows)).values_list('pk', flat=True))
+        if existing:
+            # Обновленные площадки могли сменить категорию - и топ категории в таблице лидеров
+            refresh_places(Place.objects.filter(external_id__in=list(existing)).values_list('pk', flat=True))
+
+    def _import_pending(self, rows):
+        # Заявка создается один раз: ключ уже есть у площадки или у другой заявки - пропускаем
+        keys = list(rows)
+        seen = set(Place.objects.filter(external_id__in=keys).values_list('external_id', flat=True))
+        seen |= set(PendingPlace.objects.filter(external_id__in=keys).values_list('external_id', flat=True))
+        PendingPlace.objects.bulk_create([
+            PendingPlace(user=self.user, action='add', status='pending', **row)
+            for key, row in rows.items() if key not in seen
+        ])
+        self.stats['created'] += len(rows) - len(seen)
+        self.stats['skipped'] += len(seen)
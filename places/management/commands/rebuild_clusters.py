@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from places.clustering import rebuild_clusters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает кластеры маркеров карты для всех уровней зума'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--category', type=int, action='append', dest='categories',
+                            help='ID категории (можно указать несколько раз)')
+
+    def handle(self, *args, **options):
+        created = rebuild_clusters(options['categories'])
+        self.stdout.write(self.style.SUCCESS(f'Создано кластеров: {created}'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from places.counters import rebuild_comment_counts
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает хранимое количество комментариев (comment_count) всех площадок'
+
+    def handle(self, *args, **options):
+        updated = rebuild_comment_counts()
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано количество комментариев для {updated} площадок'))
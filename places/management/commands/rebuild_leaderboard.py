@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from places.leaderboard import prior_mean, rebuild_leaderboard
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает байесовские оценки таблицы лидеров (запускать по расписанию, например раз в час)'
+
+    def handle(self, *args, **options):
+        total = rebuild_leaderboard()
+        self.stdout.write(self.style.SUCCESS(
+            f'Таблица лидеров пересчитана: {total} площадок, средняя оценка {prior_mean():.2f}'
+        ))
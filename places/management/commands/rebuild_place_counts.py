@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from places.counters import rebuild_place_counts
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает хранимое количество площадок (place_count) всех категорий'
+
+    def handle(self, *args, **options):
+        updated = rebuild_place_counts()
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано количество площадок для {updated} категорий'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from places.ratings import rebuild_rating_aggregates
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает rating_sum, rating_count и average_rating всех площадок по таблице Rating'
+
+    def handle(self, *args, **options):
+        updated = rebuild_rating_aggregates()
+        self.stdout.write(self.style.SUCCESS(f'Исправлены рейтинги у {updated} площадок'))
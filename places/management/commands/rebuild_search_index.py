@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from places.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает полнотекстовый индекс площадок (tsvector в PostgreSQL, FTS5 в SQLite)'
+
+    def handle(self, *args, **options):
+        indexed = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f'Проиндексировано площадок: {indexed}'))
@@ -0,0 +1,51 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from places.images import FORMATS
+from places.models import Category, Photo, StoredBlob
+from places.storage import blob_storage
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает ссылки на файлы хранилища по таблицам Photo и Category '
+            'и удаляет файлы, на которые больше никто не ссылается')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Только показать, что будет удалено')
+
+    def handle(self, *args, **options):
+        references = Counter()
+
+        def count(name, variants):
+            if name:
+                references[name] += 1
+            for stored in (variants or {}).values():
+                for fmt in FORMATS:
+                    if stored.get(fmt):
+                        references[stored[fmt]] += 1
+
+        for name, variants in Photo.objects.values_list('image', 'variants').iterator(chunk_size=2000):
+            count(name, variants)
+        for name, variants in Category.objects.values_list('cover_photo', 'cover_variants').iterator(chunk_size=2000):
+            count(name, variants)
+
+        updated, removed, freed = 0, 0, 0
+        with transaction.atomic():
+            for blob in StoredBlob.objects.select_for_update().iterator(chunk_size=2000):
+                actual = references.get(blob.name, 0)
+                if actual == 0:
+                    removed += 1
+                    freed += blob.size
+                    if not options['dry_run']:
+                        blob.delete()
+                        blob_storage.delete(blob.name)
+                elif actual != blob.ref_count:
+                    updated += 1
+                    if not options['dry_run']:
+                        StoredBlob.objects.filter(pk=blob.pk).update(ref_count=actual)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено счетчиков: {updated}, удалено файлов: {removed} ({freed / 1024 / 1024:.1f} МБ)'
+        ))
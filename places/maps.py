@@ -0,0 +1,102 @@
+"""
+Данные для карт в формате GeoJSON.
+
+Вместо сборки folium.Map на сервере отдаем компактный FeatureCollection,
+а маркеры и попапы рисует Leaflet в браузере (static/js/place_map.js).
+"""
+import json
+
+from django.urls import reverse
+
+from . import clustering
+from .metrics import timer
+from .images import variant_url
+from .models import Photo
+
+# Поля площадки, которых достаточно для маркера и попапа
+MAP_FIELDS = ('id', 'name', 'latitude', 'longitude', 'average_rating', 'first_photo_image', 'first_photo_variants')
+
+
+def _photo_url(name, variants):
+    """URL маленького варианта для попапа, а пока его нет - оригинала."""
+    if not name:
+        return None
+    storage = Photo._meta.get_field('image').storage
+    return variant_url(storage, variants, 'popup') or storage.url(name)
+
+
+def place_features(queryset, limit=None):
+    """
+    Строит GeoJSON-объекты по queryset площадок. Работает на values()-строках
+    без создания экземпляров моделей; площадки без координат пропускаются.
+    """
+    rows = (
+        queryset.with_cover_photo()
+        .filter(latitude__isnull=False, longitude__isnull=False)
+        .values(*MAP_FIELDS)
+    )
+    if limit is not None:
+        rows = rows[:limit]
+    for row in rows:
+        yield feature_from_row(row)
+
+
+def feature_from_row(row):
+    """GeoJSON-объект площадки из словаря с полями MAP_FIELDS."""
+    rating = row['average_rating']
+    return {
+        'type': 'Feature',
+        # В GeoJSON порядок координат: долгота, широта
+        'geometry': {
+            'type': 'Point',
+            'coordinates': [float(row['longitude']), float(row['latitude'])],
+        },
+        'properties': {
+            'id': row['id'],
+            'name': row['name'],
+            'url': reverse('place_detail', args=[row['id']]),
+            'photo': _photo_url(row['first_photo_image'], row['first_photo_variants']),
+            'rating': round(rating, 1) if rating is not None else None,
+        },
+    }
+
+
+def feature_collection(queryset):
+    """Возвращает FeatureCollection, сериализованный в компактный JSON."""
+    with timer('map'):
+        data = {'type': 'FeatureCollection', 'features': list(place_features(queryset))}
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+def parse_bbox(value):
+    """Разбирает параметр bbox=west,south,east,north; при ошибке возвращает None."""
+    try:
+        west, south, east, north = (float(part) for part in value.split(','))
+    except (AttributeError, ValueError):
+        return None
+    if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+        return None
+    return west, south, east, north
+
+
+def viewport_collection(category, zoom, bbox):
+    """
+    Данные карты категории для видимой области: кластеры с количеством,
+    либо отдельные площадки, если их немного или зум достаточно крупный.
+    """
+    with timer('map'):
+        return _viewport_collection(category, zoom, bbox)
+
+
+def _viewport_collection(category, zoom, bbox):
+    if bbox is None:
+        # Первый запрос без области: только границы, чтобы клиент выставил вид
+        data = {'type': 'FeatureCollection', 'bbox': clustering.category_bbox(category), 'features': []}
+    else:
+        clusters = clustering.viewport_clusters(category, zoom, bbox)
+        if zoom > clustering.max_cluster_zoom() or clustering.viewport_total(clusters) <= clustering.raw_points_threshold():
+            features = list(place_features(category.places.in_bbox(*bbox)))
+        else:
+            features = list(clustering.cluster_features(clusters))
+        data = {'type': 'FeatureCollection', 'features': features}
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
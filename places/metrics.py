@@ -0,0 +1,269 @@
+"""
+Метрики производительности запросов.
+
+RequestMetricsMiddleware для каждого запроса собирает число SQL-запросов,
+время в базе, время построения данных карты, время рендеринга шаблонов и
+размер ответа. Значения отдаются клиенту в заголовке Server-Timing и
+накапливаются в гистограммах процесса по имени URL, которые view metrics
+выводит в текстовом формате Prometheus.
+"""
+import contextvars
+import hmac
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from django.template.backends.django import DjangoTemplates, Template
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (1_000, 5_000, 20_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 5_000_000)
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+class Histogram:
+    """Кумулятивная гистограмма в стиле Prometheus (потокобезопасная)."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Гистограммы процесса: {(метрика, view): Histogram}."""
+
+    METRICS = {
+        'http_request_duration_seconds': ('Полное время обработки запроса', DURATION_BUCKETS),
+        'http_request_db_queries': ('Количество SQL-запросов', QUERY_BUCKETS),
+        'http_request_db_seconds': ('Время в базе данных', DURATION_BUCKETS),
+        'http_request_map_seconds': ('Время построения данных карты', DURATION_BUCKETS),
+        'http_request_template_seconds': ('Время рендеринга шаблонов', DURATION_BUCKETS),
+        'http_response_size_bytes': ('Размер тела ответа', SIZE_BUCKETS),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def observe(self, metric, view, value):
+        with self._lock:
+            histogram = self._histograms.get((metric, view))
+            if histogram is None:
+                histogram = self._histograms[(metric, view)] = Histogram(self.METRICS[metric][1])
+            histogram.observe(value)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def render(self):
+        """Текстовый формат экспорта Prometheus."""
+        lines = []
+        with self._lock:
+            for metric, (description, _) in self.METRICS.items():
+                series = sorted((view, h) for (name, view), h in self._histograms.items() if name == metric)
+                if not series:
+                    continue
+                lines.append(f'# HELP {metric} {description}')
+                lines.append(f'# TYPE {metric} histogram')
+                for view, histogram in series:
+                    label = view.replace('\\', '\\\\').replace('"', '\\"')
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f'{metric}_bucket{{view="{label}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{metric}_bucket{{view="{label}",le="+Inf"}} {histogram.count}')
+                    lines.append(f'{metric}_sum{{view="{label}"}} {histogram.sum}')
+                    lines.append(f'{metric}_count{{view="{label}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class RequestMetrics:
+    """Замеры одного запроса."""
+
+    def __init__(self):
+        self.queries = 0
+        self.timings = {'db': 0.0, 'map': 0.0, 'template': 0.0}
+        # Асинхронные view пишут сюда из нескольких потоков пула одновременно
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            with self._lock:
+                self.queries += 1
+            self.add('db', time.perf_counter() - started)
+
+
+def current():
+    """Замеры текущего запроса или None."""
+    return _current.get()
+
+
+def _db_wrapper(execute, sql, params, many, context):
+    # Запрос учитывается в замерах того запроса, в контексте которого выполняется
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics.db_wrapper(execute, sql, params, many, context)
+
+
+def _install_db_wrapper(connection, **kwargs):
+    if _db_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_db_wrapper)
+
+
+# Соединения создаются в разных потоках (sync_to_async, пул places.workers),
+# поэтому обертка ставится на каждое соединение сразу при подключении
+connection_created.connect(_install_db_wrapper)
+
+
+@contextmanager
+def collect(metrics):
+    """Учитывает в metrics запросы к базе и таймеры, выполненные в текущем контексте."""
+    for connection in connections.all(initialized_only=True):
+        _install_db_wrapper(connection)
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def timer(name):
+    """
+    Хук для замера участка кода в рамках текущего запроса:
+
+        with metrics.timer('map'):
+            ...
+    Вне запроса (команды, тесты без middleware) ничего не делает.
+    """
+    current = _current.get()
+    if current is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        current.add(name, time.perf_counter() - started)
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        with timer('template'):
+            return super().render(context, request)
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Бэкенд шаблонов Django, который учитывает время рендеринга в метриках."""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return InstrumentedTemplate(template.template, self)
+
+
+class RequestMetricsMiddleware:
+    """Работает и в синхронной цепочке (WSGI), и в асинхронной (ASGI)."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        with collect(RequestMetrics()) as metrics:
+            response = self.get_response(request)
+        return self._finish(request, response, metrics, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            return await self.get_response(request)
+
+        started = time.perf_counter()
+        with collect(RequestMetrics()) as metrics:
+            response = await self.get_response(request)
+        return self._finish(request, response, metrics, time.perf_counter() - started)
+
+    def _finish(self, request, response, metrics, total):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unmatched'
+
+        size = None if response.streaming else len(response.content)
+        registry.observe('http_request_duration_seconds', view, total)
+        registry.observe('http_request_db_queries', view, metrics.queries)
+        for name in ('db', 'map', 'template'):
+            registry.observe(f'http_request_{name}_seconds', view, metrics.timings[name])
+        if size is not None:
+            registry.observe('http_response_size_bytes', view, size)
+
+        timing = [
+            f'db;dur={metrics.timings["db"] * 1000:.1f};desc="{metrics.queries} queries"',
+            f'map;dur={metrics.timings["map"] * 1000:.1f}',
+            f'tpl;dur={metrics.timings["template"] * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ]
+        response['Server-Timing'] = ', '.join(timing)
+        return response
+
+
+def _metrics_allowed(request):
+    """
+    staff, сборщик с токеном (Authorization: Bearer <METRICS_TOKEN>) или адрес
+    из METRICS_ALLOWED_IPS. За reverse proxy у всех запросов REMOTE_ADDR прокси,
+    поэтому список адресов по умолчанию пуст.
+    """
+    user = getattr(request, 'user', None)
+    if user and user.is_staff:
+        return True
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    header = request.headers.get('Authorization', '')
+    if token and header.startswith('Bearer '):
+        # compare_digest принимает строки только из ASCII - сравниваем байты
+        if hmac.compare_digest(header[len('Bearer '):].strip().encode(), token.encode()):
+            return True
+    return request.META.get('REMOTE_ADDR') in getattr(settings, 'METRICS_ALLOWED_IPS', [])
+
+
+def metrics_view(request):
+    """Гистограммы процесса в формате Prometheus (доступ - см. _metrics_allowed)."""
+    if not _metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
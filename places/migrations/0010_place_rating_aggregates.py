@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:51
+
+from django.db import migrations, models
+from django.db.models import Count, F, FloatField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce
+
+
+def fill_rating_aggregates(apps, schema_editor):
+    Place = apps.get_model("places", "Place")
+    Rating = apps.get_model("places", "Rating")
+
+    ratings = Rating.objects.filter(place=OuterRef("pk")).order_by().values("place")
+    Place.objects.update(
+        rating_sum=Coalesce(
+            Subquery(ratings.annotate(total=Sum("value")).values("total")), Value(0)
+        ),
+        rating_count=Coalesce(
+            Subquery(ratings.annotate(total=Count("pk")).values("total")), Value(0)
+        ),
+    )
+    Place.objects.filter(rating_count__gt=0).update(
+        average_rating=Cast(F("rating_sum"), FloatField())
+        / Cast(F("rating_count"), FloatField()),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("places", "0009_category_cover_photo_category_view_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="place",
+            name="average_rating",
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="place",
+            name="rating_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="place",
+            name="rating_sum",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:57
+
+import math
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Параметры сетки на момент миграции (см. places.geo)
+CELL_DEGREES = 0.01
+ROWS = 18000
+COLUMNS = 36000
+
+
+def fill_spatial_cells(apps, schema_editor):
+    Place = apps.get_model("places", "Place")
+    places = Place.objects.filter(latitude__isnull=False, longitude__isnull=False)
+    batch = []
+    for place in places.only("pk", "latitude", "longitude").iterator(chunk_size=2000):
+        row = min(max(math.floor((float(place.latitude) + 90) / CELL_DEGREES), 0), ROWS - 1)
+        column = min(
+            max(math.floor((float(place.longitude) + 180) / CELL_DEGREES), 0), COLUMNS - 1
+        )
+        place.spatial_cell = row * COLUMNS + column
+        batch.append(place)
+        if len(batch) >= 2000:
+            Place.objects.bulk_update(batch, ["spatial_cell"])
+            batch = []
+    if batch:
+        Place.objects.bulk_update(batch, ["spatial_cell"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("places", "0011_placecluster"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="place",
+            name="spatial_cell",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="place",
+            index=models.Index(fields=["spatial_cell"], name="place_spatial_cell_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="place",
+            index=models.Index(
+                fields=["category", "spatial_cell"], name="place_category_cell_idx"
+            ),
+        ),
+        migrations.RunPython(fill_spatial_cells, migrations.RunPython.noop),
+    ]
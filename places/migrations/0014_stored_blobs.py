@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:06
+
+import places.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("places", "0013_image_variants"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StoredBlob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255, unique=True)),
+                ("size", models.PositiveBigIntegerField(default=0)),
+                ("ref_count", models.PositiveIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="category",
+            name="cover_photo",
+            field=models.ImageField(
+                blank=True,
+                null=True,
+                storage=places.storage.ContentAddressedStorage(),
+                upload_to="category_covers/",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="photo",
+            name="image",
+            field=models.ImageField(
+                storage=places.storage.ContentAddressedStorage(),
+                upload_to="place_photos/",
+            ),
+        ),
+    ]
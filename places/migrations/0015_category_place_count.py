@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:14
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_place_counts(apps, schema_editor):
+    Category = apps.get_model("places", "Category")
+    Place = apps.get_model("places", "Place")
+    counts = (
+        Place.objects.filter(category=OuterRef("pk"))
+        .order_by()
+        .values("category")
+        .annotate(n=Count("pk"))
+        .values("n")
+    )
+    Category.objects.update(place_count=Coalesce(Subquery(counts), 0))
+
+
+def create_rating_index(apps, schema_editor):
+    # В SQLite NULL и так идут последними при DESC, а NULLS LAST в индексе не поддерживается
+    nulls_last = (
+        " NULLS LAST" if schema_editor.connection.vendor == "postgresql" else ""
+    )
+    schema_editor.execute(
+        "CREATE INDEX place_category_rating_idx ON places_place "
+        f"(category_id, average_rating DESC{nulls_last}, id DESC)"
+    )
+
+
+def drop_rating_index(apps, schema_editor):
+    schema_editor.execute("DROP INDEX place_category_rating_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("places", "0014_stored_blobs"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="category",
+            name="place_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_place_counts, migrations.RunPython.noop),
+        migrations.RunPython(create_rating_index, drop_rating_index),
+        migrations.AddIndex(
+            model_name="place",
+            index=models.Index(
+                fields=["category", "name", "id"], name="place_category_name_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="place",
+            index=models.Index(
+                fields=["category", "-id"], name="place_category_recent_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:16
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_comment_counts(apps, schema_editor):
+    Comment = apps.get_model("places", "Comment")
+    Place = apps.get_model("places", "Place")
+    counts = (
+        Comment.objects.filter(place=OuterRef("pk"))
+        .order_by()
+        .values("place")
+        .annotate(n=Count("pk"))
+        .values("n")
+    )
+    Place.objects.update(comment_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("places", "0015_category_place_count"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="place",
+            name="comment_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_comment_counts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["place", "-created_at", "-id"], name="comment_place_created_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:17
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Совпадает с settings.SEARCH_CONFIG по умолчанию (places.search)
+SEARCH_CONFIG = "russian"
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(
+            "CREATE INDEX place_search_vector_idx ON places_place USING GIN (search_vector)"
+        )
+        schema_editor.execute(
+            "UPDATE places_place AS place SET search_vector = "
+            "setweight(to_tsvector(%(config)s, coalesce(place.name, '')), 'A') || "
+            "setweight(to_tsvector(%(config)s, coalesce(place.description, '')), 'B') || "
+            "setweight(to_tsvector(%(config)s, coalesce((SELECT category.name FROM places_category "
+            "AS category WHERE category.id = place.category_id), '')), 'C')",
+            {"config": SEARCH_CONFIG},
+        )
+    elif vendor == "sqlite":
+        # Теневая таблица FTS5: rowid = places_place.id, префиксные индексы для 2-3 символов
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE places_place_fts USING fts5("
+            "name, description, category, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        schema_editor.execute(
+            "INSERT INTO places_place_fts (rowid, name, description, category) "
+            "SELECT place.id, place.name, place.description, COALESCE(category.name, '') "
+            "FROM places_place AS place "
+            "LEFT JOIN places_category AS category ON category.id = place.category_id"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute("DROP INDEX place_search_vector_idx")
+    elif vendor == "sqlite":
+        schema_editor.execute("DROP TABLE places_place_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("places", "0016_place_comment_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="place",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                blank=True, editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("places", "0017_place_search"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pendingplace",
+            name="external_id",
+            field=models.CharField(
+                blank=True, db_index=True, editable=False, max_length=200, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="place",
+            name="external_id",
+            field=models.CharField(
+                blank=True, editable=False, max_length=200, null=True, unique=True
+            ),
+        ),
+    ]
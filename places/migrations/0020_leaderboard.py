@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def fill_leaderboard(apps, schema_editor):
+    # Та же формула, что в places.leaderboard; дальше таблицу обновляет приложение
+    Place = apps.get_model("places", "Place")
+    LeaderboardEntry = apps.get_model("places", "LeaderboardEntry")
+    totals = Place.objects.aggregate(total=Sum("rating_sum"), count=Sum("rating_count"))
+    prior = totals["total"] / totals["count"] if totals["count"] else 3.0
+    votes = getattr(settings, "LEADERBOARD_PRIOR_VOTES", 10)
+    rows = Place.objects.filter(rating_count__gt=0).values_list(
+        "pk", "category_id", "rating_sum", "rating_count"
+    )
+    LeaderboardEntry.objects.bulk_create(
+        [
+            LeaderboardEntry(
+                place_id=pk,
+                category_id=category_id,
+                score=(rating_sum + votes * prior) / (rating_count + votes),
+            )
+            for pk, category_id, rating_sum, rating_count in rows.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("places", "0019_updated_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LeaderboardEntry",
+            fields=[
+                (
+                    "place",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="leaderboard",
+                        serialize=False,
+                        to="places.place",
+                    ),
+                ),
+                ("score", models.FloatField()),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "category",
+                    models.ForeignKey(
+                        blank=True,
+                        db_index=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="places.category",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["-score", "place"], name="leaderboard_score_idx"
+                    ),
+                    models.Index(
+                        fields=["category", "-score", "place"],
+                        name="leaderboard_category_score_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(fill_leaderboard, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("places", "0020_leaderboard"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="pendingplace",
+            name="original_place",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                to="places.place",
+            ),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:40
+
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import migrations
+
+# Параметры сетки на момент миграции (см. places.clustering)
+CLUSTER_SUBDIVISION = 4
+MAX_LATITUDE = 85.05112878
+
+
+def cell_for(latitude, longitude, zoom):
+    n = (1 << zoom) * CLUSTER_SUBDIVISION
+    lat = math.radians(max(-MAX_LATITUDE, min(MAX_LATITUDE, latitude)))
+    x = int((longitude + 180.0) / 360.0 * n)
+    y = int((1.0 - math.log(math.tan(lat) + 1.0 / math.cos(lat)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def fill_place_clusters(apps, schema_editor):
+    # Площадки, добавленные до появления кластеров, на карте категорий не видны:
+    # пересчитываем кластеры с нуля, как rebuild_clusters
+    Place = apps.get_model("places", "Place")
+    PlaceCluster = apps.get_model("places", "PlaceCluster")
+    places = Place.objects.filter(
+        category__isnull=False, latitude__isnull=False, longitude__isnull=False
+    ).values_list("category_id", "latitude", "longitude")
+    clusters = defaultdict(lambda: [0, 0.0, 0.0])
+    max_zoom = getattr(settings, "MAP_CLUSTER_MAX_ZOOM", 16)
+    for category_id, latitude, longitude in places.iterator(chunk_size=2000):
+        latitude, longitude = float(latitude), float(longitude)
+        for zoom in range(max_zoom + 1):
+            cluster = clusters[
+                (category_id, zoom, *cell_for(latitude, longitude, zoom))
+            ]
+            cluster[0] += 1
+            cluster[1] += latitude
+            cluster[2] += longitude
+
+    PlaceCluster.objects.all().delete()
+    PlaceCluster.objects.bulk_create(
+        [
+            PlaceCluster(
+                category_id=category_id,
+                zoom=zoom,
+                cell_x=cell_x,
+                cell_y=cell_y,
+                count=count,
+                latitude_sum=latitude_sum,
+                longitude_sum=longitude_sum,
+            )
+            for (category_id, zoom, cell_x, cell_y), (
+                count,
+                latitude_sum,
+                longitude_sum,
+            ) in clusters.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("places", "0021_pendingplace_original_place_set_null"),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_place_clusters, migrations.RunPython.noop),
+    ]
@@ -1,18 +1,59 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.postgres.search import SearchVectorField
+
+from .geo import bbox_cell_ranges, spatial_cell
+from .storage import blob_storage
 
 # Модель для категорий площадок
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     slug = models.SlugField(unique=True, blank=True, null=True)
-    cover_photo = models.ImageField(upload_to='category_covers/', blank=True, null=True)
+    cover_photo = models.ImageField(upload_to='category_covers/', storage=blob_storage, blank=True, null=True)
+    # Уменьшенные копии обложки: {'card': {'webp': путь, 'jpeg': путь, 'width': 400}, ...}
+    cover_variants = models.JSONField(default=dict, blank=True, editable=False)
     # Для отслеживания популярности для порядка отображения
     view_count = models.PositiveIntegerField(default=0)
-
+    # Хранимое количество площадок (обновляется сигналами и places.counters),
+    # чтобы не считать COUNT по площадкам на каждой карточке и странице
+    place_count = models.PositiveIntegerField(default=0, editable=False)
+    # Время последнего изменения категории или ее площадок (places.conditional).
+    # Индекс нужен главной странице: последнее изменение всего каталога - один ORDER BY ... LIMIT 1
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.name
 
+class PlaceQuerySet(models.QuerySet):
+    def with_cover_photo(self):
+        """
+        Подтягивает первое фото площадки подзапросом, чтобы first_photo
+        не делал отдельный запрос для каждой карточки.
+        """
+        photos = Photo.objects.filter(place=models.OuterRef('pk')).order_by('pk')
+        return self.annotate(
+            first_photo_id=models.Subquery(photos.values('pk')[:1]),
+            first_photo_image=models.Subquery(photos.values('image')[:1]),
+            first_photo_variants=models.Subquery(photos.values('variants')[:1]),
+        )
+
+    def in_bbox(self, west, south, east, north):
+        """
+        Площадки внутри прямоугольника. Сначала отбор по индексу spatial_cell
+        (несколько range scan), затем точная проверка координат.
+        """
+        cells = models.Q()
+        for first_cell, last_cell in bbox_cell_ranges(west, south, east, north):
+            cells |= models.Q(spatial_cell__range=(first_cell, last_cell))
+
+        exact = models.Q(latitude__gte=south, latitude__lte=north)
+        if west <= east:
+            exact &= models.Q(longitude__gte=west, longitude__lte=east)
+        else:
+            exact &= models.Q(longitude__gte=west) | models.Q(longitude__lte=east)
+        return self.filter(cells, exact)
+
+
 # Модель для одобренных площадок
 class Place(models.Model):
     name = models.CharField(max_length=200)
@@ -21,11 +62,57 @@ class Place(models.Model):
     latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='places')
+    # Хранимые агрегаты оценок (обновляются в places.ratings.submit_rating),
+    # чтобы не считать AVG по всей таблице Rating на каждом запросе
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    average_rating = models.FloatField(null=True, blank=True, db_index=True)
+    # Хранимое количество комментариев (обновляется сигналами, см. places.counters)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    # Ячейка пространственной сетки (places.geo), пересчитывается в save()
+    spatial_cell = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    # Полнотекстовый вектор для PostgreSQL (places.search); GIN-индекс и теневая
+    # таблица FTS5 для SQLite создаются в миграции 0017
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
+    # Ключ записи во внешнем источнике (команда import_places), по нему повторный импорт обновляет площадку
+    external_id = models.CharField(max_length=200, unique=True, null=True, blank=True, editable=False)
+    # Время последнего видимого на странице изменения (ETag и Last-Modified, places.conditional).
+    # UPDATE в обход save() (оценки, комментарии) выставляют его сами
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = PlaceQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['spatial_cell'], name='place_spatial_cell_idx'),
+            models.Index(fields=['category', 'spatial_cell'], name='place_category_cell_idx'),
+            # Постраничный вывод площадок категории (places.pagination).
+            # Индекс для сортировки по рейтингу (DESC NULLS LAST) создается в миграции 0015:
+            # SQLite не поддерживает NULLS LAST в CREATE INDEX
+            models.Index(fields=['category', 'name', 'id'], name='place_category_name_idx'),
+            models.Index(fields=['category', '-id'], name='place_category_recent_idx'),
+        ]
 
+    def save(self, *args, **kwargs):
+        self.spatial_cell = spatial_cell(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'spatial_cell'}
+        if update_fields is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'updated_at'}
+        super().save(*args, **kwargs)
 
     @property
     def first_photo(self):
         """Возвращает первое фото для использования в качестве миниатюры."""
+        # Если queryset аннотирован with_cover_photo(), обходимся без запроса
+        if hasattr(self, 'first_photo_image'):
+            if not self.first_photo_image:
+                return None
+            return Photo(
+                pk=self.first_photo_id, place_id=self.pk,
+                image=self.first_photo_image, variants=self.first_photo_variants or {},
+            )
         return self.photos.first()
     # @property — это декоратор в Python, который превращает метод класса в свойство. 
     # он позволяет вызывать метод, как будто это обычный атрибут (переменная), без скобок ()
@@ -56,11 +143,14 @@ class PendingPlace(models.Model):
 
     # Связи и статус модерации
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    original_place = models.ForeignKey(Place, on_delete=models.CASCADE, null=True, blank=True)
+    # SET_NULL: одобренные заявки - история площадки, удаление площадки их не удаляет
+    original_place = models.ForeignKey(Place, on_delete=models.SET_NULL, null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     action = models.CharField(max_length=20, choices=ACTION_CHOICES)
     created_at = models.DateTimeField(auto_now_add=True)
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
+    # Ключ во внешнем источнике (import_places --pending); переносится в Place при одобрении
+    external_id = models.CharField(max_length=200, null=True, blank=True, editable=False, db_index=True)
 
     def __str__(self):
         return f"{self.action.capitalize()} - {self.name}"
@@ -72,6 +162,12 @@ class Comment(models.Model):
     text = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Постраничный вывод комментариев площадки от новых к старым (places.pagination)
+            models.Index(fields=['place', '-created_at', '-id'], name='comment_place_created_idx'),
+        ]
+
     def __str__(self):
         return f'Комментарий от {self.user.username} на {self.place.name}'
 
@@ -87,10 +183,72 @@ class Rating(models.Model):
         return f'Оценка {self.value} от {self.user.username} для {self.place.name}'
 
 
+# Таблица лидеров: байесовская оценка каждой оцененной площадки (places.leaderboard).
+# Категория скопирована из площадки, чтобы топ категории читался по одному индексу
+class LeaderboardEntry(models.Model):
+    place = models.OneToOneField(Place, on_delete=models.CASCADE, primary_key=True, related_name='leaderboard')
+    category = models.ForeignKey(
+        Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', db_index=False,
+    )
+    score = models.FloatField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-score', 'place'], name='leaderboard_score_idx'),
+            models.Index(fields=['category', '-score', 'place'], name='leaderboard_category_score_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.place_id}: {self.score:.3f}'
+
+
+# Предрассчитанные кластеры маркеров: ячейка сетки Web Mercator на каждом уровне зума
+class PlaceCluster(models.Model):
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='clusters')
+    zoom = models.PositiveSmallIntegerField()
+    cell_x = models.PositiveIntegerField()
+    cell_y = models.PositiveIntegerField()
+    count = models.PositiveIntegerField(default=0)
+    # Суммы координат, чтобы центроид можно было сдвигать инкрементально
+    latitude_sum = models.FloatField(default=0)
+    longitude_sum = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'zoom', 'cell_x', 'cell_y'], name='unique_place_cluster_cell'),
+        ]
+
+    @property
+    def latitude(self):
+        return self.latitude_sum / self.count
+
+    @property
+    def longitude(self):
+        return self.longitude_sum / self.count
+
+    def __str__(self):
+        return f'{self.category} z{self.zoom} ({self.cell_x}, {self.cell_y}): {self.count}'
+
+
+# Учет ссылок на файлы в хранилище с адресацией по содержимому (places.storage)
+class StoredBlob(models.Model):
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.name} ({self.ref_count})'
+
+
 class Photo(models.Model):
     pending_place = models.ForeignKey(PendingPlace, on_delete=models.CASCADE, related_name='pending_photos', null=True, blank=True)
     place = models.ForeignKey(Place, on_delete=models.CASCADE, related_name='photos', null=True, blank=True)
-    image = models.ImageField(upload_to='place_photos/')
+    image = models.ImageField(upload_to='place_photos/', storage=blob_storage)
+    # Уменьшенные копии фото (см. places.images), пусто - пока не обработано
+    variants = models.JSONField(default=dict, blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f'Фото для {self.pending_place.name if self.pending_place else self.place.name}'
@@ -0,0 +1,134 @@
+"""
+Одобрение заявок модерации (PendingPlace).
+
+approve_submissions() одобряет любое количество заявок в одной транзакции
+фиксированным числом запросов: новые площадки создаются одним bulk_create,
+правки применяются одним bulk_update, а фото всех заявок переносятся на
+площадки одним UPDATE с подзапросом.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .clustering import add_places_to_clusters
+from .counters import adjust_place_counts
+from .geo import spatial_cell
+from .images import schedule_variants
+from .models import PendingPlace, Photo, Place
+
+BATCH_SIZE = 1000
+
+# Отправляется после одобрения пачки заявок: places - созданные и измененные площадки.
+# bulk-операции не вызывают post_save, поэтому подписчикам нужен отдельный сигнал
+submissions_approved = Signal()
+
+
+def _reject_orphaned_edits(submissions):
+    # Площадку удалили, пока правка ждала модерации (original_place - SET_NULL):
+    # применять правку некуда, а фото заявки иначе остались бы ничьими
+    if not submissions:
+        return
+    submission_ids = [submission.pk for submission in submissions]
+    # delete() по queryset отправляет post_delete для каждого фото - файлы освобождаются после коммита
+    Photo.objects.filter(pending_place_id__in=submission_ids).delete()
+    PendingPlace.objects.filter(pk__in=submission_ids).update(status='rejected')
+
+
+def approve_submissions(queryset):
+    """
+    Одобряет ожидающие заявки из queryset. Возвращает количество одобренных.
+    Правки уже удаленных площадок отклоняются, их фото удаляются.
+    """
+    with transaction.atomic():
+        submissions = list(
+            queryset.filter(status='pending')
+            .select_related('original_place', 'user', 'category')
+            .select_for_update(of=('self',))
+            .order_by('created_at', 'pk')
+        )
+        _reject_orphaned_edits([s for s in submissions if s.action == 'edit' and not s.original_place_id])
+        submissions = [s for s in submissions if s.action != 'edit' or s.original_place_id]
+        if not submissions:
+            return 0
+
+        additions = [s for s in submissions if s.action == 'add']
+        edits = [s for s in submissions if s.action == 'edit']
+
+        # Ключ импорта (external_id) уникален у площадок: если площадка с ним уже есть
+        # (импорт без --pending) или создается этой же пачкой, заявка ссылается на нее,
+        # а не роняет всю пачку на IntegrityError
+        keys = {s.external_id for s in additions if s.external_id}
+        imported = dict(Place.objects.filter(external_id__in=keys).values_list('external_id', 'pk')) if keys else {}
+        creating, duplicates = [], []
+        for submission in additions:
+            key = submission.external_id
+            if key and key in imported:
+                duplicates.append(submission)
+            else:
+                creating.append(submission)
+                if key:
+                    imported[key] = None
+
+        # bulk_create не вызывает Place.save(), поэтому spatial_cell считаем здесь
+        new_places = Place.objects.bulk_create(
+            [
+                Place(
+                    name=submission.name,
+                    description=submission.description,
+                    user=submission.user,
+                    latitude=submission.latitude,
+                    longitude=submission.longitude,
+                    category=submission.category,
+                    spatial_cell=spatial_cell(submission.latitude, submission.longitude),
+                    external_id=submission.external_id,
+                )
+                for submission in creating
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+        # Одобренная заявка на добавление теперь ссылается на созданную площадку
+        for submission, place in zip(creating, new_places):
+            submission.original_place = place
+            if place.external_id:
+                imported[place.external_id] = place.pk
+        for submission in duplicates:
+            submission.original_place_id = imported[submission.external_id]
+        PendingPlace.objects.bulk_update(additions, ['original_place'], batch_size=BATCH_SIZE)
+
+        # Несколько правок одной площадки: применяется последняя по времени
+        # bulk_update не выставляет auto_now - отметку изменения ставим сами
+        now = timezone.now()
+        edited = {}
+        for submission in edits:
+            original = submission.original_place
+            original.description = submission.description
+            original.updated_at = now
+            edited[original.pk] = original
+        Place.objects.bulk_update(list(edited.values()), ['description', 'updated_at'], batch_size=BATCH_SIZE)
+
+        # Уже существующие площадки заявок-дублей получают их фото
+        linked_ids = {s.original_place_id for s in duplicates} - {place.pk for place in new_places} - set(edited)
+        linked = list(Place.objects.filter(pk__in=linked_ids)) if linked_ids else []
+
+        submission_ids = [submission.pk for submission in submissions]
+        place_ids = [place.pk for place in new_places] + list(edited) + [place.pk for place in linked]
+
+        # Фото всех заявок переносятся на площадки одним запросом
+        target_place = PendingPlace.objects.filter(pk=OuterRef('pending_place_id')).values('original_place_id')[:1]
+        Photo.objects.filter(pending_place_id__in=submission_ids).update(
+            place_id=Subquery(target_place), pending_place=None, updated_at=now,
+        )
+
+        PendingPlace.objects.filter(pk__in=submission_ids).update(status='approved')
+
+        add_places_to_clusters(new_places)
+        adjust_place_counts(Counter(place.category_id for place in new_places))
+        schedule_variants(Photo.objects.filter(place_id__in=place_ids, variants={}))
+
+        submissions_approved.send(sender=PendingPlace, places=new_places + list(edited.values()) + linked)
+
+    return len(submissions)
@@ -0,0 +1,88 @@
+"""
+Поиск ближайших площадок вокруг точки.
+
+Кандидаты отбираются по пространственному индексу (PlaceQuerySet.in_bbox)
+в квадрате, описанном вокруг круга поиска, после чего точные расстояния
+по формуле гаверсинусов считаются одним векторным вычислением NumPy.
+"""
+import math
+
+import numpy as np
+
+from .models import Place
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LATITUDE = 111.32
+
+
+def haversine_km(latitude, longitude, latitudes, longitudes):
+    """Расстояния (км) от точки до массивов координат."""
+    lat1 = np.radians(latitude)
+    lat2 = np.radians(latitudes)
+    dlat = lat2 - lat1
+    dlon = np.radians(longitudes) - np.radians(longitude)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def rank_by_distance(latitude, longitude, latitudes, longitudes, radius_km, k):
+    """
+    Индексы k ближайших точек в пределах radius_km и расстояния до них,
+    отсортированные по возрастанию расстояния.
+    """
+    distances = haversine_km(latitude, longitude, latitudes, longitudes)
+    inside = np.flatnonzero(distances <= radius_km)
+    if len(inside) > k:
+        # argpartition - O(n), полная сортировка нужна только для k лучших
+        inside = inside[np.argpartition(distances[inside], k - 1)[:k]]
+    order = inside[np.argsort(distances[inside], kind='stable')]
+    return order, distances[order]
+
+
+def search_bbox(latitude, longitude, radius_km):
+    """Квадрат (west, south, east, north), описанный вокруг круга поиска."""
+    dlat = radius_km / KM_PER_DEGREE_LATITUDE
+    south, north = max(latitude - dlat, -90.0), min(latitude + dlat, 90.0)
+    cos_lat = math.cos(math.radians(latitude))
+    if north >= 90.0 or south <= -90.0 or cos_lat < 1e-6:
+        return -180.0, south, 180.0, north
+
+    dlon = radius_km / (KM_PER_DEGREE_LATITUDE * cos_lat)
+    if dlon >= 180.0:
+        return -180.0, south, 180.0, north
+    west = longitude - dlon
+    east = longitude + dlon
+    # Переход через антимеридиан: in_bbox понимает west > east
+    if west < -180.0:
+        west += 360.0
+    if east > 180.0:
+        east -= 360.0
+    return west, south, east, north
+
+
+def nearest_places(latitude, longitude, radius_km=5.0, k=10, category=None):
+    """
+    k ближайших площадок в радиусе radius_km, отсортированных по расстоянию.
+    У каждой площадки заполнен атрибут distance_km.
+    """
+    candidates = Place.objects.in_bbox(*search_bbox(latitude, longitude, radius_km))
+    if category is not None:
+        candidates = candidates.filter(category=category)
+
+    rows = list(candidates.values_list('pk', 'latitude', 'longitude'))
+    if not rows or k <= 0:
+        return []
+
+    pks = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    coordinates = np.array([(row[1], row[2]) for row in rows], dtype=np.float64)
+    order, distances = rank_by_distance(
+        latitude, longitude, coordinates[:, 0], coordinates[:, 1], radius_km, k
+    )
+
+    places = Place.objects.with_cover_photo().select_related('category').in_bulk(pks[order].tolist())
+    result = []
+    for pk, distance in zip(pks[order].tolist(), distances.tolist()):
+        place = places[pk]
+        place.distance_km = distance
+        result.append(place)
+    return result
@@ -0,0 +1,202 @@
+"""
+Кеширование страниц и фрагментов шаблонов.
+
+Анонимным посетителям home_page и category_detail отдаются целиком из кеша.
+Для авторизованных кешируются тяжелые фрагменты (сетки категорий, списки
+площадок) через стандартный тег {% cache %}.
+
+Сброс адресный: каждая страница и фрагмент зависят от набора меток
+(HOME_TAG, CATEGORIES_TAG, category_tag(id)). У метки есть версия в общем
+кеше, и она входит в ключ. Сигналы (places.signals) меняют версии затронутых
+меток, и старые записи просто перестают находиться и истекают по TTL.
+
+Вместе с версией хранится время сброса. Первые REPLICA_PIN_SECONDS секунд
+после него реплика (places.db_router) может еще не содержать изменение:
+промах страницы в это время рендерится из основной базы, а фрагменты,
+прочитанные с реплики, в кеш не пишутся - иначе устаревший HTML жил бы в
+кеше под новой версией до конца TTL.
+
+Асинхронным view (places.async_views) нужны acached_page и afragments_cached.
+
+Настройки:
+    PAGE_CACHE_ENABLED - общий выключатель (False - всегда рендерить заново);
+    PAGE_CACHE_TIMEOUTS - TTL в секундах по имени view и для 'fragment'.
+"""
+import hashlib
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import InvalidCacheBackendError, cache, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.db import transaction
+from django.http import HttpResponse
+
+from .db_router import reading_from, replica_may_lag
+
+# Метка всех страниц: позволяет сбросить кеш целиком
+ALL_TAG = 'all'
+# Главная: популярные площадки, количество площадок в категориях
+HOME_TAG = 'home'
+# Названия и обложки категорий (меню, сетки, выпадающий список)
+CATEGORIES_TAG = 'categories'
+
+DEFAULT_TIMEOUTS = {
+    'home': 300,
+    'category_detail': 120,
+    'fragment': 600,
+}
+
+
+def category_tag(category_id):
+    """Метка площадок одной категории."""
+    return f'category:{category_id}'
+
+
+def is_enabled():
+    return getattr(settings, 'PAGE_CACHE_ENABLED', True)
+
+
+def timeout_for(name):
+    timeouts = {**DEFAULT_TIMEOUTS, **getattr(settings, 'PAGE_CACHE_TIMEOUTS', {})}
+    return timeouts.get(name, DEFAULT_TIMEOUTS['fragment'])
+
+
+def _tag_key(tag):
+    return f'places:page_tag:{tag}'
+
+
+def _tag_state(tags):
+    """
+    Строка из текущих версий меток и время последнего сброса любой из них
+    (None - метки заведены заново и не сбрасывались).
+    """
+    tags = [ALL_TAG, *tags]
+    states = cache.get_many([_tag_key(tag) for tag in tags])
+    for tag in tags:
+        key = _tag_key(tag)
+        if key not in states:
+            # add() не перетрет версию, которую успел завести другой процесс
+            cache.add(key, (uuid.uuid4().hex, None), timeout=None)
+            states[key] = cache.get(key)
+    states = [states[_tag_key(tag)] for tag in tags]
+    bumped = [bumped_at for _, bumped_at in states if bumped_at is not None]
+    return '.'.join(str(version) for version, _ in states), max(bumped, default=None)
+
+
+def tag_versions(tags):
+    """Строка из текущих версий меток; отсутствующие версии заводятся заново."""
+    return _tag_state(tags)[0]
+
+
+def _bump(tags):
+    bumped_at = time.time()
+    cache.set_many({_tag_key(tag): (uuid.uuid4().hex, bumped_at) for tag in tags}, timeout=None)
+
+
+def invalidate_pages(*tags):
+    """Сбрасывает все страницы и фрагменты с этими метками."""
+    tags = [tag for tag in tags if tag]
+    if not tags:
+        return
+    _bump(tags)
+    # Повторно после коммита - чтобы не остался снимок, отрендеренный до коммита
+    transaction.on_commit(lambda: _bump(tags))
+
+
+def invalidate_all_pages():
+    invalidate_pages(ALL_TAG)
+
+
+def fragment_context(tags):
+    """Контекст для {% cache fragment_cache.timeout 'имя' fragment_cache.version %}."""
+    if not is_enabled():
+        # TTL 0: фрагмент рендерится каждый раз и в кеше не задерживается
+        return {'timeout': 0, 'version': ''}
+    versions, bumped_at = _tag_state(tags)
+    if replica_may_lag(bumped_at):
+        # Фрагмент с реплики сразу после сброса может быть устаревшим: рендерим, но не кешируем
+        return {'timeout': 0, 'version': versions}
+    return {'timeout': timeout_for('fragment'), 'version': versions}
+
+
+def _page_key(request, name, versions):
+    digest = hashlib.md5(f'{request.get_full_path()}|{versions}'.encode()).hexdigest()
+    return f'places:page:{name}:{digest}'
+
+
+def _cached_response(cached):
+    content, content_type = cached
+    response = HttpResponse(content, content_type=content_type)
+    response['X-Page-Cache'] = 'hit'
+    return response
+
+
+def _cacheable(response):
+    return response.status_code == 200 and not response.streaming
+
+
+def cached_page(request, name, tags, render_page):
+    """
+    Отдает страницу из кеша анонимным посетителям (только GET/HEAD);
+    иначе вызывает render_page(). В кеш попадают только ответы 200.
+    """
+    if not is_enabled() or request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+        return render_page()
+
+    versions, bumped_at = _tag_state(tags)
+    key = _page_key(request, name, versions)
+    cached = cache.get(key)
+    if cached is not None:
+        return _cached_response(cached)
+
+    if replica_may_lag(bumped_at):
+        # Реплика могла еще не получить изменение, сбросившее метки: промах - из основной базы
+        with reading_from(None):
+            response = render_page()
+    else:
+        response = render_page()
+    if _cacheable(response):
+        cache.set(key, (response.content, response['Content-Type']), timeout_for(name))
+        response['X-Page-Cache'] = 'miss'
+    return response
+
+
+async def acached_page(request, name, tags, render_page):
+    """cached_page для асинхронных view: render_page возвращает корутину."""
+    if not is_enabled() or request.method not in ('GET', 'HEAD') or (await request.auser()).is_authenticated:
+        return await render_page()
+
+    versions, bumped_at = await sync_to_async(_tag_state)(tags)
+    key = _page_key(request, name, versions)
+    cached = await cache.aget(key)
+    if cached is not None:
+        return _cached_response(cached)
+
+    if replica_may_lag(bumped_at):
+        with reading_from(None):
+            response = await render_page()
+    else:
+        response = await render_page()
+    if _cacheable(response):
+        await cache.aset(key, (response.content, response['Content-Type']), timeout_for(name))
+        response['X-Page-Cache'] = 'miss'
+    return response
+
+
+async def afragments_cached(fragment_cache, names, *vary_on):
+    """
+    True, если все фрагменты names с этими vary_on уже в кеше шаблонов
+    (порядок vary_on - как в теге {% cache %}, версия fragment_cache - последней).
+    Тогда асинхронному view не нужно заранее загружать их данные.
+    """
+    if not fragment_cache['timeout']:
+        return False
+    try:
+        fragments = caches['template_fragments']
+    except InvalidCacheBackendError:
+        fragments = cache
+    # Тег {% cache %} берет имя фрагмента вместе с кавычками из шаблона
+    keys = [make_template_fragment_key(f"'{name}'", [*vary_on, fragment_cache['version']]) for name in names]
+    return len(await fragments.aget_many(keys)) == len(keys)
@@ -0,0 +1,145 @@
+"""
+Постраничный вывод по ключу (keyset pagination).
+
+Вместо OFFSET следующая страница выбирается условием «строго после
+последней показанной строки» по тем же полям, что и сортировка. Запрос
+идет по индексу и стоит одинаково на любой странице, а курсор не «съезжает»,
+если между запросами добавились или удалились строки.
+
+Сортировка задается кортежем (поле, по_убыванию); последним полем должен
+быть уникальный ключ (pk), чтобы порядок был полным. NULL всегда в конце.
+Курсор - значения этих полей у последней строки страницы в base64(JSON).
+"""
+import base64
+import binascii
+import datetime
+import json
+import math
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _encode_value(value):
+    if isinstance(value, datetime.datetime):
+        return {'dt': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and 'dt' in value:
+        return datetime.datetime.fromisoformat(value['dt'])
+    return value
+
+
+def encode_cursor(values):
+    data = json.dumps([_encode_value(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, length):
+    try:
+        data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(data)
+        if not isinstance(values, list) or len(values) != length:
+            raise InvalidCursor('Неверная длина курсора')
+        return [_decode_value(value) for value in values]
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as error:
+        raise InvalidCursor(str(error)) from error
+
+
+def _coerce(ordering, values, model):
+    """
+    Приводит значения курсора к типам полей сортировки (to_python и валидаторы поля).
+    Подделанный курсор с чужими типами - InvalidCursor, а не ошибка в запросе.
+    """
+    coerced = []
+    for (field, _), value in zip(ordering, values):
+        model_field = model._meta.get_field(field)
+        if value is None:
+            if not model_field.null:
+                raise InvalidCursor(f'Пустое значение поля {field}')
+            coerced.append(None)
+            continue
+        if isinstance(value, (dict, list)) or (isinstance(value, float) and not math.isfinite(value)):
+            raise InvalidCursor(f'Неверное значение поля {field}')
+        try:
+            value = model_field.to_python(value)
+            model_field.run_validators(value)
+        except (ValidationError, TypeError, ValueError) as error:
+            raise InvalidCursor(f'Неверное значение поля {field}') from error
+        coerced.append(value)
+    return coerced
+
+
+def _order_by(ordering):
+    return [
+        F(field).desc(nulls_last=True) if descending else F(field).asc(nulls_last=True)
+        for field, descending in ordering
+    ]
+
+
+def _after(ordering, values, model):
+    """Условие «строка идет после строки со значениями values» для сортировки ordering."""
+    condition = Q(pk__in=[])
+    equal = Q()
+    for (field, descending), value in zip(ordering, values):
+        nullable = model._meta.get_field(field).null
+        if value is None:
+            # NULL в конце: после NULL идут только NULL с большими следующими полями
+            equal &= Q(**{f'{field}__isnull': True})
+            continue
+        after = Q(**{f'{field}__{"lt" if descending else "gt"}': value})
+        if nullable:
+            after |= Q(**{f'{field}__isnull': True})
+        condition |= equal & after
+        equal &= Q(**{field: value})
+    return condition
+
+
+class KeysetPage:
+    """
+    Одна страница queryset в порядке ordering. Курсор проверяется сразу
+    (неверный - InvalidCursor), а запрос выполняется при первом обращении
+    к items или next_cursor, поэтому страницу можно отдать в кешируемый
+    фрагмент шаблона.
+    """
+
+    def __init__(self, queryset, ordering, cursor=None, page_size=20):
+        self.ordering = ordering
+        self.page_size = page_size
+        self.cursor = cursor or None
+        queryset = queryset.order_by(*_order_by(ordering))
+        if self.cursor:
+            values = _coerce(ordering, decode_cursor(self.cursor, len(ordering)), queryset.model)
+            queryset = queryset.filter(_after(ordering, values, queryset.model))
+        self.queryset = queryset
+
+    @cached_property
+    def _rows(self):
+        # Лишняя строка показывает, есть ли следующая страница
+        items = list(self.queryset[:self.page_size + 1])
+        if len(items) <= self.page_size:
+            return items, None
+        items = items[:self.page_size]
+        last = items[-1]
+        return items, encode_cursor([getattr(last, field) for field, _ in self.ordering])
+
+    @property
+    def items(self):
+        return self._rows[0]
+
+    @property
+    def next_cursor(self):
+        return self._rows[1]
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
@@ -0,0 +1,113 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, FloatField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+from django.db.models.lookups import GreaterThan
+from django.utils import timezone
+
+from .leaderboard import rebuild_leaderboard, refresh_places
+from .models import Place, Rating
+
+# Площадок в одном UPDATE при пересчете агрегатов
+BATCH_SIZE = 1000
+
+
+def _average(rating_sum, rating_count):
+    """Средняя оценка по выражениям суммы и количества; без оценок - NULL."""
+    return Case(
+        When(GreaterThan(rating_count, 0), then=Cast(rating_sum, FloatField()) / Cast(rating_count, FloatField())),
+        default=Value(None),
+        output_field=FloatField(),
+    )
+
+
+def _apply_rating_delta(place_id, delta_sum, delta_count):
+    """
+    Атомарно сдвигает сохраненные агрегаты площадки одним UPDATE.
+    Правая часть SET читает старые значения строки, поэтому среднее
+    считается от уже сдвинутых суммы и количества.
+    """
+    new_sum = F('rating_sum') + delta_sum
+    new_count = F('rating_count') + delta_count
+    Place.objects.filter(pk=place_id).update(
+        rating_sum=new_sum,
+        rating_count=new_count,
+        # Последняя оценка удалена - среднего нет (и нет деления на ноль)
+        average_rating=_average(new_sum, new_count),
+        # update() не выставляет auto_now, а средняя оценка видна на странице
+        updated_at=timezone.now(),
+    )
+    # Байесовская оценка в таблице лидеров - по уже сдвинутым агрегатам
+    refresh_places([place_id])
+
+
+def submit_rating(place, user, value):
+    """
+    Создает или меняет оценку пользователя и в той же транзакции
+    обновляет rating_sum / rating_count / average_rating площадки.
+    """
+    with transaction.atomic():
+        rating = Rating.objects.select_for_update().filter(place=place, user=user).first()
+
+        if rating is None:
+            # select_for_update не блокирует отсутствующую строку: две первые
+            # оценки одновременно упрутся в unique_together
+            try:
+                with transaction.atomic():
+                    rating = Rating.objects.create(place=place, user=user, value=value)
+            except IntegrityError:
+                # Параллельный запрос успел создать оценку - меняем ее как обычно
+                rating = Rating.objects.select_for_update().get(place=place, user=user)
+            else:
+                _apply_rating_delta(place.pk, value, 1)
+                return rating
+
+        if rating.value != value:
+            delta = value - rating.value
+            rating.value = value
+            rating.save(update_fields=['value'])
+            _apply_rating_delta(place.pk, delta, 0)
+
+    return rating
+
+
+def remove_rating(place_id, value):
+    """Вычитает удаленную оценку из агрегатов площадки (сигнал post_delete Rating)."""
+    _apply_rating_delta(place_id, -value, -1)
+
+
+def rebuild_rating_aggregates(queryset=None):
+    """
+    Пересчитывает агрегаты с нуля по таблице Rating. Обновляются (и получают
+    новую отметку updated_at) только площадки, у которых агрегаты разошлись
+    с таблицей оценок; после этого пересчитывается таблица лидеров.
+    Возвращает количество исправленных площадок.
+    """
+    if queryset is None:
+        queryset = Place.objects.all()
+
+    ratings = Rating.objects.filter(place=OuterRef('pk')).order_by().values('place')
+    rating_sum = Coalesce(Subquery(ratings.annotate(total=Sum('value')).values('total')), Value(0))
+    rating_count = Coalesce(Subquery(ratings.annotate(total=Count('pk')).values('total')), Value(0))
+
+    # NULL среднего сравниваем через -1: оценки не бывают отрицательными
+    changed_ids = list(
+        queryset.annotate(
+            new_sum=rating_sum, new_count=rating_count,
+            old_average=Coalesce('average_rating', Value(-1.0)),
+            new_average=Coalesce(_average(F('new_sum'), F('new_count')), Value(-1.0)),
+        )
+        .filter(~Q(rating_sum=F('new_sum')) | ~Q(rating_count=F('new_count')) | ~Q(old_average=F('new_average')))
+        .values_list('pk', flat=True)
+    )
+    now = timezone.now()
+    for start in range(0, len(changed_ids), BATCH_SIZE):
+        Place.objects.filter(pk__in=changed_ids[start:start + BATCH_SIZE]).update(
+            rating_sum=rating_sum,
+            rating_count=rating_count,
+            average_rating=_average(rating_sum, rating_count),
+            updated_at=now,
+        )
+    if changed_ids:
+        # Сдвинулись агрегаты, а с ними и априорное среднее: пересчитываем всю таблицу лидеров
+        rebuild_leaderboard()
+    return len(changed_ids)
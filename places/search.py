@@ -0,0 +1,183 @@
+"""
+Полнотекстовый поиск площадок по названию, описанию и названию категории.
+
+PostgreSQL: хранимое поле Place.search_vector (tsvector с весами A/B/C) под
+GIN-индексом; запрос - to_tsquery с префиксным совпадением каждого слова,
+ранжирование - ts_rank.
+
+SQLite (локальный запуск и тесты): теневая таблица FTS5 places_place_fts
+с rowid = Place.id, ранжирование - bm25.
+
+Индекс обновляется при сохранении площадки, переименовании и удалении
+категории и одобрении заявок (см. places.signals); полностью пересчитывается
+командой rebuild_search_index.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Category, Place
+
+FTS_TABLE = 'places_place_fts'
+# Веса столбцов FTS5 для bm25: название, описание, категория
+FTS_WEIGHTS = (10.0, 1.0, 3.0)
+CHUNK_SIZE = 500
+# Более длинные запросы обрезаются: каждое слово - отдельное условие
+MAX_TERMS = 8
+# Однобуквенный префикс совпадает почти со всеми площадками - такие слова отбрасываем
+MIN_TERM_LENGTH = 2
+
+
+def _config():
+    return getattr(settings, 'SEARCH_CONFIG', 'russian')
+
+
+def search_terms(query):
+    """Слова запроса в нижнем регистре (только буквы и цифры, не короче MIN_TERM_LENGTH)."""
+    terms = [term for term in re.findall(r'\w+', (query or '').lower()) if len(term) >= MIN_TERM_LENGTH]
+    return terms[:MAX_TERMS]
+
+
+def _chunks(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), CHUNK_SIZE):
+        yield ids[start:start + CHUNK_SIZE]
+
+
+# --- PostgreSQL ---
+
+def _pg_vector():
+    from django.contrib.postgres.search import SearchVector
+
+    config = _config()
+    category_name = Subquery(Category.objects.filter(pk=OuterRef('category_id')).values('name')[:1])
+    return (
+        SearchVector('name', weight='A', config=config)
+        + SearchVector('description', weight='B', config=config)
+        + SearchVector(Coalesce(category_name, Value('')), weight='C', config=config)
+    )
+
+
+def _pg_search(terms, category_id, limit):
+    from django.contrib.postgres.search import SearchQuery, SearchRank
+
+    # Каждое слово совпадает по префиксу: 'футб' найдет 'футбольное'
+    query = SearchQuery(' & '.join(f'{term}:*' for term in terms), search_type='raw', config=_config())
+    places = Place.objects.filter(search_vector=query)
+    if category_id is not None:
+        places = places.filter(category_id=category_id)
+    places = places.annotate(search_rank=SearchRank('search_vector', query)).order_by('-search_rank', '-pk')
+    return list(places.values_list('pk', 'search_rank')[:limit])
+
+
+# --- SQLite FTS5 ---
+
+def _fts_search(terms, category_id, limit):
+    match = ' '.join(f'"{term}"*' for term in terms)
+    weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+    sql = (
+        f'SELECT fts.rowid, -bm25({FTS_TABLE}, {weights}) AS search_rank '
+        f'FROM {FTS_TABLE} AS fts '
+    )
+    params = [match]
+    if category_id is not None:
+        sql += f'JOIN {Place._meta.db_table} AS place ON place.id = fts.rowid '
+    sql += f'WHERE {FTS_TABLE} MATCH %s '
+    if category_id is not None:
+        sql += 'AND place.category_id = %s '
+        params.append(category_id)
+    sql += 'ORDER BY search_rank DESC, fts.rowid DESC LIMIT %s'
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _fts_delete(cursor, chunk):
+    placeholders = ', '.join(['%s'] * len(chunk))
+    cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', chunk)
+
+
+def _fts_index(chunk):
+    placeholders = ', '.join(['%s'] * len(chunk))
+    with connection.cursor() as cursor:
+        _fts_delete(cursor, chunk)
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, description, category) '
+            f'SELECT place.id, place.name, place.description, COALESCE(category.name, \'\') '
+            f'FROM {Place._meta.db_table} AS place '
+            f'LEFT JOIN {Category._meta.db_table} AS category ON category.id = place.category_id '
+            f'WHERE place.id IN ({placeholders})',
+            chunk,
+        )
+
+
+# --- Общий интерфейс ---
+
+def index_places(place_ids):
+    """Обновляет поисковый индекс для площадок с этими id."""
+    for chunk in _chunks(place_ids):
+        if connection.vendor == 'postgresql':
+            Place.objects.filter(pk__in=chunk).update(search_vector=_pg_vector())
+        elif connection.vendor == 'sqlite':
+            _fts_index(chunk)
+
+
+def unindex_places(place_ids):
+    """Убирает удаленные площадки из индекса (в PostgreSQL вектор удаляется вместе со строкой)."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for chunk in _chunks(place_ids):
+            _fts_delete(cursor, chunk)
+
+
+def rebuild_search_index():
+    """Пересчитывает индекс для всех площадок. Возвращает их количество."""
+    if connection.vendor == 'postgresql':
+        return Place.objects.update(search_vector=_pg_vector())
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        ids = list(Place.objects.order_by('pk').values_list('pk', flat=True))
+        index_places(ids)
+        return len(ids)
+    return 0
+
+
+def search_places(query, category=None, limit=20):
+    """
+    Площадки по текстовому запросу, от более релевантных к менее.
+    Возвращает список Place с атрибутом search_rank (карточки с first_photo
+    без дополнительных запросов).
+    """
+    terms = search_terms(query)
+    if not terms or limit <= 0:
+        return []
+    category_id = category.pk if category is not None else None
+
+    if connection.vendor == 'postgresql':
+        ranked = _pg_search(terms, category_id, limit)
+    elif connection.vendor == 'sqlite':
+        ranked = _fts_search(terms, category_id, limit)
+    else:
+        # Другие базы: простой поиск без индекса
+        places = Place.objects.all()
+        for term in terms:
+            places = places.filter(Q(name__icontains=term) | Q(description__icontains=term))
+        if category_id is not None:
+            places = places.filter(category_id=category_id)
+        ranked = [(pk, 0.0) for pk in places.order_by('-pk').values_list('pk', flat=True)[:limit]]
+
+    ranks = dict(ranked)
+    places = Place.objects.with_cover_photo().select_related('category').in_bulk(list(ranks))
+    result = []
+    for pk, rank in ranked:
+        place = places.get(pk)
+        if place is not None:
+            place.search_rank = rank
+            result.append(place)
+    return result
@@ -0,0 +1,236 @@
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .catalog import invalidate_category_catalog
+from .clustering import add_place_to_clusters, remove_place_from_clusters
+from .conditional import touch_categories, touch_places
+from .counters import adjust_comment_count, adjust_place_counts
+from .images import release_variants
+from .leaderboard import refresh_places
+from .moderation import submissions_approved
+from .ratings import remove_rating
+from .models import Category, Comment, Photo, Place, Rating
+from .page_cache import CATEGORIES_TAG, HOME_TAG, category_tag, invalidate_pages
+from .search import index_places, unindex_places
+from .storage import release_file
+
+
+def _invalidate_place_pages(*category_ids):
+    # Площадки видны на главной и на страницах своих категорий
+    category_ids = {pk for pk in category_ids if pk is not None}
+    invalidate_pages(HOME_TAG, *(category_tag(pk) for pk in category_ids))
+    # Отметки категорий - валидаторы этих страниц для условных GET (places.conditional)
+    touch_categories(category_ids)
+
+
+def _place_category_id(place_id):
+    return Place.objects.filter(pk=place_id).values_list('category_id', flat=True).first()
+
+
+def _deleted_with_place(origin):
+    # Удаление площадки каскадом уносит ее оценки, комментарии и фото: их
+    # сигналы не пересчитывают агрегаты площадки - place_deleted сбросит все сам
+    return isinstance(origin, Place) or (isinstance(origin, QuerySet) and origin.model is Place)
+
+
+def _cluster_key(category_id, latitude, longitude):
+    # Decimal из базы и float/строка из формы сравниваем как числа
+    return (
+        category_id,
+        None if latitude is None else float(latitude),
+        None if longitude is None else float(longitude),
+    )
+
+
+@receiver(pre_save, sender=Place)
+def place_remember_category(sender, instance, **kwargs):
+    # При смене категории нужно сбросить и страницу прежней категории,
+    # а при переносе точки - убрать площадку из прежних кластеров карты
+    instance._previous_category_id = None
+    instance._previous_location = None
+    if instance.pk:
+        previous = Place.objects.filter(pk=instance.pk).values_list('category_id', 'latitude', 'longitude').first()
+        if previous:
+            instance._previous_category_id = previous[0]
+            instance._previous_location = previous
+
+
+@receiver(post_save, sender=Place)
+def place_saved(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_category_id', None)
+    if created:
+        adjust_place_counts({instance.category_id: 1})
+        add_place_to_clusters(instance)
+    elif previous != instance.category_id:
+        adjust_place_counts({previous: -1, instance.category_id: 1})
+        # Площадка переходит в топ новой категории
+        refresh_places([instance.pk])
+
+    location = getattr(instance, '_previous_location', None)
+    if location and _cluster_key(*location) != _cluster_key(instance.category_id, instance.latitude, instance.longitude):
+        # Кластеры хранят суммы координат: вычитаем прежнюю точку и прибавляем новую
+        category_id, latitude, longitude = location
+        remove_place_from_clusters(Place(category_id=category_id, latitude=latitude, longitude=longitude))
+        add_place_to_clusters(instance)
+    _invalidate_place_pages(instance.category_id, previous)
+    index_places([instance.pk])
+
+
+@receiver(post_delete, sender=Place)
+def place_deleted(sender, instance, **kwargs):
+    # Убираем удаленную площадку из предрассчитанных кластеров карты
+    remove_place_from_clusters(instance)
+    adjust_place_counts({instance.category_id: -1})
+    unindex_places([instance.pk])
+    _invalidate_place_pages(instance.category_id)
+
+
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+def rating_changed(sender, instance, origin=None, **kwargs):
+    if _deleted_with_place(origin):
+        return
+    # Средняя оценка показывается в карточках площадок
+    _invalidate_place_pages(_place_category_id(instance.place_id))
+
+
+@receiver(post_delete, sender=Rating)
+def rating_deleted(sender, instance, origin=None, **kwargs):
+    # Оценки удаляются вместе с площадкой - агрегаты и таблица лидеров уходят с ней
+    if _deleted_with_place(origin):
+        return
+    # Удаление из админки или вместе с пользователем: агрегаты не ждут rebuild_ratings
+    remove_rating(instance.place_id, instance.value)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        adjust_comment_count(instance.place_id, 1)
+    else:
+        # Правка текста: счетчик прежний, но страница площадки изменилась
+        touch_places([instance.place_id])
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, origin=None, **kwargs):
+    if _deleted_with_place(origin):
+        return
+    adjust_comment_count(instance.place_id, -1)
+
+
+@receiver(post_save, sender=Photo)
+def photo_saved(sender, instance, **kwargs):
+    # Первое фото - обложка карточки площадки
+    if instance.place_id:
+        _invalidate_place_pages(_place_category_id(instance.place_id))
+
+
+@receiver(submissions_approved)
+def submissions_approved_pages(sender, places, **kwargs):
+    _invalidate_place_pages(*(place.category_id for place in places))
+    # Новые площадки и правки описаний попадают в поиск сразу после одобрения
+    index_places([place.pk for place in places])
+
+
+def _release_image(field_file, variants):
+    # Файлы освобождаем только после коммита: при откате запись снова на них ссылается
+    name, storage = field_file.name, field_file.storage
+
+    def release():
+        release_file(storage, name)
+        release_variants(field_file, variants)
+
+    transaction.on_commit(release)
+
+
+@receiver(pre_save, sender=Photo)
+def photo_remember_previous(sender, instance, **kwargs):
+    # Замена файла из админки: прежний файл и его варианты освобождаем после сохранения
+    instance._previous_image = None
+    if instance.pk:
+        instance._previous_image = (
+            Photo.objects.filter(pk=instance.pk).values_list('image', 'variants').first()
+        )
+
+
+@receiver(post_save, sender=Photo)
+def photo_release_old_image(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_image', None)
+    if previous and previous[0] and previous[0] != instance.image.name:
+        old_image = Photo._meta.get_field('image').attr_class(
+            instance, Photo._meta.get_field('image'), previous[0]
+        )
+        _release_image(old_image, previous[1])
+
+
+@receiver(post_delete, sender=Photo)
+def photo_deleted(sender, instance, origin=None, **kwargs):
+    # Файл освобождаем всегда, в том числе когда фото уходит вместе с площадкой
+    if instance.image:
+        _release_image(instance.image, instance.variants)
+    if instance.place_id and not _deleted_with_place(origin):
+        # Удаление фото не оставляет своей отметки updated_at - сдвигаем отметку площадки
+        touch_places([instance.place_id])
+        _invalidate_place_pages(_place_category_id(instance.place_id))
+
+
+@receiver(pre_save, sender=Category)
+def category_remember_previous(sender, instance, **kwargs):
+    # Запоминаем прежнюю обложку, чтобы после сохранения освободить ее файл,
+    # и прежнее название - при переименовании нужно обновить поисковый индекс
+    instance._previous_cover = None
+    instance._previous_name = None
+    if instance.pk:
+        previous = (
+            Category.objects.filter(pk=instance.pk).values_list('cover_photo', 'cover_variants', 'name').first()
+        )
+        if previous:
+            instance._previous_cover = previous[:2]
+            instance._previous_name = previous[2]
+
+
+@receiver(post_save, sender=Category)
+def category_release_old_cover(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_cover', None)
+    if previous and previous[0] and previous[0] != instance.cover_photo.name:
+        old_cover = Category._meta.get_field('cover_photo').attr_class(
+            instance, Category._meta.get_field('cover_photo'), previous[0]
+        )
+        _release_image(old_cover, previous[1])
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    if instance.cover_photo:
+        _release_image(instance.cover_photo, instance.cover_variants)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, instance, **kwargs):
+    # Справочник категорий (меню, выпадающие списки) перечитается из базы
+    invalidate_category_catalog()
+    invalidate_pages(CATEGORIES_TAG, HOME_TAG, category_tag(instance.pk))
+
+
+@receiver(post_save, sender=Category)
+def category_renamed(sender, instance, created, **kwargs):
+    # Название категории входит в поисковый индекс ее площадок
+    previous = getattr(instance, '_previous_name', None)
+    if not created and previous is not None and previous != instance.name:
+        index_places(instance.places.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Category)
+def category_remember_places(sender, instance, **kwargs):
+    # Площадки остаются без категории (SET_NULL делает UPDATE без сигналов),
+    # а название удаленной категории нужно убрать из их поискового индекса
+    instance._place_ids = list(instance.places.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted_reindex(sender, instance, **kwargs):
+    index_places(getattr(instance, '_place_ids', []))
@@ -0,0 +1,135 @@
+// Карта площадок: данные приходят из GeoJSON-эндпоинта (data-map-url),
+// маркеры и попапы рисуются на клиенте через Leaflet.
+(function () {
+    const DEFAULT_CENTER = [53.9, 27.5667]; // Минск
+    const DEFAULT_ZOOM = 12;
+
+    const HTML_ESCAPES = {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'};
+
+    function escapeHtml(value) {
+        return String(value == null ? '' : value).replace(/[&<>"']/g, ch => HTML_ESCAPES[ch]);
+    }
+
+    function popupHtml(feature, withLink) {
+        const props = feature.properties;
+        const [lon, lat] = feature.geometry.coordinates;
+        const routeUrl = `https://yandex.ru/maps/?rtext=~${lat},${lon}&z=15`;
+        const name = escapeHtml(props.name);
+        const title = withLink
+            ? `<a href="${props.url}" style="color: #007bff; text-decoration: none; font-weight: bold;">${name}</a>`
+            : `<b style="color: #007bff;">${name}</b>`;
+        const photo = props.photo
+            ? `<img src="${props.photo}" alt="${name} фото" loading="lazy">`
+            : '';
+        return `
+            <div class="custom-popup">
+                ${photo}
+                <div class="popup-content">
+                    ${title}
+                    <a href="${routeUrl}" target="_blank" rel="noopener" style="color: #555; font-size: 0.9em; text-decoration: none;">Построить маршрут</a>
+                </div>
+            </div>`;
+    }
+
+    function initMap(container) {
+        const withLink = container.dataset.popupLinks !== 'false';
+        const map = L.map(container).setView(DEFAULT_CENTER, DEFAULT_ZOOM);
+        L.tileLayer('https://tile.openstreetmap.org/{z}/{x}/{y}.png', {
+            maxZoom: 19,
+            attribution: '&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a>',
+        }).addTo(map);
+
+        fetch(container.dataset.mapUrl, {credentials: 'same-origin'})
+            .then(response => response.json())
+            .then(data => {
+                const layer = L.geoJSON(data, {
+                    pointToLayer: (feature, latlng) => L.marker(latlng)
+                        .bindTooltip(escapeHtml(feature.properties.name))
+                        .bindPopup(popupHtml(feature, withLink), {maxWidth: 200}),
+                }).addTo(map);
+
+                if (data.features.length === 1) {
+                    map.setView(layer.getLayers()[0].getLatLng(), DEFAULT_ZOOM);
+                } else if (data.features.length > 1) {
+                    map.fitBounds(layer.getBounds(), {padding: [20, 20]});
+                }
+            });
+    }
+
+    function clusterIcon(count) {
+        const size = count < 10 ? 30 : count < 100 ? 38 : 46;
+        return L.divIcon({
+            html: `<span>${count}</span>`,
+            className: 'map-cluster',
+            iconSize: [size, size],
+        });
+    }
+
+    function clamp(value, min, max) {
+        return Math.min(Math.max(value, min), max);
+    }
+
+    // Карта категории: сервер отдает кластеры (или отдельные площадки)
+    // только для видимой области и текущего зума (data-cluster-url)
+    function initClusterMap(container) {
+        const url = container.dataset.clusterUrl;
+        const map = L.map(container).setView(DEFAULT_CENTER, DEFAULT_ZOOM);
+        L.tileLayer('https://tile.openstreetmap.org/{z}/{x}/{y}.png', {
+            maxZoom: 19,
+            attribution: '&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a>',
+        }).addTo(map);
+
+        const layer = L.layerGroup().addTo(map);
+        let controller = null;
+
+        function render(data) {
+            layer.clearLayers();
+            L.geoJSON(data, {
+                pointToLayer: (feature, latlng) => {
+                    const props = feature.properties;
+                    if (props.cluster) {
+                        return L.marker(latlng, {icon: clusterIcon(props.count)})
+                            .on('click', () => map.setView(latlng, Math.min(map.getZoom() + 2, map.getMaxZoom())));
+                    }
+                    return L.marker(latlng)
+                        .bindTooltip(escapeHtml(props.name))
+                        .bindPopup(popupHtml(feature, true), {maxWidth: 200});
+                },
+            }).addTo(layer);
+        }
+
+        function refresh() {
+            const bounds = map.getBounds();
+            const bbox = [
+                clamp(bounds.getWest(), -180, 180),
+                clamp(bounds.getSouth(), -85, 85),
+                clamp(bounds.getEast(), -180, 180),
+                clamp(bounds.getNorth(), -85, 85),
+            ].map(value => value.toFixed(5)).join(',');
+
+            // Отменяем устаревший запрос, если пользователь продолжает двигать карту
+            if (controller) controller.abort();
+            controller = new AbortController();
+            fetch(`${url}?bbox=${bbox}&zoom=${map.getZoom()}`, {signal: controller.signal, credentials: 'same-origin'})
+                .then(response => response.json())
+                .then(render)
+                .catch(error => { if (error.name !== 'AbortError') throw error; });
+        }
+
+        fetch(url, {credentials: 'same-origin'})
+            .then(response => response.json())
+            .then(data => {
+                if (data.bbox) {
+                    const [west, south, east, north] = data.bbox;
+                    map.fitBounds([[south, west], [north, east]], {padding: [20, 20], maxZoom: 15});
+                }
+                map.on('moveend', refresh);
+                refresh();
+            });
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        document.querySelectorAll('[data-map-url]').forEach(initMap);
+        document.querySelectorAll('[data-cluster-url]').forEach(initClusterMap);
+    });
+})();
@@ -0,0 +1,175 @@
+"""
+Статика с хешем в имени и заранее сжатыми копиями.
+
+Сборка (collectstatic) через PrecompressedManifestStaticFilesStorage:
+    1. ManifestStaticFilesStorage копирует файлы под именами с хешем
+       содержимого (css/styles.3f2a9c1b.css) и переписывает ссылки в CSS;
+       {% static %} отдает эти имена, поэтому их можно кешировать навсегда;
+    2. текстовые файлы (CSS, JS, SVG, JSON...) дополнительно сжимаются в
+       .gz и в .br (пакет brotli из зависимостей проекта) - один раз при сборке,
+       а не на каждом запросе.
+
+Отдача - PrecompressedStaticMiddleware: запрос к STATIC_URL обслуживается из
+STATIC_ROOT, выбирая .br или .gz по Accept-Encoding. Имена с хешем получают
+Cache-Control: max-age на год и immutable, остальные - STATIC_MAX_AGE секунд
+и проверку If-Modified-Since. Если перед Django стоит nginx со своей
+раздачей статики, те же копии подхватывают gzip_static / brotli_static.
+"""
+import gzip
+import logging
+import mimetypes
+import os
+from functools import cached_property
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:  # окружение без зависимостей проекта: собираются только .gz
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.mjs', '.map', '.svg', '.json', '.geojson', '.txt', '.html', '.xml', '.ico'}
+# Мелкие файлы не сжимаем: выигрыш меньше заголовков
+MIN_COMPRESS_SIZE = 512
+# Копия сохраняется, только если она заметно меньше оригинала
+MAX_COMPRESS_RATIO = 0.95
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Суффикс копии -> Content-Encoding, в порядке предпочтения
+ENCODINGS = (('.br', 'br'), ('.gz', 'gzip'))
+
+
+def _compressors():
+    compressors = {'.gz': lambda data: gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        compressors['.br'] = lambda data: brotli.compress(data, quality=11)
+    return compressors
+
+
+class PrecompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage, который после хеширования сжимает текстовые файлы."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        names = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            yield name, hashed_name, processed
+            if hashed_name and not isinstance(processed, Exception):
+                names.update((name, hashed_name))
+        if dry_run:
+            return
+        if brotli is None:
+            logger.info('Пакет brotli не установлен: статика сжимается только в .gz')
+        for name in sorted(names):
+            for compressed_name in self._compress(name):
+                yield name, compressed_name, True
+
+    def _compress(self, name):
+        if os.path.splitext(name)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+            return
+        with self.open(name) as source:
+            data = source.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return
+        for suffix, compress in _compressors().items():
+            compressed = compress(data)
+            if len(compressed) > len(data) * MAX_COMPRESS_RATIO:
+                continue
+            target = name + suffix
+            if self.exists(target):
+                self.delete(target)
+            self._save(target, ContentFile(compressed))
+            yield target
+
+
+def _accepted_encodings(header):
+    """Кодировки из Accept-Encoding, кроме явно запрещенных (q=0)."""
+    accepted = set()
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = params.strip().removeprefix('q=')
+        if coding and quality not in ('0', '0.0', '0.00', '0.000'):
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class PrecompressedStaticMiddleware:
+    """
+    Отдает файлы из STATIC_ROOT со сжатыми копиями и долгим кешем.
+    Ставится выше GZipMiddleware: готовые копии повторно не сжимаются.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        response = self._serve(request)
+        return response if response is not None else self.get_response(request)
+
+    async def __acall__(self, request):
+        response = self._serve(request)
+        return response if response is not None else await self.get_response(request)
+
+    @cached_property
+    def _prefix(self):
+        return urlsplit(settings.STATIC_URL or '').path
+
+    @cached_property
+    def _hashed_names(self):
+        # Значения манифеста collectstatic - имена с хешем содержимого
+        return set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+    def _serve(self, request):
+        root = settings.STATIC_ROOT
+        if not root or not self._prefix or request.method not in ('GET', 'HEAD'):
+            return None
+        if not request.path_info.startswith(self._prefix):
+            return None
+        name = request.path_info[len(self._prefix):]
+        try:
+            path = safe_join(root, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None
+
+        mtime = os.stat(path).st_mtime
+        immutable = name in self._hashed_names
+        if not immutable and not was_modified_since(request.headers.get('If-Modified-Since'), mtime):
+            return HttpResponseNotModified()
+
+        accepted = _accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        variants = [(path + suffix, encoding) for suffix, encoding in ENCODINGS if os.path.isfile(path + suffix)]
+        served, encoding = next(((variant, encoding) for variant, encoding in variants if encoding in accepted), (path, None))
+
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        response = FileResponse(open(served, 'rb'), content_type=content_type, filename=os.path.basename(name))
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if variants:
+            patch_vary_headers(response, ['Accept-Encoding'])
+        if immutable:
+            response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+        else:
+            response.headers['Cache-Control'] = f'public, max-age={getattr(settings, "STATIC_MAX_AGE", 3600)}'
+            response.headers['Last-Modified'] = http_date(mtime)
+        return response
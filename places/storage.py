@@ -0,0 +1,115 @@
+"""
+Хранилище файлов с адресацией по содержимому.
+
+Имя файла - SHA-256 его содержимого: upload_to/ab/abcdef...png. Хэш
+считается во время потоковой записи загрузки во временный файл, поэтому
+одинаковые изображения хранятся на диске один раз, а повторные загрузки
+становятся ссылками на уже существующий файл.
+
+Количество ссылок на каждый файл хранится в StoredBlob. Файл удаляется
+с диска только когда release() снимает последнюю ссылку. Файлы, которые
+не учтены в StoredBlob (загружены до перехода), release() не трогает.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+
+def _blob_model():
+    # Хранилище создается при объявлении моделей, поэтому модель берем лениво
+    return apps.get_model('places', 'StoredBlob')
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # Имя определяется содержимым в _save(), суффиксы не нужны
+        return name
+
+    def _content_name(self, name, digest):
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, digest[:2], f'{digest}{extension}').replace('\\', '/')
+
+    def _save(self, name, content):
+        directory = os.path.dirname(self.path(name))
+        os.makedirs(directory, exist_ok=True)
+
+        # Пишем во временный файл и одновременно считаем хэш - один проход по данным
+        digest = hashlib.sha256()
+        size = 0
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        with tempfile.NamedTemporaryFile(dir=directory, delete=False) as tmp:
+            for chunk in content.chunks():
+                digest.update(chunk)
+                tmp.write(chunk)
+                size += len(chunk)
+        final_name = self._content_name(name, digest.hexdigest())
+        final_path = self.path(final_name)
+
+        StoredBlob = _blob_model()
+        try:
+            with transaction.atomic():
+                blob, created = StoredBlob.objects.select_for_update().get_or_create(
+                    name=final_name, defaults={'size': size, 'ref_count': 1}
+                )
+                if not created:
+                    StoredBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+                if os.path.exists(final_path):
+                    # Такой файл уже есть - новая запись просто ссылается на него
+                    os.remove(tmp.name)
+                else:
+                    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                    os.replace(tmp.name, final_path)
+                    if self.file_permissions_mode is not None:
+                        os.chmod(final_path, self.file_permissions_mode)
+        finally:
+            if os.path.exists(tmp.name):
+                os.remove(tmp.name)
+        return final_name
+
+    def release(self, name):
+        """
+        Снимает одну ссылку на файл. Когда ссылок не остается, удаляет
+        запись StoredBlob, а сам файл - после коммита внешней транзакции
+        (при откате запись вернется и снова будет ссылаться на файл).
+        Возвращает True, если снята последняя ссылка.
+        """
+        if not name:
+            return False
+        StoredBlob = _blob_model()
+        with transaction.atomic():
+            blob = StoredBlob.objects.select_for_update().filter(name=name).first()
+            if blob is None:
+                return False
+            if blob.ref_count > 1:
+                StoredBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') - 1)
+                return False
+            blob.delete()
+            transaction.on_commit(lambda: self._delete_unreferenced(name))
+        return True
+
+    def _delete_unreferenced(self, name):
+        # Пока ждали коммита, тот же файл могли загрузить снова - тогда он нужен
+        if not _blob_model().objects.filter(name=name).exists():
+            self.delete(name)
+
+
+def release_file(field_file_or_storage, name=None):
+    """Снимает ссылку, если хранилище поддерживает подсчет ссылок."""
+    storage = getattr(field_file_or_storage, 'storage', field_file_or_storage)
+    if name is None:
+        name = getattr(field_file_or_storage, 'name', None)
+    if name and hasattr(storage, 'release'):
+        return storage.release(name)
+    return False
+
+
+blob_storage = ContentAddressedStorage()
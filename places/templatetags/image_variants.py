@@ -0,0 +1,54 @@
+from django import template
+from django.utils.html import format_html
+
+register = template.Library()
+
+
+def _srcset(storage, variants, fmt):
+    """Строка srcset по всем вариантам формата, без повторов одинаковой ширины."""
+    by_width = {}
+    for stored in variants.values():
+        if stored.get(fmt):
+            by_width.setdefault(stored['width'], stored[fmt])
+    return ', '.join(f'{storage.url(name)} {width}w' for width, name in sorted(by_width.items()))
+
+
+@register.simple_tag
+def responsive_image(image, variants, variant='card', alt='', css_class='', lazy=True):
+    """
+    Выводит <picture> с WebP и JPEG вариантами изображения (srcset).
+    Если варианты еще не построены, выводит обычный <img> с оригиналом.
+
+    Пример: {% responsive_image photo.image photo.variants 'card' alt=place.name css_class='card-image' %}
+    """
+    if not image:
+        return ''
+    loading = 'lazy' if lazy else 'eager'
+    selected = (variants or {}).get(variant)
+    if not selected:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="{}">', image.url, alt, css_class, loading
+        )
+
+    storage = image.storage
+    sizes = f"{selected['width']}px"
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" loading="{}">'
+        '</picture>',
+        _srcset(storage, variants, 'webp'), sizes,
+        storage.url(selected['jpeg']), _srcset(storage, variants, 'jpeg'), sizes,
+        alt, css_class, loading,
+    )
+
+
+@register.simple_tag
+def variant_url(image, variants, variant='gallery', fmt='jpeg'):
+    """URL одного варианта изображения, а если его нет - оригинала."""
+    if not image:
+        return ''
+    selected = (variants or {}).get(variant)
+    if selected and selected.get(fmt):
+        return image.storage.url(selected[fmt])
+    return image.url
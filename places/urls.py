@@ -1,16 +1,30 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+from .metrics import metrics_view
+
+# Под ASGI главная, категория и площадка обслуживаются асинхронными view
+pages = async_views if getattr(settings, 'ASYNC_VIEWS', False) else views
 
 urlpatterns = [
-    path('', views.home_page, name='home'),
-    path('place/<int:place_id>/', views.place_detail, name='place_detail'),
+    path('', pages.home_page, name='home'),
+    path('place/<int:place_id>/', pages.place_detail, name='place_detail'),
     path('add/', views.add_place, name='add_place'),
     path('edit/<int:place_id>/', views.edit_place, name='edit_place'),
     path('register/', views.register, name='register'), 
-    path('category/<slug:category_slug>/', views.category_detail, name='category_detail'),
+    path('category/<slug:category_slug>/', pages.category_detail, name='category_detail'),
+    path('category/<slug:category_slug>/clusters.json', views.category_map_clusters, name='category_map_clusters'),
+    path('place/<int:place_id>/map.json', views.place_map_data, name='place_map_data'),
+    path('place/<int:place_id>/comments.json', views.place_comments, name='place_comments'),
+    path('api/places/', views.api_places, name='api_places'),
+    path('api/places/nearby/', views.api_places_nearby, name='api_places_nearby'),
+    path('api/places/search/', views.api_places_search, name='api_places_search'),
+    path('search/', views.search, name='search'),
+    path('export/places/', views.export_places, name='export_places'),
+    path('metrics', metrics_view, name='metrics'),
     
-    path('', views.home_page, name='about'),
-    path('', views.home_page, name='contacts'),
-    path('', views.home_page, name='categories'),
+    path('', pages.home_page, name='about'),
+    path('', pages.home_page, name='contacts'),
+    path('', pages.home_page, name='categories'),
 
 ]
\ No newline at end of file
@@ -1,150 +1,128 @@
-from django.db import models
-from django.urls import reverse
+import hmac
+import json
+import math
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
 from django.shortcuts import render, redirect, get_object_or_404
-from .models import Place, PendingPlace, Comment, Rating, Photo, Category
+from .models import Place, PendingPlace, Comment, Photo, Category
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.decorators import login_required
 from .forms import PlaceForm, CommentForm, RatingForm
-import folium
+from .ratings import submit_rating
+from .counters import record_category_view
+from .catalog import category_by_slug, category_catalog
+from .page_cache import CATEGORIES_TAG, HOME_TAG, cached_page, category_tag, fragment_context
+from .conditional import category_validators, conditional_page, home_validators, place_validators
+from .maps import MAP_FIELDS, feature_collection, feature_from_row, parse_bbox, place_features, viewport_collection
+from .nearby import nearest_places
+from .pagination import InvalidCursor, KeysetPage
+from .search import search_places
+from .export import FORMATS as EXPORT_FORMATS, export_chunks
+from .db_router import replica_reads
+from .leaderboard import top_places
+
+
+@replica_reads
+def home_page(request):
+    # Актуальная копия браузера - 304; анонимам страница отдается из кеша,
+    # пока не изменятся площадки или категории
+    return conditional_page(
+        request, lambda: home_validators(request),
+        lambda: cached_page(request, 'home', [HOME_TAG, CATEGORIES_TAG], lambda: _render_home(request)),
+    )
+
+
+def _home_lists():
+    """Ленивые querysets главной страницы (общие с places.async_views)."""
+    return {
+        # 8 самых популярных категорий
+        'popular_categories': Category.objects.order_by('-view_count')[:8],
+        # Остальные категории в алфавитном порядке
+        'other_categories': Category.objects.exclude(
+            pk__in=Category.objects.order_by('-view_count').values('pk')[:8]
+        ).order_by('name'),
+        # 8 лучших площадок по байесовской оценке из таблицы лидеров (places.leaderboard):
+        # одна оценка 5 не обгоняет сотни оценок со средним 4.9
+        'popular_places': top_places(limit=8),
+    }
 
 
-def home_page(request):
-    # Получаем 8 самых популярных категорий
-    popular_categories = Category.objects.order_by('-view_count')[:8]
-    # Получаем остальные категории в алфавитном порядке
-    other_categories = Category.objects.exclude(
-        pk__in=popular_categories.values('pk')
-    ).order_by('name')
-
-    # Получаем 8 самых популярных площадок по среднему рейтингу
-    #    (Аннотируем каждую площадку средним рейтингом и сортируем по убыванию)
-    popular_places = Place.objects.annotate(
-        average_rating=models.Avg('ratings__value')
-    ).filter(
-        # Не показывать площадки без рейтинга, если это нужно
-        average_rating__isnull=False
-    ).order_by(models.F('average_rating').desc(nulls_last=True))[:8]
-
-    # Контекст, чтобы передавать популярные площадки
+def _render_home(request):
     context = {
-        'popular_categories': popular_categories,
-        'other_categories': other_categories,
-        'popular_places': popular_places,
+        **_home_lists(),
+        # Сетки категорий и список площадок кешируются фрагментами (querysets ленивые)
+        'fragment_cache': fragment_context([HOME_TAG, CATEGORIES_TAG]),
     }
     return render(request, 'places/home.html', context)
 
+# Сортировки списка площадок категории: ключ -> (название, порядок для places.pagination)
+PLACE_SORTS = {
+    'rating': ('По рейтингу', (('average_rating', True), ('id', True))),
+    'name': ('По названию', (('name', False), ('id', False))),
+    'new': ('Новые', (('id', True),)),
+}
+DEFAULT_PLACE_SORT = 'rating'
+
+
+@replica_reads
 def category_detail(request, category_slug):
-    category = get_object_or_404(Category, slug=category_slug)
-    
-    # Увеличиваем счетчик просмотров при каждом посещении
-    category.view_count += 1
-    category.save()
-
-    # Получаем все площадки, относящиеся к этой категории
-    # и сразу аннотируем их средним рейтингом
-    places = category.places.all().annotate(average_rating=models.Avg('ratings__value'))
-
-    # Создаем карту с маркерами для всех площадок
-    place_map = None
-    if places:
-        # Центрируем карту по первой площадке
-        center_lat = places.first().latitude
-        center_lon = places.first().longitude
-        m = folium.Map(location=[center_lat, center_lon], zoom_start=12)
-
-        for place in places:
-            yandex_maps_url = f"https://yandex.ru/maps/?rtext=~{place.latitude},{place.longitude}&z=15"
-            first_photo = place.first_photo
-            place_detail_url = request.build_absolute_uri(reverse('place_detail', args=[place.id]))
-            # Проверяем, существует ли фотография
-            if first_photo:
-                # Получаем абсолютный URL для фото, используя request
-                photo_url = request.build_absolute_uri(first_photo.image.url)
-                
-
-                # HTML-содержимое для iframe с абсолютным URL
-                iframe_html = f"""
-                    <style>
-                        body, html {{
-                            margin: 0 !important;
-                            padding: 0 !important;
-                        }}
-                    </style>
-                    <div style="
-                        display: flex; 
-                        flex-direction: column; 
-                        width: 100%; 
-                        height: 100%; 
-                        box-sizing: border-box; 
-                        font-family: Arial, sans-serif;
-                    ">
-                        <div style="
-                            position: relative; 
-                            width: 100%; 
-                            height: 100%; 
-                            overflow: hidden; 
-                            border-radius: 4px;
-                        ">
-                            <img src="{photo_url}"
-                                style="
-                                    position: absolute; 
-                                    top: 0; 
-                                    left: 0; 
-                                    width: 100%; 
-                                    height: 100%; 
-                                    object-fit: cover;
-                                "
-                                alt="{place.name} фото">
-                        </div>
-                        
-                        <div style="padding: 10px 10px 0 10px; flex-grow: 1;">
-                            <h3 style="
-                                margin-top: 0; 
-                                margin-bottom: 5px; 
-                                font-size: 1em;
-                            ">
-                                <a href="{place_detail_url}" 
-                                    target="_top"
-     onclick="L.DomEvent.stopPropagation(event);"
-                                    style="color: #007bff; text-decoration: none; font-weight: bold;"
-                                >{place.name}</a>
-                            </h3>
-                            <a href="{yandex_maps_url}" 
-                                target="_blank"
-                                onclick="return L.DomEvent.stopPropagation(event);" 
-                                style="color: #555; font-size: 0.9em; text-decoration: none;"
-                                >Построить маршрут</a>
-                        </div>
-                    </div>
-                """
-            else:
-                # Если фото нет, отображаем только название и ссылку
-                iframe_html = f"""
-                <h3 style="margin-bottom: 5px; font-size: 1em;"><a href="{place_detail_url}" target="_parent" style="color: #007bff; text-decoration: none; font-weight: bold;">{place.name}</a></h3>
-                <a href="{yandex_maps_url}" target="_blank" style="color: #555; font-size: 0.9em; text-decoration: none;">Построить маршрут</a>
-                """
-            
-            # Создаём IFrame с фиксированной шириной и адаптивной высотой
-            iframe = folium.IFrame(html=iframe_html, width="200px", height="auto",)
-            
-            # Popup с максимальной шириной 200px
-            popup = folium.Popup(iframe, max_width="200px", max_height="400px")
-
-            folium.Marker(
-                [place.latitude, place.longitude],
-                tooltip=place.name,
-                popup=popup
-            ).add_to(m)
-
-        place_map = m._repr_html_()
-    
+    # Категорию ищем в справочнике, чтобы при попадании в кеш не обращаться к базе
+    category = category_by_slug(category_slug) or get_object_or_404(Category, slug=category_slug)
+
+    # Учитываем просмотр: счетчик копится и сбрасывается в базу пачками
+    record_category_view(category.pk)
+
+    tags = [CATEGORIES_TAG, category_tag(category.pk)]
+    return conditional_page(
+        request, lambda: category_validators(request, category.pk),
+        lambda: cached_page(request, 'category_detail', tags, lambda: _render_category(request, category.pk, tags)),
+    )
+
+
+def _category_page(request, category_id):
+    """
+    Сортировка и страница площадок категории по параметрам sort и cursor.
+    Неверный курсор - InvalidCursor.
+    """
+    # Площадки категории выводятся страницами по курсору (без OFFSET)
+    # (средний рейтинг уже хранится в поле average_rating)
+    # with_cover_photo() избавляет от запроса first_photo на каждую площадку.
+    # Страница ленивая: при попадании во фрагментный кеш запрос не выполняется
+    sort = request.GET.get('sort')
+    if sort not in PLACE_SORTS:
+        sort = DEFAULT_PLACE_SORT
+    places = KeysetPage(
+        Place.objects.filter(category_id=category_id).with_cover_photo(), PLACE_SORTS[sort][1],
+        cursor=request.GET.get('cursor'), page_size=getattr(settings, 'CATEGORY_PAGE_SIZE', 24),
+    )
+    return sort, places
+
+
+def _category_top(category_id):
+    # Топ категории из таблицы лидеров (ленивый queryset, кешируется фрагментом)
+    return top_places(category_id, limit=getattr(settings, 'LEADERBOARD_CATEGORY_SIZE', 5), with_cover=False)
+
+
+def _render_category(request, category_id, tags):
+    # Количество площадок хранится в самой категории (place_count)
+    category = get_object_or_404(Category, pk=category_id)
+
+    try:
+        sort, places = _category_page(request, category_id)
+    except InvalidCursor:
+        return HttpResponseBadRequest('Неверный курсор')
+
     # Добавляем все категории в контекст для выпадающего списка
-    all_categories = Category.objects.all()
+    all_categories = category_catalog()
     context = {
         'current_category': category,
         'places': places,
-        'place_map': place_map,
+        'top_places': _category_top(category_id),
+        'sort': sort,
+        'sorts': [(key, label) for key, (label, _) in PLACE_SORTS.items()],
         'all_categories': all_categories,
+        'fragment_cache': fragment_context(tags),
     }
     return render(request, 'places/category_detail.html', context)
 
@@ -192,7 +170,8 @@ def add_place(request):
     else:
         form = PlaceForm()
     
-    context = {'form': form, 'categories': Category.objects.all().order_by('name')}
+    # Список категорий для шаблона добавляет categories_processor
+    context = {'form': form}
     return render(request, 'places/add_place.html', context)
 
 # pending_submission.save(): Now that we've made all the necessary changes to the object in memory, 
@@ -239,106 +218,23 @@ def edit_place(request, place_id):
 
 
 @login_required # Добавим этот декоратор, чтобы оставлять комментарии могли только авторизованные пользователи
+@replica_reads # GET читает с реплики, POST (комментарий, оценка) - с основной базы
 def place_detail(request, place_id):
-    place = get_object_or_404(Place, pk=place_id)
-    comments = place.comments.all().order_by('-created_at')
+    # GET с актуальной копией в браузере - 304 без загрузки площадки и рендеринга
+    return conditional_page(
+        request, lambda: place_validators(request, place_id), lambda: _place_detail(request, place_id),
+    )
+
+
+def _place_detail(request, place_id):
+    place = get_object_or_404(Place.objects.select_related('category'), pk=place_id)
+    # Первая страница комментариев; более старые подгружаются через place_comments
+    comments = _comments_page(place.pk)
     photos = place.photos.all() # Получаем все фото для этой площадки
 
-    # Получаем среднюю оценку
-    average_rating = place.ratings.aggregate(models.Avg('value'))['value__avg']
-
-
-    # Создаем карту
-    place_map = None # Инициализируем переменную
-    if place.latitude and place.longitude:
-        m = folium.Map(location=[place.latitude, place.longitude], zoom_start=12)
-
-        yandex_maps_url = f"https://yandex.ru/maps/?rtext=~{place.latitude},{place.longitude}&z=15"
-        first_photo = place.first_photo
-        if first_photo:
-            # Получаем абсолютный URL для фото, используя request
-            photo_url = request.build_absolute_uri(first_photo.image.url)
-                # HTML-содержимое для iframe с абсолютным URL
-            iframe_html = f"""
-                    <style>
-                        body, html {{
-                            margin: 0 !important;
-                            padding: 0 !important;
-                        }}
-                    </style>
-                    <div style="
-                        display: flex; 
-                        flex-direction: column; 
-                        width: 100%; 
-                        height: 100%; 
-                        box-sizing: border-box; 
-                        font-family: Arial, sans-serif;
-                    ">
-                        <div style="
-                            position: relative; 
-                            width: 100%; 
-                            height: 100%; 
-                            overflow: hidden; 
-                            border-radius: 4px;
-                        ">
-                            <img src="{photo_url}"
-                                style="
-                                    position: absolute; 
-                                    top: 0; 
-                                    left: 0; 
-                                    width: 100%; 
-                                    height: 100%; 
-                                    object-fit: cover;
-                                "
-                                alt="{place.name} фото">
-                        </div>
-                        
-                        <div style="padding: 10px 10px 0 10px; flex-grow: 1;">
-                            <h3 style="
-                                margin-top: 0; 
-                                margin-bottom: 5px; 
-                                font-size: 1em;
-                                color: #007bff;
-                                text-decoration: none; 
-                                font-weight: bold;
-                            ">{place.name}
-                            </h3>
-                            <a href="{yandex_maps_url}" 
-                                target="_blank"
-                                onclick="return L.DomEvent.stopPropagation(event);" 
-                                style="color: #555; font-size: 0.9em; text-decoration: none;"
-                                >Построить маршрут</a>
-                        </div>
-                    </div>
-                """
-        else:
-            # Если фото нет, отображаем только название и ссылку
-            iframe_html = f"""
-                <h3 style="
-                                margin-top: 0; 
-                                margin-bottom: 5px; 
-                                font-size: 1em;
-                                color: #007bff;
-                                text-decoration: none; 
-                                font-weight: bold;
-                            ">{place.name}
-                            </h3>
-                <a href="{yandex_maps_url}" target="_blank" style="color: #555; font-size: 0.9em; text-decoration: none;">Построить маршрут</a>
-                """
-            
-        # Создаём IFrame с фиксированной шириной и адаптивной высотой
-        iframe = folium.IFrame(html=iframe_html, width="200px", height="auto",)
-            
-            # Popup с максимальной шириной 200px
-        popup = folium.Popup(iframe, max_width="200px", max_height="400px")
-
-        folium.Marker(
-                [place.latitude, place.longitude],
-                tooltip=place.name,
-                popup=popup
-            ).add_to(m)
-
-        place_map = m._repr_html_()
+    # Средняя оценка хранится в самой площадке
+    average_rating = place.average_rating
+
 
     # Обработка форм
     if request.method == 'POST':
@@ -355,20 +251,10 @@ def place_detail(request, place_id):
             rating_form = RatingForm(request.POST)
             if rating_form.is_valid():
                 value = rating_form.cleaned_data['value']
-                user = request.user
-                
-                # Ищем существующую оценку или создаем новую
-                rating, created = Rating.objects.get_or_create(
-                    place=place,
-                    user=user,
-                    defaults={'value': value} # Значение для новой записи
-                )
-                
-                # Если запись уже существовала, обновляем её значение
-                if not created:
-                    rating.value = value
-                    rating.save()
-                    
+
+                # Создаем или обновляем оценку вместе с агрегатами площадки
+                submit_rating(place, request.user, value)
+
                 return redirect('place_detail', place_id=place.id)
     else:
         comment_form = CommentForm()
@@ -381,6 +267,199 @@ def place_detail(request, place_id):
         'comment_form': comment_form,
         'rating_form': rating_form,
         'photos': photos, 
-        'place_map': place_map, 
     }
     return render(request, 'places/place_detail.html', context)
+
+
+# Комментарии площадки от новых к старым (индекс comment_place_created_idx)
+COMMENT_ORDERING = (('created_at', True), ('id', True))
+
+
+def _comments_page(place_id, cursor=None):
+    return KeysetPage(
+        Comment.objects.filter(place_id=place_id).select_related('user'), COMMENT_ORDERING,
+        cursor=cursor, page_size=getattr(settings, 'COMMENTS_PAGE_SIZE', 20),
+    )
+
+
+@login_required
+def place_comments(request, place_id):
+    """Следующая страница комментариев: HTML-фрагмент и курсор в JSON."""
+    place = get_object_or_404(Place, pk=place_id)
+    try:
+        comments = _comments_page(place.pk, request.GET.get('cursor'))
+    except InvalidCursor:
+        return HttpResponseBadRequest('Неверный курсор')
+    html = render_to_string('places/_comments.html', {'comments': comments}, request=request)
+    return JsonResponse({'html': html, 'next_cursor': comments.next_cursor})
+
+
+def category_map_clusters(request, category_slug):
+    """Кластеры или площадки категории для текущих bbox и zoom карты."""
+    category = get_object_or_404(Category, slug=category_slug)
+    bbox = None
+    if 'bbox' in request.GET:
+        bbox = parse_bbox(request.GET['bbox'])
+        try:
+            zoom = int(request.GET.get('zoom', 0))
+        except ValueError:
+            bbox = None
+        if bbox is None:
+            return HttpResponseBadRequest('Ожидается bbox=west,south,east,north и целый zoom')
+    else:
+        zoom = 0
+    return HttpResponse(viewport_collection(category, zoom, bbox), content_type='application/geo+json')
+
+
+@login_required
+def place_map_data(request, place_id):
+    # Валидаторы - отметки площадки и ее фото (places.conditional): на 304 GeoJSON не собирается
+    return conditional_page(
+        request, lambda: place_validators(request, place_id), lambda: _render_place_map(place_id),
+    )
+
+
+def _render_place_map(place_id):
+    place = get_object_or_404(Place, pk=place_id)
+    return HttpResponse(feature_collection(Place.objects.filter(pk=place.pk)), content_type='application/geo+json')
+
+
+# Ограничение на количество площадок в одном ответе API
+API_PLACES_DEFAULT_LIMIT = 500
+API_PLACES_MAX_LIMIT = 2000
+
+
+def api_places(request):
+    """
+    Площадки в прямоугольнике: /api/places/?bbox=west,south,east,north[&category=slug][&limit=N].
+    Отбор идет по индексу spatial_cell, ответ - GeoJSON FeatureCollection.
+    """
+    bbox = parse_bbox(request.GET.get('bbox'))
+    if bbox is None:
+        return HttpResponseBadRequest('Ожидается bbox=west,south,east,north')
+    try:
+        limit = min(int(request.GET.get('limit', API_PLACES_DEFAULT_LIMIT)), API_PLACES_MAX_LIMIT)
+    except ValueError:
+        return HttpResponseBadRequest('limit должен быть целым числом')
+
+    places = Place.objects.in_bbox(*bbox)
+    category_slug = request.GET.get('category')
+    if category_slug:
+        places = places.filter(category__slug=category_slug)
+
+    features = list(place_features(places.order_by('spatial_cell', 'pk'), limit=max(limit, 0)))
+    data = {'type': 'FeatureCollection', 'features': features}
+    return HttpResponse(json.dumps(data, ensure_ascii=False, separators=(',', ':')), content_type='application/geo+json')
+
+
+NEARBY_MAX_RADIUS_KM = 50
+NEARBY_MAX_K = 100
+
+
+def api_places_nearby(request):
+    """
+    Ближайшие площадки: /api/places/nearby/?lat=..&lon=..[&radius=км][&k=N][&category=slug].
+    Возвращает GeoJSON, отсортированный по расстоянию (свойство distance_km).
+    """
+    try:
+        latitude = float(request.GET['lat'])
+        longitude = float(request.GET['lon'])
+        radius_km = float(request.GET.get('radius', 5))
+        k = min(int(request.GET.get('k', 10)), NEARBY_MAX_K)
+    except (KeyError, ValueError):
+        return HttpResponseBadRequest('Ожидаются lat, lon и необязательные radius, k')
+    # nan и inf проходят сравнения ниже (nan <= 0 - False), поэтому отсекаются отдельно
+    if not all(math.isfinite(value) for value in (latitude, longitude, radius_km)):
+        return HttpResponseBadRequest('Координаты и радиус должны быть конечными числами')
+    radius_km = min(radius_km, NEARBY_MAX_RADIUS_KM)
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180) or radius_km <= 0 or k <= 0:
+        return HttpResponseBadRequest('Координаты или радиус вне допустимого диапазона')
+
+    category = None
+    category_slug = request.GET.get('category')
+    if category_slug:
+        category = get_object_or_404(Category, slug=category_slug)
+
+    features = []
+    for place in nearest_places(latitude, longitude, radius_km, k, category):
+        feature = feature_from_row({field: getattr(place, field) for field in MAP_FIELDS})
+        feature['properties']['distance_km'] = round(place.distance_km, 3)
+        features.append(feature)
+    data = {'type': 'FeatureCollection', 'features': features}
+    return HttpResponse(json.dumps(data, ensure_ascii=False, separators=(',', ':')), content_type='application/geo+json')
+
+
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+
+
+def _search_params(request):
+    """Разбирает q, category и limit; неизвестная категория - 404."""
+    query = request.GET.get('q', '').strip()
+    limit = min(int(request.GET.get('limit', SEARCH_DEFAULT_LIMIT)), SEARCH_MAX_LIMIT)
+    category = None
+    category_slug = request.GET.get('category')
+    if category_slug:
+        category = category_by_slug(category_slug) or get_object_or_404(Category, slug=category_slug)
+    return query, category, limit
+
+
+def search(request):
+    """Страница поиска площадок: /search/?q=...[&category=slug]."""
+    try:
+        query, category, limit = _search_params(request)
+    except ValueError:
+        return HttpResponseBadRequest('limit должен быть целым числом')
+    context = {
+        'query': query,
+        'current_category': category,
+        'places': search_places(query, category, limit),
+    }
+    return render(request, 'places/search.html', context)
+
+
+def api_places_search(request):
+    """
+    Поиск площадок: /api/places/search/?q=...[&category=slug][&limit=N].
+    Возвращает GeoJSON, отсортированный по релевантности (свойство rank).
+    """
+    try:
+        query, category, limit = _search_params(request)
+    except ValueError:
+        return HttpResponseBadRequest('limit должен быть целым числом')
+
+    features = []
+    for place in search_places(query, category, limit):
+        feature = feature_from_row({field: getattr(place, field) for field in MAP_FIELDS})
+        feature['properties']['rank'] = round(float(place.search_rank), 4)
+        features.append(feature)
+    data = {'type': 'FeatureCollection', 'features': features}
+    return HttpResponse(json.dumps(data, ensure_ascii=False, separators=(',', ':')), content_type='application/geo+json')
+
+
+def _export_allowed(request):
+    """Выгрузка доступна staff и партнерам с токеном: Authorization: Bearer <токен>."""
+    if request.user.is_staff:
+        return True
+    header = request.headers.get('Authorization', '')
+    if not header.startswith('Bearer '):
+        return False
+    # compare_digest принимает строки только из ASCII - сравниваем байты
+    token = header[len('Bearer '):].strip().encode()
+    return any(hmac.compare_digest(token, allowed.encode()) for allowed in getattr(settings, 'EXPORT_TOKENS', []))
+
+
+def export_places(request):
+    """
+    Все площадки для партнеров: /export/places/?format=csv|geojson.
+    Ответ потоковый - строки читаются из базы порциями и сразу отправляются.
+    """
+    if not _export_allowed(request):
+        return HttpResponseForbidden()
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return HttpResponseBadRequest('format: csv или geojson')
+    chunks = export_chunks(fmt, base_url=request.build_absolute_uri('/'))
+    response = StreamingHttpResponse(chunks, content_type=EXPORT_FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="places.{fmt}"'
+    return response
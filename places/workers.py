@@ -0,0 +1,64 @@
+"""
+Ограниченный пул потоков для синхронной работы асинхронных view
+(places.async_views): запросов ORM, рендеринга шаблонов, сборки GeoJSON.
+
+Цикл событий не ждет ни базу, ни CPU-работу, а размер пула (ASYNC_WORKERS)
+ограничивает одновременно открытые этими view соединения с базой. Каждый
+поток держит свое соединение и закрывает его по правилам CONN_MAX_AGE, как
+обычный синхронный запрос.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import metrics
+from .db_router import read_alias, reading_from
+
+_pool = None
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'ASYNC_WORKERS', 8), thread_name_prefix='places-async',
+        )
+    return _pool
+
+
+def _call(request_metrics, alias, func, args, kwargs):
+    close_old_connections()
+    try:
+        # Поток пула читает из той же базы, что и запрос (places.db_router)
+        with reading_from(alias):
+            if request_metrics is None:
+                return func(*args, **kwargs)
+            # Запросы и рендеринг в потоке пула учитываются в метриках запроса
+            with metrics.collect(request_metrics):
+                return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_in_pool(func, *args, **kwargs):
+    """Выполняет синхронную функцию в пуле и возвращает ее результат."""
+    loop = asyncio.get_running_loop()
+    call = functools.partial(_call, metrics.current(), read_alias(), func, args, kwargs)
+    return await loop.run_in_executor(_get_pool(), call)
+
+
+async def fetch(queryset):
+    """Результат queryset списком."""
+    return await run_in_pool(list, queryset)
+
+
+async def fetch_all(querysets):
+    """
+    Выполняет независимые запросы одновременно, каждый в своем потоке пула.
+    Принимает и возвращает словарь имя -> queryset / список.
+    """
+    results = await asyncio.gather(*(fetch(queryset) for queryset in querysets.values()))
+    return dict(zip(querysets, results))
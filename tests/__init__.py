@@ -0,0 +1,7 @@
+"""
+Тесты приложения places. Запуск без Postgres - профиль config.settings_sqlite:
+
+    DJANGO_SETTINGS_MODULE=config.settings_sqlite python manage.py test tests
+
+Отдельный модуль - tests.test_moderation и т.п. вместо tests.
+"""
@@ -0,0 +1,81 @@
+"""
+Асинхронные view (places.async_views) отдают те же страницы, что синхронные.
+
+Запросы асинхронных view выполняются в потоках пула places.workers со своими
+соединениями, а они не видят данных из незакоммиченной транзакции TestCase,
+поэтому здесь TransactionTestCase.
+"""
+import io
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from django.urls import include, path, reverse
+
+from places import async_views
+from places.models import Category, Place
+
+# Маршруты как при ASYNC_VIEWS = True: асинхронные view раньше синхронных
+urlpatterns = [
+    path('', async_views.home_page, name='home'),
+    path('category/<slug:category_slug>/', async_views.category_detail, name='category_detail'),
+    path('place/<int:place_id>/', async_views.place_detail, name='place_detail'),
+    path('', include('config.urls')),
+]
+
+
+@override_settings(ROOT_URLCONF=__name__, VIEW_COUNTER_MODE='sync')
+class AsyncViewsTests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        call_command('generate_dataset', places=30, categories=3, users=5, seed=1, stdout=io.StringIO())
+        self.user = User.objects.create_user('viewer')
+        self.category = Category.objects.order_by('-place_count', 'pk').first()
+        self.place = Place.objects.filter(category=self.category).order_by('pk').first()
+
+    async def test_pages_render(self):
+        await self.async_client.aforce_login(self.user)
+        for url, text in (
+            (reverse('home'), self.category.name),
+            (reverse('category_detail', args=[self.category.slug]), self.place.name),
+            (reverse('place_detail', args=[self.place.pk]), self.place.name),
+        ):
+            with self.subTest(url=url):
+                response = await self.async_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, text)
+
+    async def test_anonymous_page_cache(self):
+        url = reverse('category_detail', args=[self.category.slug])
+        first = await self.async_client.get(url)
+        second = await self.async_client.get(url)
+        self.assertEqual(first['X-Page-Cache'], 'miss')
+        self.assertEqual(second['X-Page-Cache'], 'hit')
+        self.assertEqual(first.content, second.content)
+
+    async def test_errors(self):
+        await self.async_client.aforce_login(self.user)
+        bad_cursor = await self.async_client.get(
+            reverse('category_detail', args=[self.category.slug]), {'cursor': '!'},
+        )
+        self.assertEqual(bad_cursor.status_code, 400)
+        # Курсор верной длины с чужими типами значений
+        wrong_types = await self.async_client.get(
+            reverse('category_detail', args=[self.category.slug]), {'sort': 'new', 'cursor': 'WyJ4Il0'},
+        )
+        self.assertEqual(wrong_types.status_code, 400)
+        missing = await self.async_client.get(reverse('place_detail', args=[10 ** 9]))
+        self.assertEqual(missing.status_code, 404)
+
+    async def test_place_detail_requires_login(self):
+        response = await self.async_client.get(reverse('place_detail', args=[self.place.pk]))
+        self.assertEqual(response.status_code, 302)
+
+    async def test_not_modified(self):
+        await self.async_client.aforce_login(self.user)
+        url = reverse('place_detail', args=[self.place.pk])
+        etag = (await self.async_client.get(url))['ETag']
+        response = await self.async_client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 304)
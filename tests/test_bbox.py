@@ -0,0 +1,78 @@
+"""
+Площадки в прямоугольнике (/api/places/, PlaceQuerySet.in_bbox): отбор по
+ячейкам spatial_cell, пересечение антимеридиана, фильтр по категории и 400
+на некорректные параметры.
+"""
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from places import geo
+from places.models import Category, Place
+
+
+@override_settings(VIEW_COUNTER_MODE='sync')
+class BboxTests(TestCase):
+
+    def setUp(self):
+        self.football = Category.objects.create(name='Футбол', slug='football')
+        tennis = Category.objects.create(name='Теннис', slug='tennis')
+        for name, latitude, longitude, category in (
+            ('Москва', 55.75, 37.62, self.football),
+            ('Химки', 55.89, 37.44, tennis),
+            ('Петербург', 59.94, 30.31, self.football),
+            ('Фиджи', -17.71, 178.06, self.football),
+            ('Самоа', -13.76, -172.10, tennis),
+        ):
+            Place.objects.create(name=name, description='', latitude=latitude, longitude=longitude, category=category)
+        Place.objects.create(name='Без координат', description='', category=self.football)
+        self.url = reverse('api_places')
+
+    def _names(self, queryset):
+        return sorted(queryset.values_list('name', flat=True))
+
+    def _api_names(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return sorted(feature['properties']['name'] for feature in response.json()['features'])
+
+    def test_in_bbox(self):
+        self.assertEqual(self._names(Place.objects.in_bbox(37.0, 55.5, 38.0, 56.0)), ['Москва', 'Химки'])
+        # Границы включаются
+        self.assertEqual(self._names(Place.objects.in_bbox(37.62, 55.75, 37.62, 55.75)), ['Москва'])
+        self.assertEqual(self._names(Place.objects.in_bbox(0, 0, 10, 10)), [])
+
+    def test_antimeridian(self):
+        self.assertEqual(self._names(Place.objects.in_bbox(170, -20, -170, -10)), ['Самоа', 'Фиджи'])
+        self.assertEqual(self._api_names(bbox='170,-20,-170,-10'), ['Самоа', 'Фиджи'])
+
+    def test_many_rows_fallback(self):
+        # Высокий прямоугольник - больше MAX_CELL_RANGES строк сетки: один общий диапазон
+        self.assertEqual(len(geo.bbox_cell_ranges(30, 55, 38, 60)), 1)
+        self.assertEqual(self._names(Place.objects.in_bbox(30, 55, 38, 60)), ['Москва', 'Петербург', 'Химки'])
+        # Тот же результат при построчных диапазонах
+        with mock.patch.object(geo, 'MAX_CELL_RANGES', 10000):
+            self.assertGreater(len(geo.bbox_cell_ranges(30, 55, 38, 60)), 1)
+            self.assertEqual(self._names(Place.objects.in_bbox(30, 55, 38, 60)), ['Москва', 'Петербург', 'Химки'])
+
+    def test_category_and_limit(self):
+        self.assertEqual(self._api_names(bbox='30,55,38,60', category='football'), ['Москва', 'Петербург'])
+        self.assertEqual(self._api_names(bbox='30,55,38,60', category='unknown'), [])
+        self.assertEqual(len(self._api_names(bbox='-180,-90,180,90', limit=2)), 2)
+        self.assertEqual(self._api_names(bbox='-180,-90,180,90', limit=-1), [])
+
+    def test_invalid_params(self):
+        for params in (
+            {},
+            {'bbox': '1,2,3'},
+            {'bbox': 'nan,55,38,60'},
+            {'bbox': '30,55,38,inf'},
+            {'bbox': '30,60,38,55'},
+            {'bbox': '30,55,190,60'},
+            {'bbox': '30,-91,38,60'},
+            {'bbox': '30,55,38,60', 'limit': 'many'},
+            {'bbox': '30,55,38,60', 'limit': '1.5'},
+        ):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.url, params).status_code, 400)
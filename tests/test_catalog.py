@@ -0,0 +1,71 @@
+"""
+Справочник категорий (places.catalog): копия в памяти процесса используется,
+пока не истек ее TTL или не сменилась версия в общем кеше; изменение
+категории в одном процессе видно остальным после сверки версии.
+"""
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from places import catalog
+from places.catalog import catalog_version, category_by_slug, category_catalog
+from places.models import Category
+
+
+@override_settings(CATEGORY_CATALOG_LOCAL_TTL=60)
+class CategoryCatalogTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.football = Category.objects.create(name='Футбол', slug='football')
+            Category.objects.create(name='Бокс', slug='boxing')
+
+    def _other_process(self):
+        """Снимок копии в памяти - так ее видит другой процесс, не получавший сигналов."""
+        category_catalog()
+        return dict(catalog._local)
+
+    def _expire_local(self):
+        catalog._local['checked_at'] -= 61
+
+    def test_local_tier_reused(self):
+        categories = category_catalog()
+        self.assertEqual([category.slug for category in categories], ['boxing', 'football'])
+        # В пределах TTL ни базы, ни общего кеша
+        with self.assertNumQueries(0), mock.patch.object(catalog, 'cache') as shared_cache:
+            self.assertIs(category_catalog(), categories)
+            self.assertEqual(category_by_slug('football'), self.football)
+            self.assertIsNone(category_by_slug('tennis'))
+        shared_cache.get.assert_not_called()
+
+        # TTL истек, версия прежняя: только сверка версии, список тот же
+        version = catalog_version()
+        self._expire_local()
+        with self.assertNumQueries(0):
+            self.assertIs(category_catalog(), categories)
+        self.assertEqual(catalog_version(), version)
+
+    def test_rename_seen_by_other_process(self):
+        other = self._other_process()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.football.name = 'Мини-футбол'
+            self.football.save()
+
+        catalog._local.update(other)
+        # До сверки версии другой процесс видит прежнее название
+        self.assertEqual(category_by_slug('football').name, 'Футбол')
+        self._expire_local()
+        self.assertEqual(category_by_slug('football').name, 'Мини-футбол')
+
+    def test_delete_seen_by_other_process(self):
+        other = self._other_process()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.football.delete()
+
+        catalog._local.update(other)
+        self._expire_local()
+        self.assertIsNone(category_by_slug('football'))
+        self.assertEqual([category.slug for category in category_catalog()], ['boxing'])
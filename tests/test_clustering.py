@@ -0,0 +1,75 @@
+"""
+Кластеры карты (places.clustering): создание, перенос точки, смена категории
+и удаление площадки сдвигают кластеры так же, как полный rebuild_clusters.
+"""
+from importlib import import_module
+
+from django.apps import apps as django_apps
+from django.test import TestCase, override_settings
+
+from places.clustering import rebuild_clusters
+from places.models import Category, Place, PlaceCluster
+
+
+def _snapshot():
+    return sorted(
+        (category_id, zoom, cell_x, cell_y, count, round(latitude_sum, 6), round(longitude_sum, 6))
+        for category_id, zoom, cell_x, cell_y, count, latitude_sum, longitude_sum in PlaceCluster.objects.values_list(
+            'category_id', 'zoom', 'cell_x', 'cell_y', 'count', 'latitude_sum', 'longitude_sum',
+        )
+    )
+
+
+@override_settings(MAP_CLUSTER_MAX_ZOOM=8, VIEW_COUNTER_MODE='sync')
+class IncrementalClusterTests(TestCase):
+
+    def setUp(self):
+        self.football = Category.objects.create(name='Футбол', slug='football')
+        self.tennis = Category.objects.create(name='Теннис', slug='tennis')
+        self.place = Place.objects.create(
+            name='Стадион', description='', category=self.football, latitude='55.751244', longitude='37.618423',
+        )
+        Place.objects.create(name='Корт', description='', category=self.football, latitude=55.76, longitude=37.62)
+
+    def assertMatchesRebuild(self):
+        incremental = _snapshot()
+        rebuild_clusters()
+        self.assertEqual(incremental, _snapshot())
+
+    def test_create(self):
+        self.assertEqual(PlaceCluster.objects.get(category=self.football, zoom=0).count, 2)
+        self.assertMatchesRebuild()
+
+    def test_move_point(self):
+        self.place.latitude, self.place.longitude = 59.93863, 30.31413
+        self.place.save()
+        self.assertMatchesRebuild()
+
+    def test_change_category(self):
+        self.place.category = self.tennis
+        self.place.save()
+        self.assertEqual(PlaceCluster.objects.get(category=self.tennis, zoom=0).count, 1)
+        self.assertMatchesRebuild()
+
+    def test_unchanged_location(self):
+        before = _snapshot()
+        self.place.name = 'Большой стадион'
+        self.place.save()
+        self.assertEqual(before, _snapshot())
+
+    def test_remove_coordinates_and_delete(self):
+        self.place.latitude = None
+        self.place.save()
+        self.assertMatchesRebuild()
+        Place.objects.exclude(pk=self.place.pk).delete()
+        self.assertFalse(PlaceCluster.objects.exists())
+
+    def test_backfill_migration(self):
+        # Площадки, созданные до кластеров: миграция 0022 строит их так же, как rebuild_clusters
+        backfill = import_module('places.migrations.0022_backfill_place_clusters')
+        Place.objects.create(name='Корт', description='', category=self.tennis, latitude=-33.86, longitude=151.2)
+        rebuild_clusters()
+        expected = _snapshot()
+        PlaceCluster.objects.all().delete()
+        backfill.fill_place_clusters(django_apps, None)
+        self.assertEqual(_snapshot(), expected)
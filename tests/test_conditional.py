@@ -0,0 +1,88 @@
+"""
+Условные GET (places.conditional): повторный запрос с ETag получает 304
+без рендеринга, а изменение площадки снова дает 200.
+"""
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from places.models import Category, Comment, Place
+from places.ratings import submit_rating
+
+
+@override_settings(VIEW_COUNTER_MODE='sync')
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Футбол', slug='football')
+        self.place = Place.objects.create(name='Стадион', description='', category=self.category)
+        self.user = User.objects.create_user('viewer')
+        self.client.force_login(self.user)
+        self.urls = [
+            reverse('home'),
+            reverse('category_detail', args=[self.category.slug]),
+            reverse('place_detail', args=[self.place.pk]),
+        ]
+
+    def _revalidate(self, url, etag):
+        return self.client.get(url, headers={'if-none-match': etag})
+
+    def test_not_modified(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('Last-Modified', response)
+                self.assertIn('no-cache', response['Cache-Control'])
+
+                with CaptureQueriesContext(connection) as captured:
+                    response = self._revalidate(url, response['ETag'])
+                self.assertEqual(response.status_code, 304)
+                # Сессия, пользователь, просмотр категории и сам валидатор
+                self.assertLessEqual(len(captured), 4)
+                self.assertFalse(response.content)
+
+    def test_changes_invalidate(self):
+        etags = [self.client.get(url)['ETag'] for url in self.urls]
+        submit_rating(self.place, self.user, 5)
+        for url, etag in zip(self.urls, etags):
+            with self.subTest(url=url):
+                self.assertEqual(self._revalidate(url, etag).status_code, 200)
+
+        url = reverse('place_detail', args=[self.place.pk])
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(place=self.place, user=self.user, text='Отличное покрытие')
+        self.assertContains(self._revalidate(url, etag), 'Отличное покрытие')
+
+    def test_user_in_etag(self):
+        url = reverse('place_detail', args=[self.place.pk])
+        etag = self.client.get(url)['ETag']
+        self.client.force_login(User.objects.create_user('other'))
+        self.assertEqual(self._revalidate(url, etag).status_code, 200)
+
+    def test_place_map_data(self):
+        url = reverse('place_map_data', args=[self.place.pk])
+        self.place.latitude, self.place.longitude = 55.75, 37.61
+        self.place.save()
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'application/geo+json')
+        self.assertEqual(len(response.json()['features']), 1)
+
+        # Повторный запрос с ETag не собирает GeoJSON
+        with mock.patch('places.views.feature_collection') as feature_collection:
+            self.assertEqual(self._revalidate(url, response['ETag']).status_code, 304)
+        feature_collection.assert_not_called()
+
+        submit_rating(self.place, self.user, 5)
+        response = self._revalidate(url, response['ETag'])
+        self.assertEqual(response.json()['features'][0]['properties']['rating'], 5.0)
+
+        self.assertEqual(self.client.get(reverse('place_map_data', args=[self.place.pk + 1])).status_code, 404)
+        self.client.logout()
+        self.assertEqual(self.client.get(url).status_code, 302)
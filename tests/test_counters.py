@@ -0,0 +1,53 @@
+"""
+Отложенный счетчик просмотров (places.counters): буфер в памяти сбрасывается
+фоновым потоком и без новых просмотров, а flush_view_counts работает в режиме
+cache и отказывается работать в режиме memory.
+"""
+import io
+import time
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from places.counters import _MemoryBuffer, record_category_view
+from places.models import Category
+
+
+@override_settings(VIEW_COUNTER_FLUSH_INTERVAL=0.2)
+class MemoryBufferTests(TransactionTestCase):
+    # Сброс идет из фонового потока со своим соединением: нужны закоммиченные данные
+
+    def test_flushed_without_new_views(self):
+        category = Category.objects.create(name='Футбол', slug='football')
+        buffer = _MemoryBuffer()
+        buffer.add(category.pk)
+        buffer.add(category.pk)
+        thread = buffer._timer
+        deadline = time.monotonic() + 5
+        while Category.objects.get(pk=category.pk).view_count < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(Category.objects.get(pk=category.pk).view_count, 2)
+        # Буфер опустел - поток завершается
+        thread.join(timeout=5)
+        self.assertFalse(thread.is_alive())
+
+
+class FlushCommandTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Футбол', slug='football')
+
+    @override_settings(VIEW_COUNTER_MODE='cache', VIEW_COUNTER_FLUSH_INTERVAL=3600)
+    def test_cache_mode(self):
+        for _ in range(3):
+            record_category_view(self.category.pk)
+        call_command('flush_view_counts', stdout=io.StringIO())
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.view_count, 3)
+
+    @override_settings(VIEW_COUNTER_MODE='memory')
+    def test_memory_mode_rejected(self):
+        with self.assertRaises(CommandError):
+            call_command('flush_view_counts', stdout=io.StringIO())
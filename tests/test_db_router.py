@@ -0,0 +1,82 @@
+"""
+Чтение с реплики и read-your-writes (places.db_router) на двух базах SQLite.
+
+Реплика в тестах - отдельная база, и у площадки в ней другое название: так
+видно, из какой базы прочитана страница. Внутри транзакции роутер читает из
+основной базы, поэтому здесь TransactionTestCase.
+"""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from places.db_router import PIN_COOKIE
+from places.models import Category, Place
+from places.page_cache import category_tag, invalidate_pages
+
+
+def _create_places():
+    # bulk_create: без сигналов, которые пишут только в основную базу
+    for alias, name in (('default', 'Площадка в основной базе'), ('replica', 'Площадка на реплике')):
+        Category.objects.using(alias).bulk_create([Category(pk=1, name='Футбол', slug='football')])
+        Place.objects.using(alias).bulk_create([Place(pk=1, name=name, description='', category_id=1)])
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], PAGE_CACHE_ENABLED=False, VIEW_COUNTER_MODE='sync')
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        _create_places()
+        self.user = User.objects.create_user('viewer')
+        self.client.force_login(self.user)
+        self.url = reverse('place_detail', args=[1])
+
+    def test_get_reads_from_replica(self):
+        self.assertContains(self.client.get(self.url), 'Площадка на реплике')
+        self.assertContains(self.client.get(reverse('category_detail', args=['football'])), 'Площадка на реплике')
+
+    def test_post_pins_reads_to_primary(self):
+        response = self.client.post(self.url, {'comment_submit': '1', 'text': 'Отличное покрытие'})
+        self.assertRedirects(response, self.url)
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(Place.objects.using('default').get(pk=1).comments.count(), 1)
+
+        # Реплика еще не получила комментарий, но автор сразу видит его
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Площадка в основной базе')
+        self.assertContains(response, 'Отличное покрытие')
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], PAGE_CACHE_ENABLED=True, VIEW_COUNTER_MODE='sync')
+class StaleReplicaCacheTests(TransactionTestCase):
+    """Сразу после сброса меток реплика отстает: устаревший HTML не должен попасть в кеш."""
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        _create_places()
+        self.url = reverse('category_detail', args=['football'])
+        # Площадка изменилась в основной базе, реплика еще не догнала
+        invalidate_pages(category_tag(1))
+
+    def _replicate(self):
+        Place.objects.using('replica').filter(pk=1).update(name='Площадка в основной базе')
+
+    def test_page_miss_rendered_from_primary(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Площадка в основной базе')
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertContains(response, 'Площадка в основной базе')
+
+    def test_fragments_not_cached_from_lagging_replica(self):
+        self.client.force_login(User.objects.create_user('viewer'))
+        self.assertContains(self.client.get(self.url), 'Площадка на реплике')
+        self._replicate()
+        self.assertNotContains(self.client.get(self.url), 'Площадка на реплике')
+
+    @override_settings(REPLICA_PIN_SECONDS=0)
+    def test_replica_after_lag_window(self):
+        self.assertContains(self.client.get(self.url), 'Площадка на реплике')
@@ -0,0 +1,54 @@
+"""
+Выгрузка площадок для партнеров (/export/places/): доступ по токену или
+staff, потоковый ответ в CSV и GeoJSON.
+"""
+import csv
+import io
+import json
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from places.models import Category, Place
+
+
+@override_settings(EXPORT_TOKENS=['partner-token'], VIEW_COUNTER_MODE='sync')
+class ExportPlacesTests(TestCase):
+
+    def setUp(self):
+        category = Category.objects.create(name='Футбол', slug='football')
+        for n in range(3):
+            Place.objects.create(name=f'Площадка {n}', description='', category=category, latitude=55 + n, longitude=37)
+        self.url = reverse('export_places')
+
+    def _get(self, token='partner-token', **params):
+        return self.client.get(self.url, params, headers={'authorization': f'Bearer {token}'})
+
+    def test_auth(self):
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        for token in ('wrong', 'partner-tokenx', 'токен', 'partner-tokené'):
+            with self.subTest(token=token):
+                self.assertEqual(self._get(token).status_code, 403)
+
+        self.client.force_login(User.objects.create_user('admin', is_staff=True))
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_csv_streamed(self):
+        # По строке в куске: ответ отдается частями, а не одной строкой
+        with mock.patch('places.export.ROWS_PER_WRITE', 1):
+            response = self._get()
+            chunks = [chunk.decode() for chunk in response.streaming_content]
+        self.assertTrue(response.streaming)
+        self.assertEqual(len(chunks), 4)
+        rows = list(csv.DictReader(io.StringIO(''.join(chunks))))
+        self.assertEqual([row['name'] for row in rows], ['Площадка 0', 'Площадка 1', 'Площадка 2'])
+        self.assertEqual(rows[0]['category'], 'Футбол')
+
+    def test_geojson(self):
+        response = self._get(format='geojson')
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(data['features']), 3)
+        self.assertEqual(data['features'][2]['geometry']['coordinates'], [37.0, 57.0])
+        self.assertEqual(self._get(format='xml').status_code, 400)
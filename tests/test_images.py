@@ -0,0 +1,113 @@
+"""
+Уменьшенные копии изображений (places.images): варианты строятся синхронно
+и в фоне, файлы сохраняются в хранилище, а пути - в записи.
+"""
+import io
+import shutil
+import tempfile
+import time
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from places.images import VARIANT_WIDTHS, _store_variants, generate_variants, render_variants, schedule_variants
+from places.models import Photo, Place
+
+
+def _png(width=800, height=600):
+    buffer = io.BytesIO()
+    Image.new('RGBA', (width, height), (200, 30, 30, 128)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class _MediaRootMixin:
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, VIEW_COUNTER_MODE='sync')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.place = Place.objects.create(name='Стадион', description='')
+
+    def _photo(self, data=None):
+        photo = Photo(place=self.place)
+        photo.image.save('photo.png', ContentFile(data or _png()), save=False)
+        photo.save()
+        return photo
+
+    def assertVariants(self, photo):
+        self.assertEqual(set(photo.variants), set(VARIANT_WIDTHS))
+        # Маленькие изображения не увеличиваются
+        self.assertEqual(photo.variants['gallery']['width'], 800)
+        self.assertEqual(photo.variants['card']['width'], 400)
+        for stored in photo.variants.values():
+            for fmt in ('webp', 'jpeg'):
+                self.assertTrue(photo.image.storage.exists(stored[fmt]))
+
+
+class GenerateVariantsTests(_MediaRootMixin, TestCase):
+
+    def test_generate(self):
+        photo = self._photo()
+        self.assertEqual(generate_variants([photo]), 1)
+        photo.refresh_from_db()
+        self.assertVariants(photo)
+
+        # Повторная генерация дает те же файлы: прежние ссылки снимаются, файлы остаются
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(generate_variants([photo]), 1)
+        photo.refresh_from_db()
+        self.assertVariants(photo)
+
+    def test_replaced_image_skipped(self):
+        photo = self._photo()
+        rendered = render_variants(_png())
+        self.assertIsNone(_store_variants(Photo, photo.pk, 'place_photos/other.png', rendered))
+        photo.refresh_from_db()
+        self.assertEqual(photo.variants, {})
+
+
+@override_settings(IMAGE_VARIANTS_ASYNC=True)
+class ScheduleVariantsTests(_MediaRootMixin, TransactionTestCase):
+    # Результат записывает фоновый поток со своим соединением: нужны закоммиченные данные
+
+    def test_background(self):
+        photo = self._photo()
+        schedule_variants([photo])
+        deadline = time.monotonic() + 30
+        while not Photo.objects.get(pk=photo.pk).variants and time.monotonic() < deadline:
+            time.sleep(0.1)
+        photo.refresh_from_db()
+        self.assertVariants(photo)
+
+
+@override_settings(IMAGE_VARIANTS_ASYNC=False)
+class ReplaceImageTests(_MediaRootMixin, TestCase):
+
+    def test_admin_replaces_image(self):
+        photo = self._photo()
+        with self.captureOnCommitCallbacks(execute=True):
+            generate_variants([photo])
+        photo.refresh_from_db()
+        old_files = [photo.image.name] + [stored[fmt] for stored in photo.variants.values() for fmt in ('webp', 'jpeg')]
+
+        self.client.force_login(User.objects.create_superuser('admin'))
+        upload = SimpleUploadedFile('new.png', _png(1000, 500), content_type='image/png')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('admin:places_photo_change', args=[photo.pk]),
+                {'image': upload, 'place': self.place.pk, 'pending_place': ''},
+            )
+        self.assertEqual(response.status_code, 302)
+
+        photo.refresh_from_db()
+        self.assertNotEqual(photo.image.name, old_files[0])
+        # Варианты построены заново по новому файлу
+        self.assertEqual(photo.variants['gallery']['width'], 1000)
+        for name in old_files:
+            self.assertFalse(photo.image.storage.exists(name), name)
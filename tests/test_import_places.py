@@ -0,0 +1,75 @@
+"""
+Импорт площадок (команда import_places): повторный импорт обновляет площадки
+по ключу, новые категории получают уникальный slug, а заявки с ключом уже
+импортированной площадки одобряются без дубля.
+"""
+import io
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from places.models import Category, PendingPlace, Place
+from places.moderation import approve_submissions
+
+CSV = '''id,name,category,lat,lon
+1,Стадион,Mini-football,55.75,37.61
+2,Корт,Mini-football,55.76,37.62
+'''
+
+
+@override_settings(VIEW_COUNTER_MODE='sync', MAP_CLUSTER_MAX_ZOOM=4)
+class ImportPlacesTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'city.csv')
+        with open(self.path, 'w', encoding='utf-8') as output:
+            output.write(CSV)
+
+    def _import(self, *args):
+        call_command('import_places', self.path, *args, stdout=io.StringIO(), stderr=io.StringIO())
+
+    def test_reimport_updates(self):
+        self._import()
+        with open(self.path, 'w', encoding='utf-8') as output:
+            output.write(CSV.replace('Стадион', 'Большой стадион'))
+        self._import()
+        self.assertEqual(Place.objects.count(), 2)
+        self.assertEqual(Place.objects.get(external_id='city:1').name, 'Большой стадион')
+        self.assertEqual(Category.objects.get(name='Mini-football').place_count, 2)
+
+    def test_slug_collision(self):
+        Category.objects.create(name='Mini football', slug='mini-football')
+        self._import()
+        category = Category.objects.get(name='Mini-football')
+        self.assertNotEqual(category.slug, 'mini-football')
+        self.assertTrue(category.slug.startswith('mini-football-'))
+
+    def test_approve_pending_already_imported(self):
+        User.objects.create_user('moderator')
+        self._import('--pending', '--user', 'moderator')
+        self.assertEqual(PendingPlace.objects.count(), 2)
+        # Тот же источник потом импортирован напрямую
+        self._import()
+
+        self.assertEqual(approve_submissions(PendingPlace.objects.all()), 2)
+        self.assertEqual(Place.objects.count(), 2)
+        for submission in PendingPlace.objects.all():
+            self.assertEqual(submission.status, 'approved')
+            self.assertEqual(submission.original_place.external_id, submission.external_id)
+
+    def test_approve_duplicate_keys_in_one_batch(self):
+        user = User.objects.create_user('moderator')
+        for name in ('Стадион', 'Стадион (повтор)'):
+            PendingPlace.objects.create(
+                user=user, action='add', status='pending', name=name, description='',
+                latitude=55.75, longitude=37.61, external_id='city:1',
+            )
+        self.assertEqual(approve_submissions(PendingPlace.objects.all()), 2)
+        place = Place.objects.get()
+        self.assertEqual(set(PendingPlace.objects.values_list('original_place', flat=True)), {place.pk})
@@ -0,0 +1,51 @@
+"""
+Таблица лидеров (places.leaderboard): байесовская оценка не дает одной
+оценке 5 обогнать много высоких оценок, а запись оценки сразу обновляет топ.
+"""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from places.leaderboard import rebuild_leaderboard, top_places
+from places.models import Category, LeaderboardEntry, Place
+from places.ratings import submit_rating
+
+
+@override_settings(LEADERBOARD_PRIOR_VOTES=10, VIEW_COUNTER_MODE='sync')
+class LeaderboardTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Футбол', slug='football')
+        self.single_vote = Place.objects.create(name='Новый стадион', description='', category=self.category)
+        # 500 оценок со средним 4.9: агрегаты как после rebuild_ratings
+        self.many_votes = Place.objects.create(
+            name='Старый стадион', description='', category=self.category,
+            rating_sum=2450, rating_count=500, average_rating=4.9,
+        )
+        # Средняя оценка сайта (априорное среднее) - около 4.6
+        Place.objects.create(
+            name='Двор', description='', category=self.category,
+            rating_sum=300, rating_count=100, average_rating=3.0,
+        )
+        self.user = User.objects.create_user('viewer')
+        rebuild_leaderboard()
+
+    def test_bayesian_order(self):
+        submit_rating(self.single_vote, self.user, 5)
+        self.assertEqual(list(top_places())[:2], [self.many_votes, self.single_vote])
+        self.assertEqual(list(top_places(self.category.pk))[:2], [self.many_votes, self.single_vote])
+
+    def test_refresh_on_rating(self):
+        self.assertFalse(LeaderboardEntry.objects.filter(place=self.single_vote).exists())
+        submit_rating(self.single_vote, self.user, 1)
+        low = LeaderboardEntry.objects.get(place=self.single_vote).score
+        submit_rating(self.single_vote, self.user, 5)
+        self.assertGreater(LeaderboardEntry.objects.get(place=self.single_vote).score, low)
+
+    def test_pages_show_top(self):
+        self.client.force_login(self.user)
+        for url in (reverse('home'), reverse('category_detail', args=[self.category.slug])):
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), self.many_votes.name)
@@ -0,0 +1,71 @@
+"""
+Метрики запросов (places.metrics): гистограммы, текстовый формат Prometheus,
+заголовок Server-Timing и доступ к /metrics.
+"""
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from places.metrics import Histogram, Registry, registry
+
+
+class HistogramTests(SimpleTestCase):
+
+    def test_bucket_counts(self):
+        histogram = Histogram((1, 5, 10))
+        for value in (0.5, 1, 3, 10, 11, 100):
+            histogram.observe(value)
+        # Граница входит в свою корзину (le), последнее значение - за всеми границами
+        self.assertEqual(histogram.counts, [2, 1, 1, 2])
+        self.assertEqual((histogram.count, histogram.sum), (6, 125.5))
+
+    def test_render(self):
+        metrics = Registry()
+        self.assertEqual(metrics.render(), '\n')
+        metrics.observe('http_request_db_queries', 'place_detail', 3)
+        metrics.observe('http_request_db_queries', 'place_detail', 30)
+        metrics.observe('http_request_db_queries', 'say "hi"', 1)
+        lines = metrics.render().splitlines()
+        self.assertEqual(lines[:2], [
+            '# HELP http_request_db_queries Количество SQL-запросов',
+            '# TYPE http_request_db_queries histogram',
+        ])
+        self.assertIn('http_request_db_queries_bucket{view="place_detail",le="2"} 0', lines)
+        self.assertIn('http_request_db_queries_bucket{view="place_detail",le="5"} 1', lines)
+        self.assertIn('http_request_db_queries_bucket{view="place_detail",le="50"} 2', lines)
+        self.assertIn('http_request_db_queries_bucket{view="place_detail",le="+Inf"} 2', lines)
+        self.assertIn('http_request_db_queries_sum{view="place_detail"} 33.0', lines)
+        self.assertIn('http_request_db_queries_count{view="place_detail"} 2', lines)
+        self.assertIn('http_request_db_queries_count{view="say \\"hi\\""} 1', lines)
+
+
+@override_settings(METRICS_ENABLED=True, METRICS_TOKEN='scrape-token', METRICS_ALLOWED_IPS=[], VIEW_COUNTER_MODE='sync')
+class MetricsViewTests(TestCase):
+
+    def setUp(self):
+        registry.reset()
+        self.url = reverse('metrics')
+
+    def test_middleware_observes_requests(self):
+        response = self.client.get(reverse('home'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", map;dur=')
+        body = self.client.get(self.url, headers={'authorization': 'Bearer scrape-token'}).content.decode()
+        self.assertIn('http_request_duration_seconds_count{view="home"} 1', body)
+        self.assertIn('http_response_size_bytes_count{view="home"} 1', body)
+
+    def test_access(self):
+        # Тестовый клиент приходит с 127.0.0.1 - как все запросы за nginx
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        for token in ('wrong', 'токен'):
+            with self.subTest(token=token):
+                self.assertEqual(self.client.get(self.url, headers={'authorization': f'Bearer {token}'}).status_code, 403)
+        response = self.client.get(self.url, headers={'authorization': 'Bearer scrape-token'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+        self.client.force_login(User.objects.create_user('admin', is_staff=True))
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_empty_token_disabled(self):
+        self.assertEqual(self.client.get(self.url, headers={'authorization': 'Bearer '}).status_code, 403)
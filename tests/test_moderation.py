@@ -0,0 +1,62 @@
+"""
+Одобрение заявок (places.moderation): пачка добавлений и правок одобряется
+целиком (применяется последняя правка), правки удаленных площадок
+отклоняются, а удаление площадки не удаляет историю одобренных заявок.
+"""
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from places.models import Category, PendingPlace, Photo, Place
+from places.moderation import approve_submissions
+
+
+@override_settings(VIEW_COUNTER_MODE='sync', MAP_CLUSTER_MAX_ZOOM=4)
+class ApproveSubmissionsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('author')
+        self.category = Category.objects.create(name='Футбол', slug='football')
+        self.place = Place.objects.create(name='Стадион', description='Старое описание', category=self.category)
+
+    def _submission(self, action, **fields):
+        return PendingPlace.objects.create(
+            user=self.user, action=action, status='pending', category=self.category,
+            latitude=55.75, longitude=37.61, **fields,
+        )
+
+    def test_bulk_approve(self):
+        for n in range(5):
+            self._submission('add', name=f'Площадка {n}', description='')
+        self._submission('edit', name='Стадион', description='Первая правка', original_place=self.place)
+        self._submission('edit', name='Стадион', description='Новое описание', original_place=self.place)
+
+        self.assertEqual(approve_submissions(PendingPlace.objects.all()), 7)
+        self.assertFalse(PendingPlace.objects.filter(status='pending').exists())
+        self.assertEqual(Place.objects.count(), 6)
+        self.place.refresh_from_db()
+        self.assertEqual(self.place.description, 'Новое описание')
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.place_count, 6)
+        self.assertFalse(PendingPlace.objects.filter(action='add', original_place__isnull=True).exists())
+        # Повторное одобрение ничего не делает
+        self.assertEqual(approve_submissions(PendingPlace.objects.all()), 0)
+
+    def test_delete_place_keeps_history(self):
+        self._submission('add', name='Площадка', description='')
+        approve_submissions(PendingPlace.objects.all())
+        Place.objects.all().delete()
+        submission = PendingPlace.objects.get()
+        self.assertEqual(submission.status, 'approved')
+        self.assertIsNone(submission.original_place)
+
+    def test_edit_of_deleted_place_rejected(self):
+        submission = self._submission('edit', name='Стадион', description='Правка', original_place=self.place)
+        photo = Photo.objects.create(pending_place=submission)
+        self._submission('add', name='Площадка', description='')
+        self.place.delete()
+
+        self.assertEqual(approve_submissions(PendingPlace.objects.all()), 1)
+        submission.refresh_from_db()
+        self.assertEqual(submission.status, 'rejected')
+        self.assertFalse(Photo.objects.filter(pk=photo.pk).exists())
+        self.assertEqual(list(Place.objects.values_list('name', flat=True)), ['Площадка'])
@@ -0,0 +1,34 @@
+"""
+Поиск ближайших площадок (/api/places/nearby/): сортировка по расстоянию
+и 400 на некорректные параметры, включая nan и inf.
+"""
+from django.test import TestCase
+from django.urls import reverse
+
+from places.models import Place
+
+
+class NearbyPlacesTests(TestCase):
+
+    def setUp(self):
+        Place.objects.create(name='Дальняя', description='', latitude=55.72, longitude=37.60)
+        Place.objects.create(name='Ближняя', description='', latitude=55.701, longitude=37.60)
+        self.url = reverse('api_places_nearby')
+
+    def test_sorted_by_distance(self):
+        features = self.client.get(self.url, {'lat': 55.7, 'lon': 37.6, 'radius': 5}).json()['features']
+        self.assertEqual([feature['properties']['name'] for feature in features], ['Ближняя', 'Дальняя'])
+
+    def test_invalid_params(self):
+        for params in (
+            {'lat': 55.7, 'lon': 37.6, 'radius': 'nan'},
+            {'lat': 55.7, 'lon': 37.6, 'radius': 'inf'},
+            {'lat': 'nan', 'lon': 37.6},
+            {'lat': 55.7, 'lon': '-inf'},
+            {'lat': 55.7, 'lon': 37.6, 'radius': 0},
+            {'lat': 55.7, 'lon': 37.6, 'k': 0},
+            {'lat': 95, 'lon': 37.6},
+            {'lon': 37.6},
+        ):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.url, params).status_code, 400)
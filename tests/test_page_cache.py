@@ -0,0 +1,86 @@
+"""
+Кеш страниц (places.page_cache): анонимным посетителям страница отдается из
+кеша, авторизованным рендерится заново, сброс метки отправляет на промах.
+"""
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotFound
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from places.models import Category, Place
+from places.page_cache import HOME_TAG, cached_page, category_tag, invalidate_pages
+
+
+@override_settings(PAGE_CACHE_ENABLED=True)
+class CachedPageTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.renders = 0
+
+    def _render(self):
+        self.renders += 1
+        return HttpResponse(f'render {self.renders}')
+
+    def _get(self, user=None, tags=(HOME_TAG,), path='/', method='get', render=None):
+        request = getattr(RequestFactory(), method)(path)
+        request.user = user or AnonymousUser()
+        return cached_page(request, 'home', list(tags), render or self._render)
+
+    def test_anonymous_hit_and_miss(self):
+        first = self._get()
+        self.assertEqual(first['X-Page-Cache'], 'miss')
+        second = self._get()
+        self.assertEqual(second['X-Page-Cache'], 'hit')
+        self.assertEqual(second.content, b'render 1')
+        # Другой адрес - другая запись
+        self.assertEqual(self._get(path='/?page=2')['X-Page-Cache'], 'miss')
+        self.assertEqual(self.renders, 2)
+
+    def test_logged_in_and_post_bypass(self):
+        user = User.objects.create_user('visitor')
+        self._get()
+        for response in (self._get(user=user), self._get(method='post')):
+            self.assertNotIn('X-Page-Cache', response)
+        self.assertEqual(self.renders, 3)
+
+    def test_errors_not_cached(self):
+        self._get(render=HttpResponseNotFound)
+        self.assertEqual(self._get()['X-Page-Cache'], 'miss')
+
+    @override_settings(PAGE_CACHE_ENABLED=False)
+    def test_disabled(self):
+        self._get()
+        self.assertNotIn('X-Page-Cache', self._get())
+        self.assertEqual(self.renders, 2)
+
+    def test_tag_invalidation(self):
+        self._get(tags=[HOME_TAG, category_tag(1)])
+        self._get(tags=[category_tag(2)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_pages(category_tag(1))
+        self.assertEqual(self._get(tags=[HOME_TAG, category_tag(1)])['X-Page-Cache'], 'miss')
+        # Страница без сброшенной метки осталась в кеше
+        self.assertEqual(self._get(tags=[category_tag(2)])['X-Page-Cache'], 'hit')
+
+
+@override_settings(PAGE_CACHE_ENABLED=True, VIEW_COUNTER_MODE='sync')
+class PageInvalidationSignalTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.category = Category.objects.create(name='Футбол', slug='football')
+        self.url = reverse('category_detail', kwargs={'category_slug': 'football'})
+
+    def test_new_place_resets_category_page(self):
+        self.assertEqual(self.client.get(self.url)['X-Page-Cache'], 'miss')
+        self.assertEqual(self.client.get(self.url)['X-Page-Cache'], 'hit')
+        with self.captureOnCommitCallbacks(execute=True):
+            Place.objects.create(name='Стадион', description='', category=self.category)
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Стадион')
@@ -0,0 +1,75 @@
+"""
+Постраничный вывод по курсору (places.pagination): курсор следующей страницы
+работает, а испорченный или подделанный курсор дает 400, а не 500.
+"""
+import base64
+import json
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from places.models import Category, Comment, Place
+
+
+def _cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+@override_settings(VIEW_COUNTER_MODE='sync', PAGE_CACHE_ENABLED=False, CATEGORY_PAGE_SIZE=2)
+class CategoryCursorTests(TestCase):
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Футбол', slug='football')
+        Place.objects.bulk_create([
+            Place(name=f'Площадка {n}', description='', category=self.category, average_rating=n)
+            for n in range(1, 4)
+        ])
+        self.client.force_login(User.objects.create_user('viewer'))
+        self.url = reverse('category_detail', args=[self.category.slug])
+
+    def test_next_page(self):
+        first = self.client.get(self.url, {'sort': 'rating'})
+        cursor = first.context['places'].next_cursor
+        self.assertIsNotNone(cursor)
+        self.assertContains(self.client.get(self.url, {'sort': 'rating', 'cursor': cursor}), 'Площадка 1')
+
+    def test_bad_cursor(self):
+        for sort, cursor in (
+            ('rating', '!'),
+            ('rating', _cursor([1])),
+            # Длина верная, типы - нет
+            ('rating', _cursor([{'a': 1}, 1])),
+            ('rating', _cursor([4.5, 'x'])),
+            ('rating', _cursor([4.5, None])),
+            ('new', _cursor(['x'])),
+            ('new', _cursor([10 ** 30])),
+            ('name', _cursor([[1], 1])),
+        ):
+            with self.subTest(sort=sort, cursor=cursor):
+                response = self.client.get(self.url, {'sort': sort, 'cursor': cursor})
+                self.assertEqual(response.status_code, 400)
+
+
+@override_settings(COMMENTS_PAGE_SIZE=2)
+class CommentCursorTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user('viewer')
+        place = Place.objects.create(name='Стадион', description='')
+        for n in range(3):
+            Comment.objects.create(place=place, user=user, text=f'Комментарий {n}')
+        self.client.force_login(user)
+        self.url = reverse('place_comments', args=[place.pk])
+
+    def test_next_page(self):
+        first = self.client.get(self.url).json()
+        self.assertIsNotNone(first['next_cursor'])
+        second = self.client.get(self.url, {'cursor': first['next_cursor']}).json()
+        self.assertIn('Комментарий 0', second['html'])
+        self.assertIsNone(second['next_cursor'])
+
+    def test_bad_cursor(self):
+        for cursor in ('!', _cursor(['zz', 1]), _cursor([{'dt': 'bad'}, 1]), _cursor([{'dt': 1}, 1])):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get(self.url, {'cursor': cursor}).status_code, 400)
@@ -0,0 +1,109 @@
+"""
+Количество SQL-запросов основных страниц не должно зависеть от объема данных.
+
+Каждая страница рендерится через тестовый клиент на 10, 100 и 1000 площадках.
+Если число запросов растет вместе с данными (N+1: обращение к связанной
+модели в цикле шаблона), тест падает и показывает запросы, которых стало
+больше.
+"""
+import io
+import re
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from places.models import Category, Comment, Photo, Place, Rating
+
+SIZES = (10, 100, 1000)
+
+
+def _normalize(sql):
+    """Шаблон запроса без конкретных значений, чтобы сравнивать запросы между собой."""
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(\.\d+)?\b', '?', sql)
+    return re.sub(r'\((?:\?, )+\?\)', '(...)', sql)
+
+
+# Просмотры считаем синхронно: сброс буфера по таймеру давал бы лишний запрос.
+# Кеш страниц выключен, иначе повторный рендер не выполнял бы запросов вовсе
+@override_settings(VIEW_COUNTER_MODE='sync', PAGE_CACHE_ENABLED=False)
+class QueryCountTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('viewer')
+        self.client.force_login(self.user)
+
+    def _grow_to(self, size, current):
+        call_command(
+            'generate_dataset', places=size - current, categories=10 if current == 0 else 0,
+            users=20 if current == 0 else 0, seed=size, stdout=io.StringIO(),
+        )
+
+    def _capture(self, url):
+        self.client.get(url)  # прогрев: сессия, кеши шаблонов и т.п.
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in captured.captured_queries]
+
+    def assertConstantQueries(self, url_for):
+        """url_for() вызывается после каждого шага роста данных и возвращает адрес страницы."""
+        baseline = None
+        current = 0
+        for size in SIZES:
+            self._grow_to(size, current)
+            current = size
+            queries = self._capture(url_for())
+            if baseline is None:
+                baseline = queries
+                continue
+            if len(queries) != len(baseline):
+                grown = Counter(map(_normalize, queries)) - Counter(map(_normalize, baseline))
+                details = '\n'.join(f'  x{count}: {sql}' for sql, count in grown.most_common())
+                self.fail(
+                    f'{url_for()}: {len(baseline)} запросов на {SIZES[0]} площадках, '
+                    f'{len(queries)} на {size}. Добавились запросы:\n{details}'
+                )
+
+    def _largest_category(self):
+        return Category.objects.order_by('-place_count', 'pk').first()
+
+    def test_home_page(self):
+        self.assertConstantQueries(lambda: reverse('home'))
+
+    def test_category_detail(self):
+        self.assertConstantQueries(
+            lambda: reverse('category_detail', kwargs={'category_slug': self._largest_category().slug})
+        )
+
+    def test_place_detail(self):
+        def url():
+            # Площадка с наибольшим числом комментариев
+            place = Place.objects.annotate(n=Count('comments')).order_by('-n', 'pk').first()
+            return reverse('place_detail', kwargs={'place_id': place.pk})
+        self.assertConstantQueries(url)
+
+
+@override_settings(VIEW_COUNTER_MODE='sync')
+class PlaceDeleteQueryCountTests(TestCase):
+    # Каскад площадки не пересчитывает агрегаты по каждой оценке, комментарию и фото
+
+    def _delete_queries(self, children):
+        place = Place.objects.create(name='Стадион', description='')
+        for i in range(children):
+            user = User.objects.create_user(f'user{children}-{i}')
+            Rating.objects.create(place=place, user=user, value=i % 5 + 1)
+            Comment.objects.create(place=place, user=user, text='Комментарий')
+            Photo.objects.create(place=place)
+        with CaptureQueriesContext(connection) as captured, self.captureOnCommitCallbacks(execute=True):
+            place.delete()
+        return len(captured.captured_queries)
+
+    def test_place_delete(self):
+        self.assertEqual(self._delete_queries(2), self._delete_queries(20))
@@ -0,0 +1,92 @@
+"""
+Хранимые агрегаты оценок (places.ratings): создание, изменение и удаление
+оценки сразу сдвигают rating_sum, rating_count и average_rating площадки.
+"""
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+
+from places.leaderboard import bayesian_score
+from places.models import LeaderboardEntry, Place, Rating
+from places.ratings import rebuild_rating_aggregates, submit_rating
+
+
+class RatingAggregateTests(TestCase):
+
+    def setUp(self):
+        self.place = Place.objects.create(name='Стадион', description='')
+        self.first, self.second = User.objects.create_user('first'), User.objects.create_user('second')
+
+    def assertAggregates(self, rating_sum, rating_count, average):
+        self.place.refresh_from_db()
+        self.assertEqual((self.place.rating_sum, self.place.rating_count), (rating_sum, rating_count))
+        self.assertEqual(self.place.average_rating, average)
+
+    def test_create_and_change(self):
+        submit_rating(self.place, self.first, 5)
+        submit_rating(self.place, self.second, 2)
+        self.assertAggregates(7, 2, 3.5)
+        submit_rating(self.place, self.second, 4)
+        self.assertAggregates(9, 2, 4.5)
+        self.assertEqual(Rating.objects.count(), 2)
+
+    def test_delete(self):
+        submit_rating(self.place, self.first, 5)
+        submit_rating(self.place, self.second, 2)
+        Rating.objects.get(user=self.second).delete()
+        self.assertAggregates(5, 1, 5.0)
+        # Вместе с пользователем удаляется и его оценка
+        self.first.delete()
+        self.assertAggregates(0, 0, None)
+        self.assertFalse(LeaderboardEntry.objects.filter(place=self.place).exists())
+
+    def test_delete_place_with_ratings(self):
+        submit_rating(self.place, self.first, 5)
+        self.place.delete()
+        self.assertFalse(Rating.objects.exists())
+        self.assertFalse(LeaderboardEntry.objects.exists())
+
+    def test_concurrent_first_rating(self):
+        submit_rating(self.place, self.first, 2)
+        original_first = QuerySet.first
+        calls = []
+
+        def first(queryset):
+            # Первая проверка не видит оценку, которую «параллельно» создал другой запрос
+            if not calls:
+                calls.append(queryset)
+                return None
+            return original_first(queryset)
+
+        with mock.patch.object(QuerySet, 'first', first):
+            rating = submit_rating(self.place, self.first, 4)
+        self.assertEqual(rating.value, 4)
+        self.assertAggregates(4, 1, 4.0)
+
+
+@override_settings(LEADERBOARD_PRIOR_VOTES=10)
+class RebuildRatingAggregatesTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('first')
+        self.rated = Place.objects.create(name='Стадион', description='')
+        self.untouched = Place.objects.create(name='Двор', description='')
+        submit_rating(self.rated, self.user, 4)
+        submit_rating(self.untouched, self.user, 2)
+
+    def test_only_drifted_rows_updated(self):
+        # Оценка изменена в обход submit_rating: агрегаты и таблица лидеров разошлись с Rating
+        Rating.objects.filter(place=self.rated).update(value=5)
+        stamp = Place.objects.get(pk=self.untouched.pk).updated_at
+
+        self.assertEqual(rebuild_rating_aggregates(), 1)
+        self.rated.refresh_from_db()
+        self.assertEqual((self.rated.rating_sum, self.rated.rating_count, self.rated.average_rating), (5, 1, 5.0))
+        # Априорное среднее тоже пересчитано: (5 + 2) / 2
+        self.assertAlmostEqual(
+            LeaderboardEntry.objects.get(place=self.rated).score, bayesian_score(5, 1, 3.5, 10),
+        )
+        self.assertEqual(Place.objects.get(pk=self.untouched.pk).updated_at, stamp)
+        self.assertEqual(rebuild_rating_aggregates(), 0)
@@ -0,0 +1,45 @@
+"""
+Поисковый индекс площадок (places.search): название категории входит в
+индекс, поэтому переименование и удаление категории переиндексируют ее
+площадки.
+"""
+from django.test import TestCase, override_settings
+
+from places.models import Category, Place
+from places.search import search_places, search_terms
+
+
+@override_settings(VIEW_COUNTER_MODE='sync')
+class CategorySearchIndexTests(TestCase):
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Баскетбол', slug='basketball')
+        self.place = Place.objects.create(name='Стадион', description='Покрытие', category=self.category)
+
+    def test_category_name_matches(self):
+        self.assertEqual(search_places('баскетбол'), [self.place])
+        self.assertEqual(search_places('стадион'), [self.place])
+
+    def test_rename(self):
+        self.category.name = 'Стритбол'
+        self.category.save()
+        self.assertEqual(search_places('стритбол'), [self.place])
+        self.assertEqual(search_places('баскетбол'), [])
+
+    def test_delete(self):
+        self.category.delete()
+        self.assertEqual(search_places('баскетбол'), [])
+        self.assertEqual(search_places('стадион'), [self.place])
+
+
+class SearchTermsTests(TestCase):
+
+    def test_short_terms_dropped(self):
+        self.assertEqual(search_terms('Корт в 5 мин'), ['корт', 'мин'])
+        self.assertEqual(search_terms('а б 1'), [])
+
+    @override_settings(VIEW_COUNTER_MODE='sync')
+    def test_nothing_left(self):
+        Place.objects.create(name='Арена', description='')
+        self.assertEqual(search_places('а'), [])
+        self.assertEqual(search_places('ар'), [Place.objects.get()])
@@ -0,0 +1,63 @@
+"""
+Статика после collectstatic (places.static_assets): имена с хешем, готовые
+.gz-копии с долгим кешем, а HTML-страницы сжимаются на лету.
+"""
+import gzip
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+HASHED_STORAGES = {
+    **settings.STORAGES,
+    'staticfiles': {'BACKEND': 'places.static_assets.PrecompressedManifestStaticFilesStorage'},
+}
+
+
+class PrecompressedStaticTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.static_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.static_root)
+        cls.enterClassContext(override_settings(STATIC_ROOT=cls.static_root, STORAGES=HASHED_STORAGES))
+        call_command('collectstatic', interactive=False, verbosity=0, stdout=io.StringIO())
+
+    def test_hashed_name_served_compressed(self):
+        url = staticfiles_storage.url('css/styles.css')
+        self.assertRegex(url, r'/css/styles\.[0-9a-f]{12}\.css$')
+        with staticfiles_storage.open('css/styles.css') as source:
+            original = source.read()
+
+        response = self.client.get(url, headers={'accept-encoding': 'gzip, deflate'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), original)
+
+        plain = self.client.get(url)
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(plain.streaming_content), original)
+
+    def test_unhashed_name_short_cache(self):
+        response = self.client.get(f'{settings.STATIC_URL}css/styles.css')
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertEqual(self.client.get(
+            f'{settings.STATIC_URL}css/styles.css', headers={'if-modified-since': response['Last-Modified']},
+        ).status_code, 304)
+
+
+@override_settings(VIEW_COUNTER_MODE='sync')
+class DynamicCompressionTests(TestCase):
+
+    def test_html_gzipped(self):
+        response = self.client.get(reverse('home'), headers={'accept-encoding': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertIn(b'<html', gzip.decompress(response.content))
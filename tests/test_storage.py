@@ -0,0 +1,67 @@
+"""
+Хранилище с адресацией по содержимому (places.storage): одинаковые файлы
+хранятся один раз, файл удаляется с последней ссылкой и только после коммита.
+"""
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.test import TestCase
+
+from places.models import StoredBlob
+from places.storage import ContentAddressedStorage
+
+
+class ContentAddressedStorageTests(TestCase):
+
+    def setUp(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        self.storage = ContentAddressedStorage(location=location)
+
+    def _save_twice(self):
+        first = self.storage.save('photos/a.png', ContentFile(b'same image'))
+        second = self.storage.save('photos/b.png', ContentFile(b'same image'))
+        return first, second
+
+    def test_dedupe(self):
+        first, second = self._save_twice()
+        self.assertEqual(first, second)
+        self.assertEqual(StoredBlob.objects.get(name=first).ref_count, 2)
+        self.assertNotEqual(self.storage.save('photos/c.png', ContentFile(b'other image')), first)
+
+    def test_release_last_reference(self):
+        name, _ = self._save_twice()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertFalse(self.storage.release(name))
+        self.assertTrue(self.storage.exists(name))
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.assertTrue(self.storage.release(name))
+            # До коммита файл на месте
+            self.assertTrue(self.storage.exists(name))
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(StoredBlob.objects.filter(name=name).exists())
+
+    def test_rollback_keeps_file(self):
+        name = self.storage.save('photos/a.png', ContentFile(b'image'))
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    self.storage.release(name)
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertFalse(callbacks)
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(StoredBlob.objects.get(name=name).ref_count, 1)
+
+    def test_saved_again_before_commit(self):
+        name = self.storage.save('photos/a.png', ContentFile(b'image'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.storage.release(name)
+            # Та же картинка загружена снова, пока удаление ждало коммита
+            self.storage.save('photos/b.png', ContentFile(b'image'))
+        self.assertTrue(self.storage.exists(name))